@@ -0,0 +1,380 @@
+import asyncio
+import logging
+import queue
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from contextlib import asynccontextmanager, contextmanager
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
+from playwright.async_api import async_playwright, Error as AsyncPlaywrightError
+
+import session_replay
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/121.0.0.0 Safari/537.36"
+)
+DEFAULT_VIEWPORT = {"width": 1280, "height": 1024}  # Ensure desktop view
+
+# Only reports something on Chromium, which is all we launch anyway
+JS_HEAP_SCRIPT = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+
+@dataclass
+class _Slot:
+    """One reusable context + page, pinned to a browser in the pool."""
+
+    browser_index: int
+    context: Any = None
+    page: Any = None
+    generation: int = -1  # browser generation the context was created on
+    replay_version: int = -1  # session_replay mode the context was prepared for
+    navigations: int = 0
+
+
+class _PoolPolicy:
+    """Sizing / recycling rules shared by the sync and async pools."""
+
+    def __init__(
+        self,
+        browsers: int = 1,
+        pages_per_browser: int = 4,
+        max_navigations: int = 50,
+        max_heap_mb: int = 256,
+        headless: bool = True,
+        user_agent: Optional[str] = None,
+        viewport: Optional[Dict[str, int]] = None,
+        acquire_timeout: float = 120.0,
+    ):
+        if browsers < 1 or pages_per_browser < 1:
+            raise ValueError("Pool needs at least one browser and one page")
+
+        self.browsers = browsers
+        self.pages_per_browser = pages_per_browser
+        self.max_navigations = max_navigations
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024
+        self.headless = headless
+        self.user_agent = user_agent or DEFAULT_USER_AGENT
+        self.viewport = viewport or DEFAULT_VIEWPORT
+        self.acquire_timeout = acquire_timeout
+
+        self._browsers: List[Any] = [None] * browsers
+        self._generations: List[int] = [0] * browsers
+
+    @property
+    def size(self) -> int:
+        return self.browsers * self.pages_per_browser
+
+    def _new_slots(self) -> List[_Slot]:
+        return [
+            _Slot(browser_index=i)
+            for _ in range(self.pages_per_browser)
+            for i in range(self.browsers)
+        ]
+
+    def _context_options(self) -> Dict[str, Any]:
+        return {"user_agent": self.user_agent, "viewport": self.viewport}
+
+    def _slot_is_stale(self, slot: _Slot) -> bool:
+        return (
+            slot.context is None
+            or slot.generation != self._generations[slot.browser_index]
+            or slot.replay_version != session_replay.version
+            or slot.page is None
+            or slot.page.is_closed()
+        )
+
+    def _needs_recycle(self, slot: _Slot, heap_bytes: int) -> bool:
+        if slot.navigations >= self.max_navigations:
+            return True
+        if heap_bytes > self.max_heap_bytes:
+            logger.info(
+                "Recycling browser context (JS heap %.0f MB)", heap_bytes / 1024 / 1024
+            )
+            return True
+        return False
+
+
+class BrowserPool(_PoolPolicy):
+    """
+    Warm Chromium instances with a bounded set of reusable contexts/pages.
+
+    Contexts are recycled after `max_navigations` uses or once the page's JS heap
+    grows past `max_heap_mb`; a browser that crashes is relaunched on next use.
+    The sync API is not thread-safe, so use one pool per thread.
+
+        with BrowserPool() as pool:
+            with pool.page() as page:
+                page.goto(url)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._playwright = None
+        self._slots: "queue.Queue[_Slot]" = queue.Queue()
+
+    def start(self) -> "BrowserPool":
+        if self._playwright is not None:
+            return self
+
+        # Nothing is kept until every browser is up: a failed launch leaves the pool unstarted
+        playwright = sync_playwright().start()
+        browsers = []
+        try:
+            for _ in range(self.browsers):
+                browsers.append(self._new_browser(playwright))
+        except BaseException:
+            for browser in browsers:
+                try:
+                    browser.close()
+                except PlaywrightError:
+                    pass
+            playwright.stop()
+            raise
+
+        self._playwright, self._browsers = playwright, browsers
+        self._generations = [g + 1 for g in self._generations]
+        for slot in self._new_slots():
+            self._slots.put(slot)
+        return self
+
+    def _new_browser(self, playwright):
+        with tracing.span("browser.launch"):
+            return playwright.chromium.launch(headless=self.headless)
+
+    def _launch(self, index: int):
+        old = self._browsers[index]
+        if old is not None:
+            try:
+                old.close()
+            except PlaywrightError:
+                pass  # Already dead, that's why we're here
+
+        self._browsers[index] = self._new_browser(self._playwright)
+        self._generations[index] += 1
+
+    def _ensure(self, slot: _Slot):
+        browser = self._browsers[slot.browser_index]
+        if browser is None or not browser.is_connected():
+            logger.warning("Browser %d disconnected, relaunching", slot.browser_index)
+            self._launch(slot.browser_index)
+            browser = self._browsers[slot.browser_index]
+
+        if self._slot_is_stale(slot):
+            self._drop_context(slot)
+            slot.context = browser.new_context(**self._context_options())
+            session_replay.prepare_context(slot.context)
+            slot.replay_version = session_replay.version
+            slot.page = slot.context.new_page()
+            slot.generation = self._generations[slot.browser_index]
+            slot.navigations = 0
+
+    def _drop_context(self, slot: _Slot):
+        if slot.context is not None:
+            try:
+                slot.context.close()
+            except PlaywrightError:
+                pass
+        slot.context = None
+        slot.page = None
+
+    def _heap_bytes(self, slot: _Slot) -> int:
+        try:
+            return int(slot.page.evaluate(JS_HEAP_SCRIPT) or 0)
+        except PlaywrightError:
+            return 0
+
+    @contextmanager
+    def page(self):
+        """Borrow a ready page. It goes back to the pool when the block exits."""
+        self.start()
+        try:
+            slot = self._slots.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a free browser page")
+
+        try:
+            self._ensure(slot)
+            yield slot.page
+        except PlaywrightError:
+            # Page/context/browser may be gone; rebuild on next checkout
+            self._drop_context(slot)
+            raise
+        finally:
+            if slot.context is not None:
+                slot.navigations += 1
+                if self._needs_recycle(slot, self._heap_bytes(slot)):
+                    self._drop_context(slot)
+            self._slots.put(slot)
+
+    def close(self):
+        if self._playwright is None:
+            return
+
+        while not self._slots.empty():
+            self._drop_context(self._slots.get_nowait())
+        for browser in self._browsers:
+            if browser is not None:
+                try:
+                    browser.close()
+                except PlaywrightError:
+                    pass
+        self._browsers = [None] * self.browsers
+        self._playwright.stop()
+        self._playwright = None
+
+    def __enter__(self) -> "BrowserPool":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncBrowserPool(_PoolPolicy):
+    """
+    asyncio twin of `BrowserPool`. Must be started and used on a single event loop.
+
+        async with AsyncBrowserPool(browsers=2) as pool:
+            async with pool.page() as page:
+                await page.goto(url)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._playwright = None
+        self._slots: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._launch_locks: List[asyncio.Lock] = []
+
+    async def start(self) -> "AsyncBrowserPool":
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._playwright is not None:
+                return self
+
+            # Nothing is kept until every browser is up: a failed launch leaves the pool unstarted
+            playwright = await async_playwright().start()
+            launched = await asyncio.gather(
+                *(self._new_browser(playwright) for _ in range(self.browsers)),
+                return_exceptions=True,
+            )
+            failed = [r for r in launched if isinstance(r, BaseException)]
+            if failed:
+                for browser in launched:
+                    if not isinstance(browser, BaseException):
+                        try:
+                            await browser.close()
+                        except AsyncPlaywrightError:
+                            pass
+                await playwright.stop()
+                raise failed[0]
+
+            self._playwright, self._browsers = playwright, launched
+            self._generations = [g + 1 for g in self._generations]
+            self._launch_locks = [asyncio.Lock() for _ in range(self.browsers)]
+            self._slots = asyncio.Queue()
+            for slot in self._new_slots():
+                self._slots.put_nowait(slot)
+        return self
+
+    async def _new_browser(self, playwright):
+        with tracing.span("browser.launch"):
+            return await playwright.chromium.launch(headless=self.headless)
+
+    async def _launch(self, index: int):
+        old = self._browsers[index]
+        if old is not None:
+            try:
+                await old.close()
+            except AsyncPlaywrightError:
+                pass
+
+        self._browsers[index] = await self._new_browser(self._playwright)
+        self._generations[index] += 1
+
+    async def _ensure(self, slot: _Slot):
+        index = slot.browser_index
+        browser = self._browsers[index]
+        if browser is None or not browser.is_connected():
+            async with self._launch_locks[index]:
+                # Another page on the same browser may have relaunched it already
+                browser = self._browsers[index]
+                if browser is None or not browser.is_connected():
+                    logger.warning("Browser %d disconnected, relaunching", index)
+                    await self._launch(index)
+                    browser = self._browsers[index]
+
+        if self._slot_is_stale(slot):
+            await self._drop_context(slot)
+            slot.context = await browser.new_context(**self._context_options())
+            await session_replay.aprepare_context(slot.context)
+            slot.replay_version = session_replay.version
+            slot.page = await slot.context.new_page()
+            slot.generation = self._generations[index]
+            slot.navigations = 0
+
+    async def _drop_context(self, slot: _Slot):
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except AsyncPlaywrightError:
+                pass
+        slot.context = None
+        slot.page = None
+
+    async def _heap_bytes(self, slot: _Slot) -> int:
+        try:
+            return int(await slot.page.evaluate(JS_HEAP_SCRIPT) or 0)
+        except AsyncPlaywrightError:
+            return 0
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a ready page. It goes back to the pool when the block exits."""
+        await self.start()
+        try:
+            slot = await asyncio.wait_for(self._slots.get(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError("Timed out waiting for a free browser page")
+
+        try:
+            await self._ensure(slot)
+            yield slot.page
+        except AsyncPlaywrightError:
+            await self._drop_context(slot)
+            raise
+        finally:
+            if slot.context is not None:
+                slot.navigations += 1
+                if self._needs_recycle(slot, await self._heap_bytes(slot)):
+                    await self._drop_context(slot)
+            self._slots.put_nowait(slot)
+
+    async def close(self):
+        if self._playwright is None:
+            return
+
+        while self._slots is not None and not self._slots.empty():
+            await self._drop_context(self._slots.get_nowait())
+        for browser in self._browsers:
+            if browser is not None:
+                try:
+                    await browser.close()
+                except AsyncPlaywrightError:
+                    pass
+        self._browsers = [None] * self.browsers
+        await self._playwright.stop()
+        self._playwright = None
+        self._slots = None
+
+    async def __aenter__(self) -> "AsyncBrowserPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,193 @@
+"""
+Benchmark EndpointClassifier on a labelled dataset: accuracy, confusion matrix,
+per-class precision/recall, per-stage timings and throughput.
+
+    python classification_benchmark.py --dataset classification_dataset.json --concurrency 8
+
+The dataset is a JSON list of {"url": ..., "label": ...} (as classification_test.py
+reads). Results are saved as JSON so runs can be compared across classifier changes.
+
+For numbers that are comparable between runs, benchmark the local fixture site
+(--fixtures) or record a live run once and replay it:
+
+    python classification_benchmark.py --fixtures --latency 0.05
+    python classification_benchmark.py --record live.har
+    python classification_benchmark.py --replay live.har
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from contextlib import ExitStack
+from typing import Dict, List
+
+import session_replay
+from browser_pool import AsyncBrowserPool
+from endpoint_classifier import EndpointClassifier
+from fixture_server import FixtureServer
+from http_client import aclose_async_client
+
+STAGES = ["raw_fetch", "random_sample", "render", "navigate", "scroll_probe", "static_parse", "randomness", "total"]
+
+
+async def run_dataset(dataset: List[dict], concurrency: int) -> List[dict]:
+    pool = AsyncBrowserPool(
+        browsers=max(1, -(-concurrency // 4)),
+        pages_per_browser=min(concurrency, 4),
+        user_agent=EndpointClassifier.USER_AGENT,
+    )
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_one(item: dict) -> dict:
+        async with slots:
+            classifier = EndpointClassifier(item["url"], pool=pool)
+            record = {"url": item["url"], "true_label": item["label"]}
+            try:
+                record["predicted_label"] = (await classifier.classify())["type"]
+            except Exception as e:
+                record["predicted_label"] = "error"
+                record["error"] = repr(e)
+            record["timings"] = {k: round(v, 3) for k, v in classifier.timings.items()}
+            return record
+
+    try:
+        return await asyncio.gather(*(run_one(item) for item in dataset))
+    finally:
+        await pool.close()
+        await aclose_async_client()
+
+
+def confusion_matrix(records: List[dict], labels: List[str]) -> Dict[str, Dict[str, int]]:
+    """matrix[true][predicted]; failed classifications get their own "error" column."""
+    columns = labels + (["error"] if any(r["predicted_label"] == "error" for r in records) else [])
+    matrix = {t: {p: 0 for p in columns} for t in labels}
+    for r in records:
+        matrix[r["true_label"]][r["predicted_label"]] += 1
+    return matrix
+
+
+def per_class_scores(matrix: Dict[str, Dict[str, int]]) -> Dict[str, dict]:
+    scores = {}
+    for label in matrix:
+        tp = matrix[label][label]
+        predicted = sum(row[label] for row in matrix.values())
+        actual = sum(matrix[label].values())
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        scores[label] = {
+            "precision": round(precision, 3),
+            "recall": round(recall, 3),
+            "f1": round(f1, 3),
+            "support": actual,
+        }
+    return scores
+
+
+def stage_summary(records: List[dict]) -> Dict[str, dict]:
+    samples = defaultdict(list)
+    for r in records:
+        for stage, seconds in r["timings"].items():
+            samples[stage].append(seconds)
+
+    summary = {}
+    for stage in [s for s in STAGES if s in samples] + sorted(set(samples) - set(STAGES)):
+        values = sorted(samples[stage])
+        summary[stage] = {
+            "mean": round(statistics.fmean(values), 3),
+            "p50": round(values[len(values) // 2], 3),
+            "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+            "max": round(values[-1], 3),
+        }
+    return summary
+
+
+def print_report(report: dict):
+    labels = report["labels"]
+    matrix = report["confusion_matrix"]
+    width = max(len(label) for label in labels) + 2
+
+    print("\nConfusion matrix (rows: true, columns: predicted)")
+    columns = list(next(iter(matrix.values()), {}))
+    print(" " * width + "".join(f"{label[:10]:>11}" for label in columns))
+    for t in labels:
+        print(f"{t:<{width}}" + "".join(f"{matrix[t][p]:>11}" for p in columns))
+
+    print(f"\n{'class':<{width}}{'precision':>10}{'recall':>8}{'f1':>7}{'support':>9}")
+    for label, s in report["per_class"].items():
+        print(f"{label:<{width}}{s['precision']:>10.2f}{s['recall']:>8.2f}{s['f1']:>7.2f}{s['support']:>9}")
+
+    print(f"\n{'stage':<15}{'mean':>8}{'p50':>8}{'p95':>8}{'max':>8}  (seconds; stages overlap)")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<15}{s['mean']:>8.2f}{s['p50']:>8.2f}{s['p95']:>8.2f}{s['max']:>8.2f}")
+
+    print(
+        f"\n✅ Accuracy {report['accuracy']:.1%} on {report['urls']} URLs, "
+        f"{report['errors']} errors, {report['wall_seconds']:.1f}s wall "
+        f"({report['urls_per_second']:.2f} URLs/s at concurrency {report['concurrency']})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="classification_dataset.json")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", default=None, help="results JSON (default: timestamped file)")
+    parser.add_argument("--fixtures", action="store_true", help="classify the local fixture site instead of --dataset")
+    parser.add_argument("--latency", type=float, default=0.0, help="fixture site response latency (seconds)")
+    replay = parser.add_mutually_exclusive_group()
+    replay.add_argument("--record", metavar="HAR", help="record every response of this run")
+    replay.add_argument("--replay", metavar="HAR", help="serve responses from a recorded run, no network")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        if args.fixtures:
+            fixtures = stack.enter_context(FixtureServer(latency=args.latency))
+            dataset = fixtures.dataset()
+            args.dataset = fixtures.base_url
+        else:
+            with open(args.dataset, "r", encoding="utf-8") as f:
+                dataset = json.load(f)
+        if args.record:
+            stack.enter_context(session_replay.recording(args.record))
+        elif args.replay:
+            stack.enter_context(session_replay.replaying(args.replay))
+
+        start = time.perf_counter()
+        records = asyncio.run(run_dataset(dataset, args.concurrency))
+        wall = time.perf_counter() - start
+
+    seen = Counter(r["true_label"] for r in records) + Counter(r["predicted_label"] for r in records)
+    labels = sorted(label for label in seen if label != "error")
+    matrix = confusion_matrix(records, labels)
+    correct = sum(r["true_label"] == r["predicted_label"] for r in records)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "dataset": args.dataset,
+        "concurrency": args.concurrency,
+        "replay": args.replay,
+        "urls": len(records),
+        "errors": sum(r["predicted_label"] == "error" for r in records),
+        "accuracy": round(correct / len(records), 4) if records else 0.0,
+        "wall_seconds": round(wall, 2),
+        "urls_per_second": round(len(records) / wall, 3) if wall else 0.0,
+        "labels": labels,
+        "confusion_matrix": matrix,
+        "per_class": per_class_scores(matrix),
+        "stages": stage_summary(records),
+        "records": records,
+    }
+    print_report(report)
+
+    output = args.output or f"classification_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+# Rows are coerced in column batches of this size while streaming
+CHUNK_SIZE = 256
+# Values looked at when detecting a column's number/date format
+SAMPLE_SIZE = 32
+
+# Digits with ./, separators; spaces or apostrophes only as thousands groups ("1 234,56", "1'000").
+# A leading separator is a decimal one (".75", "$.99")
+_NUMBER_TOKEN = re.compile(r"(?:\d+|(?=[.,]\d))(?:(?:[.,]|[ \u00a0\u202f'](?=\d{3}(?!\d)))\d+)*")
+_NUMBER_NOISE = re.compile(r"[ \u00a0\u202f']")
+_LEADING_MINUS = re.compile(r"^\s*[-\u2212]")
+# Accounting negatives: the whole value is a parenthesized amount, "(1,234.56)" or "($12)".
+# "(3 reviews)" is just a count in brackets
+_PARENTHESIZED_AMOUNT = re.compile(
+    r"^\s*\(\s*[^\w\s()]?\s*\.?\d[\d.,' \u00a0\u202f]*\s*[^\w\s()]?\s*\)\s*$"
+)
+_LETTER = re.compile(r"[^\W\d_]")
+_THOUSANDS_COMMA = re.compile(r"^\d{1,3}(?:,\d{3})+$")
+_THOUSANDS_DOT = re.compile(r"^\d{1,3}(?:\.\d{3})+$")
+_COMMA_DECIMAL = re.compile(r"(?:^|[\d.])\d,\d{1,2}$")
+_DOT_DECIMAL = re.compile(r"(?:^|[\d,])\d\.\d{1,2}$")
+
+_ORDINAL = re.compile(r"(\d)(st|nd|rd|th)\b", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+_HAS_DIGIT = re.compile(r"\d")
+
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%d %b %Y",
+    "%d %B %Y",
+    "%b %d, %Y",
+    "%B %d, %Y",
+    "%b %d %Y",
+    "%B %d %Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+    "%d-%m-%Y",
+    "%d %b %Y %H:%M",
+    "%b %d, %Y %H:%M",
+    "%a, %d %b %Y %H:%M:%S %Z",
+    "%B %Y",
+    "%b %Y",
+]
+ISO = "iso"
+
+# Formats that read the same text as a different date ("12/01/2024")
+_DAY_MONTH_SWAPS = {"%d/%m/%Y": "%m/%d/%Y", "%m/%d/%Y": "%d/%m/%Y"}
+
+_DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+def _plain_float(value: str) -> Optional[float]:
+    """float() of a bare number ("42", "-.5", "1e5"); None otherwise, and for "nan"/"inf"."""
+    if not _HAS_DIGIT.search(value):
+        return None
+    try:
+        return float(value.strip())
+    except ValueError:
+        return None
+
+
+def _number_tokens(text: str) -> List[str]:
+    return [_NUMBER_NOISE.sub("", match) for match in _NUMBER_TOKEN.findall(text)]
+
+
+def _decimal_style(tokens: Iterable[str]) -> Optional[str]:
+    """'dot' (1,234.56) or 'comma' (1.234,56) by majority over a sample, or None."""
+    dot = comma = 0
+    for tok in tokens:
+        if "," in tok and "." in tok:
+            if tok.rfind(",") > tok.rfind("."):
+                comma += 1
+            else:
+                dot += 1
+        elif _COMMA_DECIMAL.search(tok) and not _THOUSANDS_COMMA.match(tok):
+            comma += 1
+        elif _DOT_DECIMAL.search(tok) and not _THOUSANDS_DOT.match(tok):
+            dot += 1
+    if dot == comma:
+        return None
+    return "dot" if dot > comma else "comma"
+
+
+def _token_to_float(tok: str, style: Optional[str]) -> float:
+    """`style` (the column's decimal style) only settles tokens with a single kind of separator."""
+    if "," in tok and "." in tok:
+        # Whichever separator comes last is the decimal one
+        if tok.rfind(",") > tok.rfind("."):
+            tok = tok.replace(".", "").replace(",", ".")
+        else:
+            tok = tok.replace(",", "")
+    elif "," in tok:
+        if (style != "comma" and _THOUSANDS_COMMA.match(tok)) or tok.count(",") > 1:
+            tok = tok.replace(",", "")
+        else:
+            tok = tok.replace(",", ".")
+    elif "." in tok:
+        if (style == "comma" and _THOUSANDS_DOT.match(tok)) or tok.count(".") > 1:
+            tok = tok.replace(".", "")
+    return float(tok)
+
+
+def _clean_date(text: str) -> str:
+    return _SPACES.sub(" ", _ORDINAL.sub(r"\1", text.strip()))
+
+
+def _parse_date(text: str, fmt: str) -> datetime:
+    if fmt == ISO:
+        return datetime.fromisoformat(text)
+    return datetime.strptime(text, fmt)
+
+
+def _swap_ambiguous(text: str, fmt: str, parsed: datetime) -> bool:
+    """`text` parses as a different date with day and month swapped."""
+    other = _DAY_MONTH_SWAPS.get(fmt)
+    if other is None:
+        return False
+    try:
+        return _parse_date(text, other) != parsed
+    except ValueError:
+        return False
+
+
+def normalize_url(value: str, base_url: Optional[str] = None) -> str:
+    """Resolve against `base_url`, lowercase scheme/host, drop default ports and fragments."""
+    value = value.strip()
+    if base_url:
+        value = urljoin(base_url, value)
+
+    parts = urlsplit(value)
+    if parts.scheme not in ("http", "https"):
+        return value
+
+    netloc = parts.netloc.lower()
+    default_port = _DEFAULT_PORTS[parts.scheme]
+    if netloc.endswith(default_port):
+        netloc = netloc[: -len(default_port)]
+    return urlunsplit((parts.scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+@dataclass
+class FieldReport:
+    field: str
+    dtype: str
+    total: int = 0
+    failed: int = 0
+    # Numbers pulled out of surrounding words ("3 reviews", "12.99 USD"); coerced, but worth a look
+    extracted: int = 0
+    # Dates that read differently as d/m and m/d with nothing in the column to tell; among `failed`
+    ambiguous: int = 0
+    detected_format: Optional[str] = None
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failed / self.total if self.total else 0.0
+
+
+class FieldCoercer:
+    """
+    Coerces one column. The first batch decides the column's format (decimal
+    style for numbers, strptime pattern for dates) and later batches reuse it,
+    trying the other formats only for values that don't fit. Values that can't
+    be parsed are returned unchanged and counted as failures.
+
+    A number cell must hold exactly one number: text with several ("12 Jan
+    2024", "3 for £10") is ambiguous and fails rather than yielding the first.
+    One number amid words is used and counted in `report.extracted`.
+
+    Likewise "12/01/2024" only becomes a date once the column shows whether it
+    is d/m or m/d ("25/01/2024"); until then it fails as `report.ambiguous`.
+    """
+
+    def __init__(self, field: str, dtype: str, base_url: Optional[str] = None):
+        self.kind = dtype[:-2] if dtype.endswith("[]") else dtype
+        self.base_url = base_url
+        self.report = FieldReport(field=field, dtype=dtype)
+        self._format: Optional[str] = None
+        self._format_detected = False
+
+    def coerce_many(self, values: List[Optional[str]]) -> List[Any]:
+        if self.kind == "number":
+            return self._numbers(values)
+        if self.kind == "date":
+            return self._dates(values)
+        if self.kind == "url":
+            self.report.total += sum(v is not None for v in values)
+            return [None if v is None else normalize_url(v, self.base_url) for v in values]
+        return values
+
+    def _numbers(self, values: List[Optional[str]]) -> List[Any]:
+        found = [[] if v is None else _number_tokens(v) for v in values]
+        tokens = [f[0] if len(f) == 1 else None for f in found]
+        if not self._format_detected:
+            sample = [t for t in tokens if t][:SAMPLE_SIZE]
+            if sample:
+                self._format = _decimal_style(sample)
+                self._format_detected = self._format is not None or len(sample) >= SAMPLE_SIZE
+                self.report.detected_format = self._format
+
+        out = []
+        for value, tok in zip(values, tokens):
+            if value is None:
+                out.append(None)
+                continue
+            self.report.total += 1
+            # float() first, except where "1.234" means a thousand and more
+            if self._format != "comma" or "." not in value:
+                number = _plain_float(value)
+                if number is not None:
+                    out.append(number)
+                    continue
+            if tok is None:  # No number, or several and picking one would be a guess
+                self.report.failed += 1
+                out.append(value)
+                continue
+            try:
+                number = _token_to_float(tok, self._format)
+            except ValueError:
+                self.report.failed += 1
+                out.append(value)
+                continue
+            if _LETTER.search(value):
+                self.report.extracted += 1
+            negative = _LEADING_MINUS.match(value) or _PARENTHESIZED_AMOUNT.match(value)
+            out.append(-number if negative else number)
+        return out
+
+    def _detect_date_format(self, cleaned: List[str]):
+        sample = cleaned[:SAMPLE_SIZE]
+        best, best_hits = None, 0
+        for fmt in (ISO, *DATE_FORMATS):
+            hits = 0
+            for text in sample:
+                try:
+                    _parse_date(text, fmt)
+                    hits += 1
+                except ValueError:
+                    pass
+            if hits > best_hits:
+                best, best_hits = fmt, hits
+                if hits == len(sample) and fmt not in _DAY_MONTH_SWAPS:
+                    break
+            elif hits == best_hits and _DAY_MONTH_SWAPS.get(best) == fmt:
+                best = None  # d/m and m/d fit equally; let later values decide
+        if best is not None:
+            self._format = best
+            self._format_detected = True
+            self.report.detected_format = best
+
+    def _dates(self, values: List[Optional[str]]) -> List[Any]:
+        cleaned = [None if v is None else _clean_date(v) for v in values]
+        if not self._format_detected:
+            self._detect_date_format([c for c in cleaned if c])
+
+        formats = ((self._format,) if self._format else ()) + (ISO, *DATE_FORMATS)
+        parsed_by_text: Dict[str, Optional[datetime]] = {}  # Columns repeat a lot; parse each text once
+        ambiguous = set()
+        out = []
+        for value, text in zip(values, cleaned):
+            if value is None:
+                out.append(None)
+                continue
+            self.report.total += 1
+            if text not in parsed_by_text:
+                parsed_by_text[text] = None
+                if _HAS_DIGIT.search(text):
+                    for fmt in formats:
+                        try:
+                            parsed = _parse_date(text, fmt)
+                        except ValueError:
+                            continue
+                        if fmt != self._format and _swap_ambiguous(text, fmt, parsed):
+                            ambiguous.add(text)
+                        else:
+                            parsed_by_text[text] = parsed
+                        break
+            parsed = parsed_by_text[text]
+            if text in ambiguous:
+                self.report.ambiguous += 1
+            if parsed is None:
+                self.report.failed += 1
+                out.append(value)
+            else:
+                out.append(parsed)
+        return out
+
+
+class SchemaCoercer:
+    """Column-wise coercion for rows extracted with a schema (see coerce_rows)."""
+
+    def __init__(self, schema: dict, base_url: Optional[str] = None):
+        self.fields: Dict[str, FieldCoercer] = {
+            name: FieldCoercer(name, spec.get("type", "string"), base_url)
+            for name, spec in schema["fields"].items()
+            if spec.get("type", "string").removesuffix("[]") in ("number", "date", "url")
+        }
+
+    def coerce_rows(self, rows: List[dict]) -> List[dict]:
+        """Coerce a batch in place, one column at a time. Returns `rows`."""
+        for name, coercer in self.fields.items():
+            column = [row.get(name) for row in rows]
+
+            if coercer.report.dtype.endswith("[]"):
+                # Flatten list cells, coerce once, then split back per row
+                flat = [v for cell in column if cell for v in cell]
+                coerced = iter(coercer.coerce_many(flat))
+                for row, cell in zip(rows, column):
+                    if cell:
+                        row[name] = [next(coerced) for _ in cell]
+            else:
+                for row, value in zip(rows, coercer.coerce_many(column)):
+                    row[name] = value
+        return rows
+
+    def coerce_stream(self, rows: Iterable[dict], chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+        """Yield rows coerced in column batches of `chunk_size`."""
+        chunk: List[dict] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from self.coerce_rows(chunk)
+                chunk = []
+        if chunk:
+            yield from self.coerce_rows(chunk)
+
+    def report(self) -> Dict[str, FieldReport]:
+        return {name: c.report for name, c in self.fields.items()}
+
+
+def cast_value(value: str, dtype: str):
+    """Single-value coercion, for callers outside a column batch."""
+    if value is None:
+        return None
+    return FieldCoercer("value", dtype).coerce_many([value])[0]
@@ -0,0 +1,164 @@
+from typing import Dict, Iterator, List, Optional, Union
+from urllib.parse import urljoin
+
+from cssselect import HTMLTranslator, SelectorError
+from lxml import etree
+
+from document import Document, parse_lxml
+from coercion import SchemaCoercer
+
+# Attributes BeautifulSoup splits into lists (bs4's HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES).
+# extract_data keeps the first item, so we have to as well.
+MULTI_VALUED_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+
+# get_text() skips strings inside these (bs4 gives them their own string types)
+_TEXT_XPATH = etree.XPath(
+    "descendant::text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+)
+
+_translator = HTMLTranslator()
+
+
+def css_to_xpath(selector: str) -> etree.XPath:
+    try:
+        return etree.XPath(_translator.css_to_xpath(selector))
+    except SelectorError as e:
+        raise ValueError(f"Cannot compile selector {selector!r}: {e}") from e
+
+
+def _is_multi_valued(tag: str, attribute: str) -> bool:
+    return attribute in MULTI_VALUED_ATTRIBUTES["*"] or attribute in MULTI_VALUED_ATTRIBUTES.get(tag, ())
+
+
+class _CompiledField:
+    __slots__ = ("name", "xpath", "attribute", "dtype", "multi")
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.xpath = css_to_xpath(spec["selector"])
+        self.attribute = spec.get("attribute")
+        self.dtype = spec.get("type", "string")
+        self.multi = self.dtype.endswith("[]")
+
+
+class CompiledSchema:
+    """
+    A schema with its CSS selectors compiled to lxml XPath once, reusable across
+    any number of pages. `extract()` returns exactly what `extract_data()` does,
+    without building a BeautifulSoup tree or running soupsieve per container.
+
+    Field selectors are matched against the whole page once and bucketed into
+    their containers by ancestry, which mirrors soupsieve's `container.select()`
+    semantics (the selector may reference the container or its ancestors).
+    Raises ValueError for selectors cssselect can't translate (e.g. `:-soup-contains()`);
+    use `try_compile()` to fall back to extract_data for those.
+    """
+
+    def __init__(self, schema: dict):
+        self.schema = schema
+        self.container_xpath = css_to_xpath(schema["container_selector"])
+        self.fields = [_CompiledField(name, spec) for name, spec in schema["fields"].items()]
+
+    @classmethod
+    def try_compile(cls, schema: dict) -> Optional["CompiledSchema"]:
+        try:
+            return cls(schema)
+        except ValueError:
+            return None
+
+    def extract(
+        self,
+        html: Union[str, Document],
+        base_url: Optional[str] = None,
+        coercer: Optional[SchemaCoercer] = None,
+    ) -> List[dict]:
+        return list(self.iter_rows(html, base_url, coercer))
+
+    def iter_rows(
+        self,
+        html: Union[str, Document],
+        base_url: Optional[str] = None,
+        coercer: Optional[SchemaCoercer] = None,
+    ) -> Iterator[dict]:
+        """Yields rows in column-coerced batches (see extract and extraction.iter_data)."""
+        root = html.lxml_root if isinstance(html, Document) else parse_lxml(html)
+        return self.iter_tree(root, base_url, coercer)
+
+    def extract_tree(
+        self,
+        root: etree._Element,
+        base_url: Optional[str] = None,
+        coercer: Optional[SchemaCoercer] = None,
+    ) -> List[dict]:
+        return list(self.iter_tree(root, base_url, coercer))
+
+    def iter_tree(
+        self,
+        root: etree._Element,
+        base_url: Optional[str] = None,
+        coercer: Optional[SchemaCoercer] = None,
+    ) -> Iterator[dict]:
+        coercer = coercer or SchemaCoercer(self.schema, base_url)
+        return coercer.coerce_stream(self._iter_raw(root, base_url))
+
+    def _iter_raw(self, root: etree._Element, base_url: Optional[str]) -> Iterator[dict]:
+        containers = self.container_xpath(root)
+        if not containers:
+            return
+
+        # container element -> {field name -> matched elements in document order}
+        buckets: Dict[etree._Element, Dict[str, list]] = {
+            c: {f.name: [] for f in self.fields} for c in containers
+        }
+        for field in self.fields:
+            for el in field.xpath(root):
+                for ancestor in el.iterancestors():
+                    bucket = buckets.get(ancestor)
+                    if bucket is not None:
+                        bucket[field.name].append(el)
+
+        joined: Dict[str, str] = {}  # urljoin results, shared across the page
+        for c in containers:
+            item = {}
+            for field in self.fields:
+                values = []
+                for el in buckets[c][field.name]:
+                    if field.attribute:
+                        val = el.get(field.attribute)
+                        if val is not None and _is_multi_valued(el.tag, field.attribute):
+                            parts = val.split()
+                            val = parts[0] if parts else None
+
+                        if isinstance(val, str) and base_url:
+                            if val not in joined:
+                                joined[val] = urljoin(base_url, val)
+                            val = joined[val]
+                    else:
+                        val = "".join(t.strip() for t in _TEXT_XPATH(el))
+
+                    if val:
+                        values.append(val)
+
+                # Handle single vs multi value
+                if not values:
+                    item[field.name] = None
+                elif field.multi:
+                    item[field.name] = values
+                else:
+                    item[field.name] = values[0]
+
+            # Keep only non-empty rows
+            if any(v is not None for v in item.values()):
+                yield item
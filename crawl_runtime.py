@@ -0,0 +1,335 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set
+
+from coercion import FieldReport, SchemaCoercer
+from compiled_schema import CompiledSchema
+from document import Document
+from extraction import iter_data, row_key
+from http_client import aclose_async_client
+from pagination import crawl_pages
+from playwright.sync_api import Error as PlaywrightError
+from random_sampler import RandomSampler
+from scroll_harvester import ScrollHarvester, fragments_html, item_schema
+
+if TYPE_CHECKING:
+    from html_fetcher import HTMLFetcher
+
+logger = logging.getLogger(__name__)
+
+# Endpoint types (EndpointClassifier._classify) the runtime knows how to crawl
+SUPPORTED_TYPES = {"default", "tableful", "javascript", "scroll", "random", "pagination"}
+
+
+class UnsupportedEndpoint(Exception):
+    """The runtime has no strategy for this endpoint type (auth walls, forms...)."""
+
+
+# Messages from the worker of iterate_in_thread to the consuming thread
+_caller_messages: contextvars.ContextVar[Optional[queue.Queue]] = contextvars.ContextVar(
+    "caller_messages", default=None
+)
+
+
+def iterate_in_thread(make_iter: Callable[[], AsyncIterator], maxsize: int = 4) -> Iterator:
+    """
+    Consume an async iterator from sync code. It runs on a fresh event loop in a
+    worker thread (sync Playwright owns this thread's loop), and items are handed
+    over as they're produced; once `maxsize` wait unconsumed, the producer waits.
+    Coroutines in the worker can run blocking calls back on this thread with
+    call_in_caller() (e.g. renders on the fetcher's sync BrowserPool). Closing
+    the returned generator cancels the crawl.
+    """
+    messages: queue.Queue = queue.Queue()
+    slots = threading.Semaphore(maxsize)
+    started = threading.Event()
+    state = {}
+
+    async def pump():
+        state["task"] = asyncio.current_task()
+        state["loop"] = asyncio.get_running_loop()
+        _caller_messages.set(messages)
+        started.set()
+        try:
+            async for item in make_iter():
+                # Backpressure without blocking the loop (in-flight fetches keep going)
+                await asyncio.to_thread(slots.acquire)
+                messages.put(("item", item))
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            messages.put(("error", e))
+        finally:
+            messages.put(("done", None))
+
+    # Carry the caller's context over, so e.g. tracing spans nest under the caller's
+    context = contextvars.copy_context()
+    worker = threading.Thread(target=lambda: context.run(asyncio.run, pump()), daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, payload = messages.get()
+            if kind == "call":
+                _run_call(*payload)
+            elif kind == "item":
+                slots.release()
+                yield payload
+            elif kind == "error":
+                raise payload
+            else:
+                return
+    finally:
+        started.wait()
+        if worker.is_alive():
+            state["loop"].call_soon_threadsafe(state["task"].cancel)
+            slots.release(maxsize)  # Unblock a producer waiting for a slot
+        while worker.is_alive() or not messages.empty():
+            try:
+                kind, payload = messages.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if kind == "call":
+                payload[-1].cancel()
+        worker.join()
+
+
+def _run_call(fn: Callable, args: tuple, kwargs: dict, future: concurrent.futures.Future):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except BaseException as e:
+        future.set_exception(e)
+
+
+async def call_in_caller(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run blocking `fn` on the thread consuming iterate_in_thread() and await its
+    result. Calls are served one at a time, in between handing over items.
+    """
+    messages = _caller_messages.get()
+    if messages is None:
+        raise RuntimeError("call_in_caller() only works inside iterate_in_thread()")
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    messages.put(("call", (fn, args, kwargs, future)))
+    return await asyncio.wrap_future(future)
+
+
+@dataclass
+class CrawlStats:
+    pages: int = 0
+    rows: int = 0
+    duplicates: int = 0
+    fetch_errors: int = 0
+    elapsed: float = 0.0
+    coercion: Dict[str, FieldReport] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        failures = ", ".join(
+            f"{name} {r.failure_rate:.0%}" for name, r in self.coercion.items() if r.failed
+        )
+        return (
+            f"{self.rows} rows from {self.pages} pages in {self.elapsed:.1f}s "
+            f"({self.duplicates} duplicates, {self.fetch_errors} fetch errors)"
+            + (f"; coercion failures: {failures}" if failures else "")
+        )
+
+
+class CrawlRuntime:
+    """
+    Runs a schema against an endpoint directly, instead of generating and
+    executing a scraper for it. The strategy follows the endpoint type:
+
+    - default / tableful / javascript / pagination: extract the page, then crawl
+      the following pages (pagination.crawl_pages: `window` pages prefetched, at
+      most `per_host` at once) until one adds no new rows or `max_pages`
+    - scroll: keep scrolling and harvest only the new containers of each step
+      (scroll_harvester), up to `max_items` / `max_seconds`
+    - random: sample concurrently (random_sampler) until new rows dry up over
+      `patience` responses, coverage is high enough, or `max_samples` requests
+
+    Rows are deduped by content hash and coerced with one SchemaCoercer for the
+    whole crawl. `run()` yields rows as they're extracted, so it can feed a sink.
+    `requires_js` (the classifier's feature) sends every fetch to the browser.
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        endpoint_type: str,
+        fetcher: "HTMLFetcher",
+        max_pages: int = 50,
+        window: int = 4,
+        per_host: int = 2,
+        max_items: int = 5000,
+        max_seconds: float = 120.0,
+        max_samples: int = 200,
+        patience: int = 8,
+        requires_js: bool = False,
+    ):
+        endpoint_type = endpoint_type.lower()
+        if endpoint_type not in SUPPORTED_TYPES:
+            raise UnsupportedEndpoint(f"No crawl strategy for endpoint type {endpoint_type!r}")
+
+        self.schema = schema
+        self.endpoint_type = endpoint_type
+        self.fetcher = fetcher
+        self.max_pages = max_pages
+        self.window = window
+        self.per_host = per_host
+        self.max_items = max_items
+        self.max_seconds = max_seconds
+        self.max_samples = max_samples
+        self.patience = patience
+        self.requires_js = requires_js or endpoint_type == "javascript"
+
+        # Fall back to soupsieve for selectors cssselect can't compile
+        self.compiled = CompiledSchema.try_compile(schema)
+        self.coercer: Optional[SchemaCoercer] = None
+        self.stats = CrawlStats()
+        self._seen: Set[str] = set()
+
+    def run(self, url: str, document: Optional[Document] = None) -> Iterator[dict]:
+        """
+        Crawl from `url`, yielding unique rows. `document` is the already fetched
+        first page (e.g. from EndpointClassifier.probe), saving one fetch.
+        """
+        self.coercer = SchemaCoercer(self.schema, url)
+        self.stats = CrawlStats()
+        self._seen.clear()
+        start = time.perf_counter()
+
+        if self.endpoint_type == "random":
+            rows = self._run_random(url, document)
+        elif self.endpoint_type == "scroll":
+            rows = self._run_scroll(url)
+        else:
+            rows = self._run_paginated(url, document)
+
+        try:
+            yield from rows
+        finally:
+            self.stats.elapsed = time.perf_counter() - start
+            self.stats.coercion = self.coercer.report()
+
+    def extract(
+        self,
+        document: Document,
+        base_url: str,
+        schema: Optional[dict] = None,
+        compiled: Optional[CompiledSchema] = None,
+    ) -> List[dict]:
+        """
+        Rows of one page, coerced with the crawl's coercer (not deduped). A
+        variant `schema` (and its `compiled` form, if it compiles) overrides the
+        crawl's own.
+        """
+        if schema is None:
+            schema, compiled = self.schema, self.compiled
+        if compiled is not None:
+            return compiled.extract(document, base_url, self.coercer)
+        return list(iter_data(schema, document, base_url, self.coercer))
+
+    def _new_rows(self, document: Document, base_url: str, *variant) -> List[dict]:
+        self.stats.pages += 1
+        fresh = []
+        for row in self.extract(document, base_url, *variant):
+            key = row_key(row)
+            if key in self._seen:
+                self.stats.duplicates += 1
+                continue
+            self._seen.add(key)
+            fresh.append(row)
+        self.stats.rows += len(fresh)
+        return fresh
+
+    def _fetch(self, url: str, **kwargs) -> Optional[Document]:
+        try:
+            return self.fetcher.fetch_document(url, **kwargs)
+        except Exception as e:
+            logger.warning(f"Fetching {url} failed: {e}")
+            self.stats.fetch_errors += 1
+            return None
+
+    async def _afetch(self, url: str, use_cache: bool = True) -> Document:
+        """
+        Fetch for the async strategies (run through iterate_in_thread): cached and
+        plain-HTTP pages in worker threads, so they overlap; pages that need the
+        browser are rendered back on the caller's thread, on the fetcher's own
+        BrowserPool, so a crawl never starts a second Playwright driver.
+        """
+        if not self.requires_js:
+            document = await asyncio.to_thread(self.fetcher.fetch_static, url, use_cache)
+            if document is not None:
+                return document
+        return await call_in_caller(self.fetcher.fetch_document, url, use_cache, True)
+
+    def _run_paginated(self, url: str, document: Optional[Document]) -> Iterator[dict]:
+        async def pages():
+            async for _, rows in crawl_pages(
+                self._afetch,
+                url,
+                self._new_rows,
+                document,
+                window=self.window,
+                per_host=self.per_host,
+                max_pages=self.max_pages,
+            ):
+                yield rows
+
+        for rows in iterate_in_thread(pages):
+            yield from rows
+
+    def _run_scroll(self, url: str) -> Iterator[dict]:
+        # Pull only the containers each scroll step adds, never the whole page
+        harvester = ScrollHarvester(
+            self.schema["container_selector"],
+            max_items=self.max_items,
+            max_seconds=self.max_seconds,
+        )
+        items = item_schema(self.schema)
+        compiled_items = CompiledSchema.try_compile(items)
+        try:
+            with self.fetcher.open_page(url) as page:
+                for batch in harvester.iter_batches(page):
+                    document = Document(fragments_html(batch), url)
+                    yield from self._new_rows(document, url, items, compiled_items)
+        except PlaywrightError as e:
+            logger.warning(f"Scrolling {url} failed: {e}")
+            self.stats.fetch_errors += 1
+
+    def _run_random(self, url: str, document: Optional[Document]) -> Iterator[dict]:
+        fetch = None
+        if self.requires_js or self.fetcher.mode == "browser":
+            async def fetch(u: str) -> Document:
+                return await call_in_caller(self.fetcher.fetch_document, u, False, True)
+
+        sampler = RandomSampler(
+            self.extract,
+            fetch=fetch,
+            concurrency=self.per_host,
+            max_requests=self.max_samples,
+            window=self.patience,
+        )
+
+        async def samples():
+            try:
+                async for rows in sampler.sample(url, document):
+                    yield rows
+            finally:
+                await aclose_async_client()
+
+        try:
+            for rows in iterate_in_thread(samples):
+                self.stats.rows += len(rows)
+                yield from rows
+        finally:
+            self.stats.pages = sampler.stats.requests
+            self.stats.duplicates = sampler.stats.duplicates
+            self.stats.fetch_errors = sampler.stats.errors
@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup, Comment, Tag
+from lxml import etree
+
+from dom_stats import compute_dom_stats, NodeStats
+
+# Tags that never carry data we scrape
+USELESS_TAGS = ["script", "style", "noscript", "svg", "iframe", "canvas"]
+
+
+class Document:
+    """
+    Parse-once handle on a page, shared by every pipeline stage.
+
+    The tree is parsed lazily on first use. `clean()` strips useless tags in place,
+    so the cleaned tree *is* the parsed tree afterwards; the untouched markup stays
+    available as `raw_html`. Serialization, text, selector results and DOM stats are
+    cached and dropped whenever the tree is mutated through `clean()`.
+    """
+
+    def __init__(self, html: str, url: Optional[str] = None, parser: str = "lxml"):
+        self.raw_html = html
+        self.url = url
+        self.parser = parser
+        self.cleaned = False
+
+        self._soup: Optional[BeautifulSoup] = None
+        self._html: Optional[str] = None
+        self._size: Optional[int] = None
+        self._texts: Dict[Tuple[str, bool], str] = {}
+        self._selects: Dict[str, List[Tag]] = {}
+        self._stats: Optional[Dict[int, NodeStats]] = None
+        self._lxml_root: Optional[etree._Element] = None
+
+    @classmethod
+    def coerce(cls, value: Union["Document", str], url: Optional[str] = None) -> "Document":
+        """Accept either a Document or a raw HTML string (older call sites)."""
+        if isinstance(value, Document):
+            return value
+        return cls(value, url=url)
+
+    def copy(self) -> "Document":
+        """A fresh, unparsed Document over the same raw markup."""
+        return Document(self.raw_html, url=self.url, parser=self.parser)
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.raw_html, self.parser)
+        return self._soup
+
+    def clean(self, max_size: Optional[int] = None, tags: List[str] = USELESS_TAGS) -> "Document":
+        """Remove `tags` (and comments, if still over `max_size` bytes), in place."""
+        if self.cleaned:
+            return self
+
+        for tag in self.soup(tags):
+            tag.decompose()
+        self._invalidate()
+
+        if max_size is not None and self.size > max_size:
+            # If still too big, remove comments
+            for c in self.soup.find_all(string=lambda t: isinstance(t, Comment)):
+                c.extract()
+            self._invalidate()
+
+        self.cleaned = True
+        return self
+
+    def _invalidate(self):
+        self._html = None
+        self._size = None
+        self._texts.clear()
+        self._selects.clear()
+        self._stats = None
+        self._lxml_root = None
+
+    @property
+    def html(self) -> str:
+        """Serialized (cleaned, if clean() ran) markup."""
+        if self._html is None:
+            self._html = str(self.soup)
+        return self._html
+
+    @property
+    def size(self) -> int:
+        """Size of `html` in bytes."""
+        if self._size is None:
+            self._size = len(self.html.encode("utf-8"))
+        return self._size
+
+    def get_text(self, separator: str = "", strip: bool = True) -> str:
+        key = (separator, strip)
+        if key not in self._texts:
+            self._texts[key] = self.soup.get_text(separator, strip=strip)
+        return self._texts[key]
+
+    @property
+    def text(self) -> str:
+        return self.get_text()
+
+    def select(self, selector: str) -> List[Tag]:
+        """soup.select(), memoized per selector. Don't mutate the returned tags."""
+        if selector not in self._selects:
+            self._selects[selector] = self.soup.select(selector)
+        return self._selects[selector]
+
+    def select_one(self, selector: str) -> Optional[Tag]:
+        found = self.select(selector)
+        return found[0] if found else None
+
+    @property
+    def stats(self) -> Dict[int, NodeStats]:
+        """compute_dom_stats() over the whole tree, keyed by id(tag)."""
+        if self._stats is None:
+            self._stats = compute_dom_stats(self.soup)
+        return self._stats
+
+    @property
+    def lxml_root(self) -> etree._Element:
+        """lxml tree of `html`, for XPath-based extraction (see compiled_schema)."""
+        if self._lxml_root is None:
+            # Untouched documents skip the BeautifulSoup parse entirely
+            source = self.raw_html if self._soup is None else self.html
+            self._lxml_root = parse_lxml(source)
+        return self._lxml_root
+
+    def __str__(self) -> str:
+        return self.html
+
+    def __repr__(self) -> str:
+        return f"<Document url={self.url!r} cleaned={self.cleaned}>"
+
+    def __len__(self) -> int:
+        return len(self.html)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self.html
+
+
+def parse_lxml(html: str) -> etree._Element:
+    # Feed bytes with an explicit encoding: lxml rejects str input that carries an
+    # XML encoding declaration, and a stale <meta charset> must not win either
+    parser = etree.HTMLParser(encoding="utf-8")
+    root = etree.fromstring(html.encode("utf-8"), parser)
+    if root is None:  # Empty document
+        root = etree.fromstring(b"<html></html>", parser)
+    return root
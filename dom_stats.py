@@ -0,0 +1,173 @@
+from collections import Counter
+from typing import Dict
+
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
+
+# Strings that count towards get_text() (comments, doctypes, script bodies... don't)
+TEXT_TYPES = (NavigableString, CData)
+_TEXT_TYPE_SET = set(TEXT_TYPES)
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+NAV_KEYWORDS = [
+    "login",
+    "register",
+    "my account",
+    "sign in",
+    "sign up",
+    "logout",
+    "terms of use",
+    "privacy policy",
+    "copyright",
+    "sitemap",
+    "facebook",
+    "twitter",
+    "instagram",
+    "linkedin",
+    "follow us",
+    "account",
+    "profile",
+    "wishlist",
+    "favorite",
+    "cart",
+    "basket",
+    "checkout",
+    "sipariş",
+    "alışveriş",
+    "favori",
+]
+
+
+class NodeStats:
+    """
+    Subtree aggregates for one tag. Counts cover descendants only (not the tag
+    itself), matching what `tag.find_all(...)` would return.
+    """
+
+    __slots__ = (
+        "stripped_len",
+        "text_pieces",
+        "link_count",
+        "link_text_len",
+        "img_count",
+        "serialized_size",
+        "child_tags",
+        "nav_hits",
+    )
+
+    def __init__(self):
+        self.stripped_len = 0  # len(tag.get_text(strip=True))
+        self.text_pieces = 0  # non-empty strings in the subtree
+        self.link_count = 0
+        self.link_text_len = 0  # sum(len(a.get_text(strip=True)) for a in links)
+        self.img_count = 0
+        self.serialized_size = 0  # ~len(str(tag)), ignoring entity escaping
+        self.child_tags: Counter = Counter()  # direct children only
+        self.nav_hits = 0  # bitmask over NAV_KEYWORDS
+
+    @property
+    def text_len(self) -> int:
+        """len(tag.get_text(" ", strip=True))"""
+        return self.stripped_len + max(self.text_pieces - 1, 0)
+
+    @property
+    def nav_keyword_matches(self) -> int:
+        return bin(self.nav_hits).count("1")
+
+    @property
+    def max_child_repeat(self) -> int:
+        return max(self.child_tags.values(), default=0)
+
+
+def _keyword_mask(text: str) -> int:
+    mask = 0
+    for bit, keyword in enumerate(NAV_KEYWORDS):
+        if keyword in text:
+            mask |= 1 << bit
+    return mask
+
+
+def _open_tag_size(tag: Tag) -> int:
+    size = len(tag.name) + 2  # <name>
+    for key, value in tag.attrs.items():
+        if isinstance(value, list):
+            value = " ".join(value)
+        size += len(key) + len(str(value)) + 4  # ' key="value"'
+    return size
+
+
+def compute_dom_stats(root: Tag) -> Dict[int, NodeStats]:
+    """
+    One post-order pass over `root`, returning NodeStats keyed by `id(tag)` for
+    `root` and every tag below it. Linear in document size, so heuristics that
+    read these instead of calling get_text/find_all per block stay O(n) overall.
+
+    Keyword hits are matched per text node, so a phrase split across two
+    elements ("my <b>account</b>") isn't seen as one; single words still are.
+    """
+    stats: Dict[int, NodeStats] = {}
+    # What parents add up; differs from `stats` only for <script>/<style>-like tags
+    totals: Dict[int, NodeStats] = {}
+
+    # Reversed document order visits every child before its parent
+    tags = [root]
+    tags.extend(d for d in root.descendants if isinstance(d, Tag))
+
+    for tag in reversed(tags):
+        node = NodeStats()
+
+        for child in tag.contents:
+            if isinstance(child, Tag):
+                c = totals[id(child)]
+                node.stripped_len += c.stripped_len
+                node.text_pieces += c.text_pieces
+                node.link_count += c.link_count
+                node.link_text_len += c.link_text_len
+                node.img_count += c.img_count
+                node.serialized_size += c.serialized_size
+                node.nav_hits |= c.nav_hits
+                node.child_tags[child.name] += 1
+
+                if child.name == "a":
+                    node.link_count += 1
+                    node.link_text_len += c.stripped_len
+                elif child.name == "img":
+                    node.img_count += 1
+
+            else:
+                if type(child) in TEXT_TYPES:
+                    text = child.strip()
+                    if text:
+                        node.stripped_len += len(text)
+                        node.text_pieces += 1
+                        node.nav_hits |= _keyword_mask(text.lower())
+                # <!--...-->, <![CDATA[...]]> and friends
+                node.serialized_size += len(child.PREFIX) + len(child) + len(child.SUFFIX)
+
+        if not isinstance(tag, BeautifulSoup):
+            node.serialized_size += _open_tag_size(tag)
+            if tag.name not in VOID_TAGS:
+                node.serialized_size += len(tag.name) + 3  # </name>
+
+        totals[id(tag)] = stats[id(tag)] = node
+        if set(tag.interesting_string_types) != _TEXT_TYPE_SET:
+            # A <script>'s own get_text() reads its Script strings, its parents' don't
+            stats[id(tag)] = _own_text_stats(tag, node)
+
+    return stats
+
+
+def _own_text_stats(tag: Tag, node: NodeStats) -> NodeStats:
+    own = NodeStats()
+    for name in NodeStats.__slots__:
+        setattr(own, name, getattr(node, name))
+    texts = list(tag.stripped_strings)
+    own.stripped_len = sum(map(len, texts))
+    own.text_pieces = len(texts)
+    own.nav_hits = 0
+    for text in texts:
+        own.nav_hits |= _keyword_mask(text.lower())
+    return own
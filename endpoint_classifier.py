@@ -1,11 +1,38 @@
 import asyncio
-import requests
 import json
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Iterable, Optional, Union, Tuple
 from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
 from collections import Counter
+from browser_pool import AsyncBrowserPool
+from document import Document
+from fetch_profiles import aapply_profile, get_profile, RouteStats
+from settle import asettle
+from http_client import aclose_async_client, decode_html, get_async_client
+from html_cache import HTMLCache, RAW_CACHE_PROFILE
+import tracing
+
+# Raw pages with less visible text than this are assumed to be rendered client-side
+MIN_STATIC_TEXT_LEN = 500
+
+# Raw and rendered pages are parsed with html.parser, as the classifier always
+# has: lxml repairs broken markup differently, which shifts the text lengths and
+# container counts the thresholds (requires_js compares the two) were tuned on
+RAW_PARSER = "html.parser"
+
+# Mount points of common SPA frameworks; empty in the raw HTML when rendered client-side
+SPA_ROOT_SELECTOR = "#root, #app, #__next, #__nuxt, [data-reactroot], app-root"
+
+
+def looks_js_dependent(raw: Document) -> bool:
+    """Static check on a raw (un-rendered) response: does it need a browser to show its content?"""
+    if len(raw.text) < MIN_STATIC_TEXT_LEN:
+        return True
+
+    root = raw.select_one(SPA_ROOT_SELECTOR)
+    return root is not None and len(root.get_text(strip=True)) < MIN_STATIC_TEXT_LEN
 
 @dataclass
 class EndpointFeatures:
@@ -19,84 +46,238 @@ class EndpointFeatures:
     login_required: bool = False
 
 class EndpointClassifier:
-    def __init__(self, url: str, js_wait: float = 2.5, scroll_wait: float = 2.0, timeout: int = 30000):
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+
+    def __init__(self, url: str, js_wait: float = 2.5, scroll_wait: float = 2.0, timeout: int = 30000,
+                 pool: Optional[AsyncBrowserPool] = None, profile: str = "full",
+                 cache: Optional[HTMLCache] = None, settle_wait: float = 5.0):
         self.url = url
         self.js_wait = js_wait
         self.scroll_wait = scroll_wait
         self.timeout = timeout
+        # Upper bound (seconds) for the post-load settle; pages that never stop
+        # mutating (tickers, carousels) would otherwise hold it for the whole timeout
+        self.settle_wait = settle_wait
+        # Share a pool across classifiers; without one we spin up a single-page pool per call
+        self.pool = pool
+        # Resource blocking for the rendered load (see fetch_profiles.PROFILES). Defaults
+        # to "full": blocked images change layout and scrollHeight, which the
+        # infinite_scroll check (h2 > h1 * 1.5) is calibrated on
+        self.profile = get_profile(profile)
+        self.route_stats: Optional[RouteStats] = None
+        self._raw_html = ""
+        # The raw response is written to the cache for HTMLFetcher to reuse, but never
+        # read back here: the randomness check needs two live samples and the scroll
+        # probe a live page either way. To classify offline, replay a HAR (session_replay)
+        if cache is not None and cache.offline:
+            raise ValueError(
+                "EndpointClassifier needs live responses; replay a recorded HAR "
+                "(session_replay.replaying) to classify offline"
+            )
+        self.cache = cache
+        # Seconds per stage of the last classification (stages overlap; see _analyze)
+        self.timings: Dict[str, float] = {}
 
     async def classify(self) -> Dict[str, Any]:
-        features = await self._analyze()
-        endpoint_type = self._classify(features)
-        return {"type": endpoint_type, "features": features.__dict__}
+        features, _ = await self._analyze()
+        return self._result(features)
+
+    async def probe(self, max_page_size: int = 3 * 1024 * 1024) -> Tuple[Dict[str, Any], Document]:
+        """
+        Classify the endpoint AND capture its HTML in the same rendered navigation,
+        so the pipeline doesn't load the page a second time through HTMLFetcher.
+        Returns (classify() result, cleaned Document of the post-scroll page).
+        """
+        features, rendered_html = await self._analyze(capture=True)
+        # Fall back to the raw response if the browser couldn't render anything
+        html = rendered_html if rendered_html is not None else self._raw_html
+        document = Document(html, url=self.url).clean(max_size=max_page_size)
+        return self._result(features), document
+
+    @classmethod
+    async def classify_many(cls, urls: Iterable[str], concurrency: int = 8,
+                            pool: Optional[AsyncBrowserPool] = None,
+                            **kwargs) -> Dict[str, Union[Dict[str, Any], Exception]]:
+        """
+        Classify many URLs on one event loop, `concurrency` at a time, sharing one
+        browser pool and the loop's HTTP client (closed before returning). Returns
+        {url: classify() result}, with the exception instead of a result for URLs
+        that failed. `kwargs` go to each EndpointClassifier.
+        """
+        urls = list(dict.fromkeys(urls))
+        owns_pool = pool is None
+        if owns_pool:
+            # Every in-flight classification renders on a page of its own
+            pool = AsyncBrowserPool(browsers=max(1, -(-concurrency // 4)),
+                                    pages_per_browser=min(concurrency, 4),
+                                    user_agent=cls.USER_AGENT)
+        slots = asyncio.Semaphore(concurrency)
 
-    def _fetch_raw_html(self) -> str:
+        async def classify_one(url: str) -> Union[Dict[str, Any], Exception]:
+            async with slots:
+                try:
+                    return await cls(url, pool=pool, **kwargs).classify()
+                except Exception as e:
+                    return e
+
+        try:
+            results = await asyncio.gather(*(classify_one(url) for url in urls))
+        finally:
+            if owns_pool:
+                await pool.close()
+            await aclose_async_client()
+        return dict(zip(urls, results))
+
+    @contextmanager
+    def _timed(self, stage: str):
+        start = time.perf_counter()
         try:
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/119.0.0.0"}
-            return requests.get(self.url, headers=headers, timeout=10).text
-        except:
+            with tracing.span(f"classify.{stage}"):
+                yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    async def _timed_call(self, stage: str, awaitable):
+        with self._timed(stage):
+            return await awaitable
+
+    def _result(self, features: EndpointFeatures) -> Dict[str, Any]:
+        return {"type": self._classify(features), "features": features.__dict__}
+
+    async def _fetch_raw_html(self, store: bool = False) -> str:
+        """Live raw GET over the loop's pooled async client; with `store`, written to the HTML cache."""
+        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/119.0.0.0"}
+        try:
+            response = await get_async_client().get(self.url, headers=headers, timeout=10)
+        except Exception:  # Not bare: cancelling a classification must propagate
             return ""
+        tracing.add(bytes_in=len(response.content))
 
-    async def _analyze(self) -> EndpointFeatures:
-        raw_html = self._fetch_raw_html()
-        soup_raw = BeautifulSoup(raw_html, "html.parser")
-        raw_text_len = len(soup_raw.get_text(strip=True))
-        
-        # Static feature detection
+        text = decode_html(response)
+        if store and self.cache is not None and response.is_success:
+            # SQLite writes are blocking; keep them off the loop
+            await asyncio.to_thread(
+                self.cache.put, self.url, RAW_CACHE_PROFILE, "raw", text,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+            )
+        return text
+
+    def _static_features(self, raw_html: str) -> Tuple[EndpointFeatures, Document]:
+        raw_doc = Document(raw_html, url=self.url, parser=RAW_PARSER)
+        soup_raw = raw_doc.soup
         features = EndpointFeatures(
             has_viewstate="__VIEWSTATE" in raw_html or "__EVENTVALIDATION" in raw_html,
             has_table=bool(soup_raw.find("table")),
             has_repeating_containers=self._count_containers(soup_raw) >= 3
         )
+        raw_doc.text  # Warm the text cache here too, not on the loop
+        return features, raw_doc
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
-            )
-            page = await context.new_page()
+    async def _render(self, features: EndpointFeatures,
+                      capture: bool) -> Tuple[Optional[int], Optional[str]]:
+        pool = self.pool or AsyncBrowserPool(pages_per_browser=1, user_agent=self.USER_AGENT)
+        try:
+            async with pool.page() as page, aapply_profile(page, self.url, self.profile) as stats:
+                self.route_stats = stats
+                return await self._probe_rendered(page, features, capture)
+        finally:
+            if pool is not self.pool:
+                await pool.close()
+
+    async def _analyze(self, capture: bool = False) -> Tuple[EndpointFeatures, Optional[str]]:
+        self.timings = {}
+        with self._timed("total"):
+            return await self._analyze_timed(capture)
+
+    async def _analyze_timed(self, capture: bool) -> Tuple[EndpointFeatures, Optional[str]]:
+        """
+        Raw fetch, the randomness re-fetch and the rendered load all run at once;
+        none of them depends on another until the features are combined below.
+        """
+        # Rendered checks fill these in; the static ones are merged in afterwards
+        rendered = EndpointFeatures()
+
+        raw_html, live_sample, (rendered_text_len, rendered_html) = await asyncio.gather(
+            self._timed_call("raw_fetch", self._fetch_raw_html(store=True)),
+            # Second sample for the randomness check
+            self._timed_call("random_sample", self._fetch_raw_html()),
+            self._timed_call("render", self._render(rendered, capture)),
+        )
+        self._raw_html = raw_html
+
+        # Static feature detection (parsing is CPU-bound)
+        with self._timed("static_parse"):
+            features, raw_doc = await asyncio.to_thread(self._static_features, raw_html)
+        raw_text_len = len(raw_doc.text)
+
+        features.has_auth_wall = rendered.has_auth_wall
+        features.login_required = rendered.login_required
+        features.infinite_scroll = rendered.infinite_scroll
+        if rendered_text_len is not None:
+            # Javascript Detection
+            # Trigger if text content doubles OR if raw page was basically empty (< 500 chars)
+            features.requires_js = (raw_text_len < MIN_STATIC_TEXT_LEN) or (rendered_text_len > raw_text_len * 2.0)
+
+        # Randomness check, reusing the raw fetch as the first sample
+        with self._timed("randomness"):
+            features.is_random = await self._detect_randomness(live_sample, raw_doc.text)
+        return features, rendered_html
+
+    async def _probe_rendered(self, page, features: EndpointFeatures,
+                              capture: bool = False) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Feature checks on the rendered page. Returns (rendered text length, or None
+        if the page couldn't be read; post-scroll HTML if `capture`).
+        """
+        rendered_html = None
+        rendered_text_len = None
+        try:
+            # Settling (quiet DOM + network) helps X.com fully load the login modal,
+            # without paying networkidle's fixed 500ms+ on pages that are already done
+            with self._timed("navigate"):
+                await page.goto(self.url, timeout=self.timeout, wait_until="domcontentloaded")
+                await asettle(page, max_wait=self.settle_wait, scroll=False)
             
-            try:
-                # wait_until="networkidle" helps X.com fully load the login modal
-                await page.goto(self.url, timeout=self.timeout, wait_until="networkidle")
-                
-                # Double check specific redirections
-                if "login" in page.url or "checkpoint" in page.url:
-                    features.has_auth_wall = True
+            # Double check specific redirections
+            if "login" in page.url or "checkpoint" in page.url:
+                features.has_auth_wall = True
+
+            # One parse shared by the text-length check and both auth detectors
+            rendered = Document(await page.content(), url=page.url, parser=RAW_PARSER)
+            rendered_text_len = len(rendered.text)
+
+            # Auth Wall Detection (The X.com Fix)
+            if not features.has_auth_wall:
+                features.login_required = self._detect_login_required(rendered)
+                features.has_auth_wall = self._detect_auth_wall(rendered)
 
+            # Smart Scroll Detection (The Quotes vs Reddit Fix)
+            # One scroll pass; scroll_wait is now an upper bound, not a fixed sleep. The
+            # page settled above, so scroll right away and spend all of scroll_wait after it
+            with self._timed("scroll_probe"):
+                scrolled = await asettle(page, max_wait=self.scroll_wait, max_scrolls=1,
+                                         settle_first=False)
+            h1, h2 = scrolled.initial_height, scrolled.final_height
+            
+            # It is infinite scroll if:
+            # A) It grew by a massive amount (2000px+) -> Catches big social feeds
+            # B) OR It grew by 50% relative to original size -> Catches small demo sites
+            features.infinite_scroll = (h2 - h1 > 2000) or (h2 > h1 * 1.5)
+
+            if capture:
+                # Content after the scroll wait, so lazy-loaded items are included
                 rendered_html = await page.content()
-                soup_rendered = BeautifulSoup(rendered_html, "html.parser")
-                rendered_text_len = len(soup_rendered.get_text(strip=True))
-
-                # 1. Javascript Detection
-                # Trigger if text content doubles OR if raw page was basically empty (< 500 chars)
-                features.requires_js = (raw_text_len < 500) or (rendered_text_len > raw_text_len * 2.0)
-
-                # 2. Auth Wall Detection (The X.com Fix)
-                if not features.has_auth_wall:
-                    features.login_required = self._detect_login_required(rendered_html)
-                    features.has_auth_wall = self._detect_auth_wall(rendered_html)
-
-                # 3. Smart Scroll Detection (The Quotes vs Reddit Fix)
-                h1 = await page.evaluate("document.body.scrollHeight")
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(self.scroll_wait)
-                h2 = await page.evaluate("document.body.scrollHeight")
-                
-                # It is infinite scroll if:
-                # A) It grew by a massive amount (2000px+) -> Catches big social feeds
-                # B) OR It grew by 50% relative to original size -> Catches small demo sites
-                features.infinite_scroll = (h2 - h1 > 2000) or (h2 > h1 * 1.5)
-
-            except Exception as e:
-                # If page crashes/timeouts, assume unsupported if we can't read it
-                pass
-            finally:
-                await browser.close()
-
-        # Randomness check (static)
-        features.is_random = self._detect_randomness()
-        return features
+
+        except Exception as e:
+            # If page crashes/timeouts, assume unsupported if we can't read it
+            if capture and rendered_html is None:
+                try:
+                    rendered_html = await page.content()  # Partial content beats none
+                except Exception:
+                    pass
+
+        return rendered_text_len, rendered_html
 
     def _classify(self, f: EndpointFeatures) -> str:
         # Priority 1: Blocking Walls (X.com, Facebook)
@@ -140,22 +321,21 @@ class EndpointClassifier:
         # Return the count of the most common container type
         return max(selector_counts.values())
 
-    def _detect_login_required(self, html: str) -> bool:
-        soup = BeautifulSoup(html, "lxml")
-        text = soup.get_text(" ", strip=True).lower()
+    def _detect_login_required(self, html: Union[str, Document]) -> bool:
+        text = Document.coerce(html).get_text(" ", strip=True).lower()
         phrases = ["log in to continue", "sign in to", "login required", "please login"]
         # Only flag if page is relatively empty (avoids false positives in footer text)
         return any(p in text for p in phrases) and len(text) < 3000
 
-    def _detect_auth_wall(self, html: str) -> bool:
-        soup = BeautifulSoup(html, "lxml")
+    def _detect_auth_wall(self, html: Union[str, Document]) -> bool:
+        doc = Document.coerce(html)
         
         # 1. Structural React/Next.js markers (X and Facebook use these heavily)
-        if soup.select_one('[data-testid*="login"], [data-testid*="signup"], [data-testid*="apple"], [data-testid*="google"]'):
+        if doc.select_one('[data-testid*="login"], [data-testid*="signup"], [data-testid*="apple"], [data-testid*="google"]'):
             return True
             
         # 2. Path-based check (if Playwright stayed on a login-heavy path)
-        text = soup.get_text(" ", strip=True).lower()
+        text = doc.get_text(" ", strip=True).lower()
         
         # 3. Keyword Density Check
         # On X.com, "Sign up" and "Log in" appear many times in buttons and headers
@@ -168,14 +348,14 @@ class EndpointClassifier:
             
         return False
 
-    def _detect_randomness(self) -> bool:
+    async def _detect_randomness(self, sample: str, first_text: Optional[str] = None) -> bool:
         # Check randomness using raw requests to be fast
         try:
-            t1 = self._fetch_raw_html()
-            t2 = self._fetch_raw_html()
-            # Compare the first 500 chars of text content
-            s1 = BeautifulSoup(t1, "lxml").get_text(strip=True)[:500]
-            s2 = BeautifulSoup(t2, "lxml").get_text(strip=True)[:500]
+            if first_text is None:
+                first_text = Document(await self._fetch_raw_html(), parser=RAW_PARSER).text
+            # Compare the first 500 chars of text content (both samples parsed alike)
+            s1 = first_text[:500]
+            s2 = Document(sample, parser=RAW_PARSER).text[:500]
             return s1 != s2
-        except:
+        except Exception:
             return False
@@ -0,0 +1,113 @@
+import hashlib
+import json
+from typing import Iterator, Optional
+from urllib.parse import urljoin
+
+from coercion import SchemaCoercer, cast_value  # noqa: F401 (cast_value re-exported)
+from document import Document
+
+
+def extract_data(
+    schema: dict,
+    html: "str | Document",
+    base_url: str | None = None,
+    coercer: Optional[SchemaCoercer] = None,
+) -> list[dict]:
+    return list(iter_data(schema, html, base_url, coercer))
+
+
+def iter_data(
+    schema: dict,
+    html: "str | Document",
+    base_url: str | None = None,
+    coercer: Optional[SchemaCoercer] = None,
+) -> Iterator[dict]:
+    """
+    Like extract_data, but yields rows as they're processed (in column-coerced
+    batches of coercion.CHUNK_SIZE). Pass a `coercer` to keep its detected
+    formats across pages and read its per-field failure report afterwards.
+    """
+    coercer = coercer or SchemaCoercer(schema, base_url)
+    return coercer.coerce_stream(_iter_raw(schema, html, base_url))
+
+
+def _iter_raw(schema: dict, html: "str | Document", base_url: str | None) -> Iterator[dict]:
+    doc = Document.coerce(html, url=base_url)
+
+    containers = doc.select(schema["container_selector"])
+
+    for c in containers:
+        item = {}
+
+        for field, spec in schema["fields"].items():
+            elements = c.select(spec["selector"])
+
+            values = []
+            for el in elements:
+                if spec.get("attribute"):
+                    attr = el.get(spec["attribute"])
+
+                    if isinstance(attr, list):
+                        val = attr[0] if attr else None
+                    else:
+                        val = attr
+
+                    if isinstance(val, str) and base_url:
+                        val = urljoin(base_url, val)
+                else:
+                    val = el.get_text(strip=True)
+
+                if val:
+                    values.append(val)
+
+            # Handle single vs multi value
+            if not values:
+                item[field] = None
+            elif spec.get("type", "").endswith("[]"):
+                item[field] = values
+            else:
+                item[field] = values[0]
+
+        # Keep only non-empty rows
+        if any(v is not None for v in item.values()):
+            yield item
+
+
+def row_key(row: dict) -> str:
+    """Content hash of a row, for deduping across pages and samples."""
+    payload = json.dumps(row, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def validate_schema(schema, html, endpoint_type="DEFAULT"):
+    doc = Document.coerce(html)
+
+    containers = doc.select(schema["container_selector"])
+    if not containers:
+        return {"valid": False, "reason": "No containers"}
+
+    min_coverage = {
+        "RANDOM": 0.1,
+        "SCROLL": 0.3,
+        "PAGINATION": 0.3,
+        "TABLE": 0.1,
+        "DEFAULT": 0.5,
+    }.get(endpoint_type, 0.5)
+
+    field_scores = []
+    for field, spec in schema["fields"].items():
+        matches = 0
+        for c in containers:
+            el = c.select_one(spec["selector"])
+            if el:
+                matches += 1
+
+        coverage = matches / len(containers)
+        field_scores.append(coverage)
+
+    confidence = sum(field_scores) / len(field_scores)
+    return {
+        "valid": confidence >= min_coverage,
+        "confidence": round(confidence, 2),
+        "containers_found": len(containers),
+    }
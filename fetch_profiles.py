@@ -0,0 +1,230 @@
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Tuple, Union
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Ad / analytics hosts whose requests never affect the DOM we keep
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.io",
+    "segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "newrelic.com",
+    "nr-data.net",
+    "sentry.io",
+    "clarity.ms",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "adnxs.com",
+    "yandex.ru",
+)
+
+# Rough median transfer sizes per resource type (bytes). Aborted requests never
+# report a size, so "bytes saved" is an estimate built from these.
+TYPICAL_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+    "document": 30_000,
+}
+DEFAULT_TYPICAL_BYTES = 5_000
+
+# Second-level labels that belong to the public suffix (example.co.uk, site.com.tr)
+_SHARED_SLDS = {"co", "com", "org", "net", "gov", "ac", "edu"}
+
+
+@dataclass(frozen=True)
+class FetchProfile:
+    name: str
+    blocked_resource_types: FrozenSet[str] = frozenset()
+    blocked_domains: Tuple[str, ...] = ()
+    block_third_party: bool = False  # Anything not on the page's own site
+
+    @property
+    def intercepts(self) -> bool:
+        return bool(
+            self.blocked_resource_types or self.blocked_domains or self.block_third_party
+        )
+
+
+PROFILES: Dict[str, FetchProfile] = {
+    # Load everything, like a normal browser
+    "full": FetchProfile("full"),
+    # Skip bytes that never reach the DOM: images, media, fonts and trackers
+    "dom-only": FetchProfile(
+        "dom-only",
+        blocked_resource_types=frozenset({"image", "media", "font"}),
+        blocked_domains=TRACKER_DOMAINS,
+    ),
+    # Also drop CSS and every third-party request. Fastest, but breaks sites
+    # that render from a CDN-hosted bundle; use "dom-only" for those.
+    "minimal": FetchProfile(
+        "minimal",
+        blocked_resource_types=frozenset(
+            {"image", "media", "font", "stylesheet", "manifest", "texttrack", "eventsource", "websocket", "other"}
+        ),
+        blocked_domains=TRACKER_DOMAINS,
+        block_third_party=True,
+    ),
+}
+
+ProfileLike = Union[str, FetchProfile]
+
+
+def get_profile(profile: ProfileLike) -> FetchProfile:
+    if isinstance(profile, FetchProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown fetch profile {profile!r}, expected one of {list(PROFILES)}")
+
+
+@dataclass
+class RouteStats:
+    """Per-page request accounting for one navigation under a FetchProfile."""
+
+    profile: str
+    requests_allowed: int = 0
+    requests_blocked: int = 0
+    bytes_loaded: int = 0  # From Content-Length, so chunked responses count as 0
+    bytes_saved_estimate: int = 0
+    blocked_by_type: Counter = field(default_factory=Counter)
+
+    @property
+    def requests_total(self) -> int:
+        return self.requests_allowed + self.requests_blocked
+
+    def summary(self) -> str:
+        return (
+            f"[{self.profile}] blocked {self.requests_blocked}/{self.requests_total} requests, "
+            f"~{self.bytes_saved_estimate / 1024:.0f} KB saved, "
+            f"{self.bytes_loaded / 1024:.0f} KB loaded"
+        )
+
+
+def site_of(host: str) -> str:
+    """Approximate registrable domain: 'www.shop.example.co.uk' -> 'example.co.uk'."""
+    labels = host.lower().rstrip(".").split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SHARED_SLDS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def _should_block(profile: FetchProfile, page_site: str, url: str, resource_type: str) -> bool:
+    if resource_type == "document":
+        return False  # Never abort the navigation itself
+
+    if resource_type in profile.blocked_resource_types:
+        return True
+
+    host = urlparse(url).hostname or ""
+    if any(host == d or host.endswith("." + d) for d in profile.blocked_domains):
+        return True
+
+    if profile.block_third_party and host and site_of(host) != page_site:
+        return True
+
+    return False
+
+
+def _record(stats: RouteStats, blocked: bool, resource_type: str):
+    if blocked:
+        stats.requests_blocked += 1
+        stats.blocked_by_type[resource_type] += 1
+        stats.bytes_saved_estimate += TYPICAL_BYTES.get(resource_type, DEFAULT_TYPICAL_BYTES)
+    else:
+        stats.requests_allowed += 1
+
+
+def _content_length(response) -> int:
+    try:
+        return int(response.headers.get("content-length", 0))
+    except ValueError:
+        return 0
+
+
+@contextmanager
+def apply_profile(page, url: str, profile: ProfileLike = "full"):
+    """
+    Route `page`'s requests through `profile` for the duration of the block and
+    yield its RouteStats (sync Playwright API).
+    """
+    profile = get_profile(profile)
+    stats = RouteStats(profile=profile.name)
+    page_site = site_of(urlparse(url).hostname or "")
+
+    def on_route(route):
+        request = route.request
+        blocked = _should_block(profile, page_site, request.url, request.resource_type)
+        _record(stats, blocked, request.resource_type)
+        if blocked:
+            route.abort()
+        else:
+            # fallback, not continue_, so context routes (HAR replay) still see it
+            route.fallback()
+
+    def on_response(response):
+        stats.bytes_loaded += _content_length(response)
+
+    page.on("response", on_response)
+    if profile.intercepts:
+        page.route("**/*", on_route)
+    try:
+        yield stats
+    finally:
+        if profile.intercepts:
+            page.unroute("**/*", on_route)
+        page.remove_listener("response", on_response)
+        logger.debug("%s: %s", url, stats.summary())
+
+
+@asynccontextmanager
+async def aapply_profile(page, url: str, profile: ProfileLike = "full"):
+    """Async twin of `apply_profile`."""
+    profile = get_profile(profile)
+    stats = RouteStats(profile=profile.name)
+    page_site = site_of(urlparse(url).hostname or "")
+
+    async def on_route(route):
+        request = route.request
+        blocked = _should_block(profile, page_site, request.url, request.resource_type)
+        _record(stats, blocked, request.resource_type)
+        if blocked:
+            await route.abort()
+        else:
+            await route.fallback()
+
+    def on_response(response):
+        stats.bytes_loaded += _content_length(response)
+
+    page.on("response", on_response)
+    if profile.intercepts:
+        await page.route("**/*", on_route)
+    try:
+        yield stats
+    finally:
+        if profile.intercepts:
+            await page.unroute("**/*", on_route)
+        page.remove_listener("response", on_response)
+        logger.debug("%s: %s", url, stats.summary())
@@ -0,0 +1,317 @@
+"""
+Local fixture site with one synthetic page per endpoint type, so fetching,
+classification and generated scrapers can be benchmarked offline and
+reproducibly.
+
+    python fixture_server.py --port 8765 --latency 0.05 --dataset fixtures.json
+    python classification_benchmark.py --dataset fixtures.json
+
+Pages (every one takes ?latency=<seconds>, ?items=<n> and ?pad_kb=<n> overrides):
+
+    /default      product cards in static HTML                 -> default
+    /tableful     the same products as a table                 -> tableful
+    /scroll       empty feed, batches lazy-loaded on scroll    -> scroll
+    /random       a different random selection every request   -> random
+    /paginated    ?page=N with a rel=next link                 -> default
+    /login        sign-in wall                                 -> unsupported
+    /js           client-side rendered app                     -> javascript
+"""
+import argparse
+import html
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Label EndpointClassifier should give each page
+EXPECTED_LABELS = {
+    "/default": "default",
+    "/tableful": "tableful",
+    "/scroll": "scroll",
+    "/random": "random",
+    "/paginated": "default",
+    "/login": "unsupported",
+    "/js": "javascript",
+}
+
+ADJECTIVES = ["Classic", "Modern", "Rustic", "Compact", "Deluxe", "Vintage", "Smart", "Portable"]
+NOUNS = ["Lamp", "Chair", "Kettle", "Backpack", "Notebook", "Speaker", "Watch", "Blanket"]
+
+
+def make_item(i: int) -> Dict[str, str]:
+    """Deterministic synthetic product #i."""
+    return {
+        "title": f"{ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[(i // len(ADJECTIVES)) % len(NOUNS)]} #{i}",
+        "price": f"£{(i * 37) % 1000 + 1}.{(i * 13) % 100:02d}",
+        "rating": str(i % 5 + 1),
+        "date": f"{i % 28 + 1} Jan 2024",
+        "url": f"/item/{i}",
+        "description": f"Item {i} is a dependable choice for everyday use, rated {i % 5 + 1} out of 5.",
+    }
+
+
+def _card(item: Dict[str, str]) -> str:
+    e = {k: html.escape(v) for k, v in item.items()}
+    return (
+        f'<article class="product">'
+        f'<h3><a href="{e["url"]}">{e["title"]}</a></h3>'
+        f'<p class="price">{e["price"]}</p>'
+        f'<p class="rating">{e["rating"]} stars</p>'
+        f'<time>{e["date"]}</time>'
+        f'<p class="description">{e["description"]}</p>'
+        f"</article>"
+    )
+
+
+def _row(item: Dict[str, str]) -> str:
+    e = {k: html.escape(v) for k, v in item.items()}
+    return (
+        f'<tr><td><a href="{e["url"]}">{e["title"]}</a></td><td>{e["price"]}</td>'
+        f'<td>{e["rating"]}</td><td>{e["date"]}</td></tr>'
+    )
+
+
+def _page(title: str, body: str, pad_kb: int = 0) -> str:
+    # Padding is a comment: it adds bytes to transfer and parse, not visible text
+    padding = f"<!-- {'x' * (pad_kb * 1024)} -->" if pad_kb else ""
+    return (
+        f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title></head>"
+        f"<body><header><h1>{html.escape(title)}</h1></header><main>{body}</main>{padding}</body></html>"
+    )
+
+
+SCROLL_SCRIPT = """
+<script>
+let next = 0, loading = false, done = false;
+async function loadMore() {
+  if (loading || done) return;
+  loading = true;
+  const res = await fetch(`/api/scroll?page=${next}&items=%(items)d&pages=%(pages)d`);
+  const batch = await res.json();
+  if (!batch.html) { done = true; } else {
+    document.querySelector("#feed").insertAdjacentHTML("beforeend", batch.html);
+    next += 1;
+  }
+  loading = false;
+}
+window.addEventListener("scroll", () => {
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 400) loadMore();
+});
+loadMore();
+</script>
+<style>#feed article { min-height: 140px; }</style>
+"""
+
+JS_APP_SCRIPT = """
+<script>
+const items = %(items)s;
+document.querySelector("#root").innerHTML = items.map(i =>
+  `<article class="product"><h3><a href="${i.url}">${i.title}</a></h3>` +
+  `<p class="price">${i.price}</p><p class="rating">${i.rating} stars</p>` +
+  `<time>${i.date}</time><p class="description">${i.description}</p></article>`
+).join("");
+</script>
+"""
+
+
+class FixtureServer:
+    """
+    The fixture site on a background thread. `port=0` picks a free port; read
+    it back from `base_url`. Defaults apply to every page unless overridden in
+    the query string.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        items: int = 20,
+        pages: int = 5,
+        pad_kb: int = 0,
+        population: int = 200,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.items = items
+        self.pages = pages
+        self.pad_kb = pad_kb
+        self.population = population
+        self.requests = 0
+        # Seeded, so a server's sequence of /random responses repeats across runs
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        server = self
+
+        class Handler(_FixtureHandler):
+            fixtures = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fixture site on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def dataset(self) -> List[dict]:
+        """Labelled URLs in the format classification_benchmark.py reads."""
+        return [{"url": self.url(path), "label": label} for path, label in EXPECTED_LABELS.items()]
+
+    def write_dataset(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.dataset(), f, indent=2)
+
+    def random_sample(self, n: int) -> List[int]:
+        with self._lock:
+            return self._random.sample(range(self.population), min(n, self.population))
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    fixtures: FixtureServer
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real site
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        fx = self.fixtures
+        with fx._lock:
+            fx.requests += 1
+
+        def param(name: str, default, cast=int):
+            try:
+                return cast(query[name]) if name in query else default
+            except ValueError:
+                return default
+
+        latency = param("latency", fx.latency, float)
+        if latency > 0:
+            time.sleep(latency)
+
+        items = param("items", fx.items)
+        pages = param("pages", fx.pages)
+        pad_kb = param("pad_kb", fx.pad_kb)
+        route = getattr(self, "_route_" + (parsed.path.strip("/").replace("/", "_") or "index"), None)
+        if route is None:
+            self._send(404, _page("Not found", "<p>No such fixture.</p>"))
+            return
+        route(items=items, pages=pages, pad_kb=pad_kb, page=param("page", 1))
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route_index(self, **_):
+        links = "".join(f'<li><a href="{p}">{p.strip("/")}</a> ({label})</li>' for p, label in EXPECTED_LABELS.items())
+        self._send(200, _page("Fixture site", f"<ul>{links}</ul>"))
+
+    def _route_default(self, items, pad_kb, **_):
+        cards = "".join(_card(make_item(i)) for i in range(items))
+        self._send(200, _page("Products", f'<section class="products">{cards}</section>', pad_kb))
+
+    def _route_tableful(self, items, pad_kb, **_):
+        rows = "".join(_row(make_item(i)) for i in range(items))
+        table = (
+            "<table class=\"products\"><thead><tr><th>Title</th><th>Price</th><th>Rating</th>"
+            f"<th>Date</th></tr></thead><tbody>{rows}</tbody></table>"
+        )
+        self._send(200, _page("Product table", table, pad_kb))
+
+    def _route_scroll(self, items, pages, pad_kb, **_):
+        body = '<section id="feed"></section>' + SCROLL_SCRIPT % {"items": items, "pages": pages}
+        self._send(200, _page("Feed", body, pad_kb))
+
+    def _route_api_scroll(self, items, pages, page, **_):
+        # page is 0-based here; an empty batch ends the feed
+        batch = "" if page >= pages else "".join(_card(make_item(page * items + i)) for i in range(items))
+        self._send(200, json.dumps({"html": batch}), "application/json")
+
+    def _route_random(self, items, pad_kb, **_):
+        cards = "".join(_card(make_item(i)) for i in self.fixtures.random_sample(items))
+        self._send(200, _page("Random picks", f'<section class="products">{cards}</section>', pad_kb))
+
+    def _route_paginated(self, items, pages, pad_kb, page, **_):
+        page = max(1, min(page, pages))
+        cards = "".join(_card(make_item((page - 1) * items + i)) for i in range(items))
+        pager = f'<li class="previous"><a href="?page={page - 1}">Previous</a></li>' if page > 1 else ""
+        if page < pages:
+            pager += f'<li class="next"><a rel="next" href="?page={page + 1}">Next</a></li>'
+        body = f'<section class="products">{cards}</section><ul class="pager">{pager}</ul>'
+        self._send(200, _page(f"Products, page {page}", body, pad_kb))
+
+    def _route_login(self, pad_kb, **_):
+        form = (
+            '<form data-testid="login-form" action="/login" method="post">'
+            "<p>Sign in to continue.</p>"
+            '<input name="email" placeholder="Email"><input name="password" type="password">'
+            '<button type="submit">Log in</button><a href="/signup">Sign up</a>'
+            '<a href="/forgot">Forgot password?</a></form>'
+        )
+        self._send(200, _page("Sign in", form, pad_kb))
+
+    def _route_js(self, items, pad_kb, **_):
+        data = json.dumps([make_item(i) for i in range(items)]).replace("</", "<\\/")
+        body = '<div id="root"></div>' + JS_APP_SCRIPT % {"items": data}
+        self._send(200, _page("App", body, pad_kb))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--items", type=int, default=20, help="items per page/batch")
+    parser.add_argument("--pages", type=int, default=5, help="pages of /paginated and batches of /scroll")
+    parser.add_argument("--pad-kb", type=int, default=0, help="extra KB of markup per page")
+    parser.add_argument("--dataset", default=None, help="write a labelled dataset for classification_benchmark.py")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FixtureServer(args.host, args.port, args.latency, args.items, args.pages, args.pad_kb)
+    if args.dataset:
+        server.write_dataset(args.dataset)
+        print(f"💾 Wrote labelled dataset to {args.dataset}")
+    print(f"🧪 Fixture site on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,244 @@
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profile name for raw HTTP bodies, which don't depend on a browser fetch profile
+RAW_CACHE_PROFILE = "http"
+
+
+class CacheMiss(KeyError):
+    """Raised in offline mode when a URL isn't cached."""
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    html: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    fresh: bool  # Still within TTL
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class HTMLCache:
+    """
+    Persistent, gzip-compressed HTML cache keyed by (url, fetch profile, kind).
+
+    `kind` separates raw HTTP bodies ("raw") from rendered DOMs ("rendered").
+    Bodies are stored content-addressed (by SHA-256), so identical pages share
+    one blob. Entries older than `ttl` seconds are stale: callers revalidate
+    them with `conditional_headers()` and `touch()` on a 304. Least recently
+    used entries are evicted once blobs exceed `max_bytes` on disk. With
+    `offline=True` callers must only serve from cache (see `require()`).
+    """
+
+    def __init__(
+        self,
+        directory: str = ".html_cache",
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl: float = 24 * 3600,
+        offline: bool = False,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), check_same_thread=False
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                blob TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def key(url: str, profile: str, kind: str) -> str:
+        return hashlib.sha256(f"{kind}\0{profile}\0{url}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest + ".html.gz")
+
+    def get(self, url: str, profile: str, kind: str) -> Optional[CacheEntry]:
+        """Cached entry (fresh or stale) or None. Counts hits/misses."""
+        key = self.key(url, profile, kind)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blob, etag, last_modified, stored_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            blob, etag, last_modified, stored_at = row
+            try:
+                with gzip.open(self._blob_path(blob), "rt", encoding="utf-8") as f:
+                    html = f.read()
+            except OSError:
+                # Blob vanished (manual cleanup); forget the entry
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                self.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+
+        fresh = time.time() - stored_at < self.ttl
+        if fresh:
+            self.hits += 1
+        else:
+            self.stale += 1
+        return CacheEntry(url, html, etag, last_modified, stored_at, fresh)
+
+    def require(self, url: str, profile: str, kind: str) -> CacheEntry:
+        """Offline lookup: the entry regardless of age, or CacheMiss."""
+        entry = self.get(url, profile, kind)
+        if entry is None:
+            raise CacheMiss(f"{url} ({kind}, {profile}) is not cached")
+        return entry
+
+    def put(
+        self,
+        url: str,
+        profile: str,
+        kind: str,
+        html: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with gzip.open(tmp, "wb", compresslevel=6) as f:
+                    f.write(data)
+                os.replace(tmp, path)
+
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(url, profile, kind),
+                    url,
+                    profile,
+                    kind,
+                    digest,
+                    os.path.getsize(path),
+                    etag,
+                    last_modified,
+                    now,
+                    now,
+                ),
+            )
+            self._db.commit()
+            self._evict()
+
+    def touch(self, url: str, profile: str, kind: str):
+        """Mark an entry fresh again after a successful revalidation (304)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, self.key(url, profile, kind)),
+            )
+            self._db.commit()
+        self.revalidated += 1
+
+    def _disk_bytes(self) -> int:
+        # Shared blobs are counted once
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT blob, size FROM entries)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        total = self._disk_bytes()
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT key, blob FROM entries ORDER BY accessed_at ASC"
+        ).fetchall()
+        for key, blob in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            still_used = self._db.execute(
+                "SELECT 1 FROM entries WHERE blob = ? LIMIT 1", (blob,)
+            ).fetchone()
+            if not still_used:
+                path = self._blob_path(blob)
+                try:
+                    total -= os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    pass
+        self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            disk = self._disk_bytes()
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "disk_bytes": disk,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -3,16 +3,32 @@ from scraper_code_generator_prompt import (
     complete_scraper_code,
     fix_scraper_code,
 )
-from typing import Literal, List
-from playwright.sync_api import sync_playwright, TimeoutError
-from bs4 import BeautifulSoup, Comment
+from typing import Literal, List, Optional, Iterable, Iterator, AsyncIterator
+from contextlib import contextmanager
+from playwright.sync_api import sync_playwright, TimeoutError, Error as PlaywrightError
+from playwright.async_api import TimeoutError as AsyncTimeoutError
+from playwright.async_api import Error as AsyncPlaywrightError
+from bs4 import BeautifulSoup, Comment, Tag
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
 
 from endpoint_classifier import EndpointClassifier
+from browser_pool import BrowserPool, AsyncBrowserPool
+from fetch_profiles import apply_profile, aapply_profile, get_profile, RouteStats
+from settle import settle, asettle
+from http_client import aclose_async_client, get_session, decode_html, FetchPathMemory
+from html_cache import HTMLCache, CacheEntry, CacheMiss, RAW_CACHE_PROFILE
+from endpoint_classifier import looks_js_dependent
+import requests
+from document import Document
+from extraction import cast_value, extract_data, validate_schema
+import tracing
+from collections import defaultdict
+from dataclasses import dataclass
 import asyncio
 
 import inspect
+import os
 import subprocess
 import sys
 
@@ -21,7 +37,9 @@ import re
 
 def run_generated_file(path: str):
     print(f"🚀 Running {path}...")
-    result = subprocess.run([sys.executable, path], capture_output=True, text=True)
+    with tracing.span("generated_scraper", path=path) as span:
+        result = subprocess.run([sys.executable, path], capture_output=True, text=True)
+        span.add(bytes_in=len(result.stdout))
 
     if result.returncode != 0:
         print("❌ Scraper crashed:")
@@ -77,104 +95,32 @@ def find_scraper_function(namespace):
     return candidates[0][1]
 
 
-def cast_value(value: str, dtype: str):
-    if value is None:
-        return None
-
-    try:
-        if dtype == "number":
-            return float(value)
-        if dtype == "date":
-            return datetime.fromisoformat(value)
-        return value
-    except Exception:
-        return value
-
-
-def extract_data(schema: dict, html: str, base_url: str | None = None) -> list[dict]:
-    soup = BeautifulSoup(html, "lxml")
-    results = []
-
-    containers = soup.select(schema["container_selector"])
-
-    for c in containers:
-        item = {}
-
-        for field, spec in schema["fields"].items():
-            elements = c.select(spec["selector"])
-
-            values = []
-            for el in elements:
-                if spec.get("attribute"):
-                    attr = el.get(spec["attribute"])
-
-                    if isinstance(attr, list):
-                        val = attr[0] if attr else None
-                    else:
-                        val = attr
-
-                    if isinstance(val, str) and base_url:
-                        val = urljoin(base_url, val)
-                else:
-                    val = el.get_text(strip=True)
-
-                if val:
-                    values.append(cast_value(val, spec.get("type", "string")))
-
-            # Handle single vs multi value
-            if not values:
-                item[field] = None
-            elif spec.get("type", "").endswith("[]"):
-                item[field] = values
-            else:
-                item[field] = values[0]
-
-        # Keep only non-empty rows
-        if any(v is not None for v in item.values()):
-            results.append(item)
-
-    return results
-
-
-def validate_schema(schema, html, endpoint_type="DEFAULT"):
-    soup = BeautifulSoup(html, "lxml")
-
-    containers = soup.select(schema["container_selector"])
-    if not containers:
-        return {"valid": False, "reason": "No containers"}
-
-    min_coverage = {
-        "RANDOM": 0.1,
-        "SCROLL": 0.3,
-        "PAGINATION": 0.3,
-        "TABLE": 0.1,
-        "DEFAULT": 0.5,
-    }.get(endpoint_type, 0.5)
-
-    field_scores = []
-    for field, spec in schema["fields"].items():
-        matches = 0
-        for c in containers:
-            el = c.select_one(spec["selector"])
-            if el:
-                matches += 1
-
-        coverage = matches / len(containers)
-        field_scores.append(coverage)
-
-    confidence = sum(field_scores) / len(field_scores)
-    return {
-        "valid": confidence >= min_coverage,
-        "confidence": round(confidence, 2),
-        "containers_found": len(containers),
-    }
-
-
 def has_multiple_main_blocks(code: str) -> bool:
     return code.count('if __name__ == "__main__"') > 1
 
 
 WaitUntil = Literal["commit", "domcontentloaded", "load", "networkidle"]
+# "auto": plain HTTP first, escalating to the browser when the page needs JS
+FetchMode = Literal["auto", "http", "browser"]
+
+# Statuses that mean "not for scripts" (bot walls, rate limits) rather than "no such page"
+BOT_WALL_STATUSES = {403, 429}
+
+
+@dataclass
+class FetchResult:
+    url: str
+    document: Optional[Document] = None
+    error: Optional[BaseException] = None
+    route_stats: Optional[RouteStats] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def html(self) -> Optional[str]:
+        return self.document.html if self.document is not None else None
 
 
 class HTMLFetcher:
@@ -185,62 +131,454 @@ class HTMLFetcher:
         user_agent: str | None = None,
         wait_until: WaitUntil = "domcontentloaded",  # Changed default to faster load
         headless: bool = True,
+        pool: Optional[BrowserPool] = None,
+        async_pool: Optional[AsyncBrowserPool] = None,
+        profile: str = "dom-only",  # see fetch_profiles.PROFILES
+        settle_timeout: float = 10.0,  # Upper bound for lazy-load settling (seconds)
+        max_scrolls: int = 5,
+        mode: FetchMode = "auto",
+        path_memory: Optional[FetchPathMemory] = None,
+        cache: Optional[HTMLCache] = None,
     ):
         self.timeout = timeout
         self.max_page_size = max_page_size
         self.user_agent = user_agent or self._default_user_agent()
         self.wait_until: WaitUntil = wait_until
         self.headless = headless
+        self.profile = get_profile(profile)
+        self.settle_timeout = settle_timeout
+        self.max_scrolls = max_scrolls
+        self.mode: FetchMode = mode
+        # Which path each host needed last time, so we don't re-probe it
+        self.path_memory = path_memory or FetchPathMemory()
+        self.last_fetch_path: Optional[str] = None
+        self.cache = cache
+        self.last_route_stats: Optional[RouteStats] = None
+
+        # Reuse a caller's pool if given, otherwise lazily start our own
+        self._pool = pool
+        self._owns_pool = pool is None
+        self._async_pool = async_pool
+        self._owns_async_pool = async_pool is None
+
+    def _get_pool(self) -> BrowserPool:
+        if self._pool is None:
+            self._pool = BrowserPool(headless=self.headless, user_agent=self.user_agent)
+        return self._pool
+
+    def _get_async_pool(self) -> AsyncBrowserPool:
+        if self._async_pool is None:
+            self._async_pool = AsyncBrowserPool(
+                headless=self.headless, user_agent=self.user_agent
+            )
+        return self._async_pool
+
+    def close(self):
+        if self._owns_pool and self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
-    def fetch_html(self, url: str) -> str:
+    async def aclose(self):
+        if self._owns_async_pool and self._async_pool is not None:
+            await self._async_pool.close()
+            self._async_pool = None
+
+    def __enter__(self) -> "HTMLFetcher":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def __aenter__(self) -> "HTMLFetcher":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def fetch_html(
+        self,
+        url: str,
+        use_cache: bool = True,
+        render: bool = False,
+        max_scrolls: Optional[int] = None,
+    ) -> str:
+        """Fetches `url` and returns the cleaned HTML (see fetch_document)."""
+        return self.fetch_document(url, use_cache, render, max_scrolls).html
+
+    @tracing.traced("fetch")
+    def fetch_document(
+        self,
+        url: str,
+        use_cache: bool = True,
+        render: bool = False,
+        max_scrolls: Optional[int] = None,
+    ) -> Document:
+        """
+        Fetches `url` and returns the cleaned page as a parse-once Document.
+        In "auto" mode server-rendered pages come from a pooled HTTP client and
+        only JS-dependent ones are rendered in Chromium.
+
+        `use_cache=False` always hits the network (e.g. random endpoints), `render`
+        skips the HTTP attempt and `max_scrolls` overrides the fetcher's default.
+        """
         self._validate_url(url)
+        document = self._fetch_static(url, use_cache, render)
+        return document if document is not None else self._render(url, max_scrolls)
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless)
-            context = browser.new_context(
-                user_agent=self.user_agent,
-                viewport={"width": 1280, "height": 1024},  # Ensure desktop view
+    @tracing.traced("fetch")
+    def fetch_static(self, url: str, use_cache: bool = True) -> Optional[Document]:
+        """
+        fetch_document() without the browser: the cached or plain-HTTP page, or
+        None where it would have to be rendered. Never touches Playwright, so it's
+        safe to call from worker threads.
+        """
+        self._validate_url(url)
+        return self._fetch_static(url, use_cache)
+
+    def _fetch_static(self, url: str, use_cache: bool, render: bool = False) -> Optional[Document]:
+        stale_raw = None
+        if use_cache:
+            document, stale_raw = self._cache_lookup(url)
+            if document is not None:
+                return document
+
+        if not render and self._try_http_first(url):
+            return self._fetch_http(url, stale_raw)
+        return None
+
+    def _cache_lookup(self, url: str) -> tuple[Optional[Document], Optional[CacheEntry]]:
+        """
+        Serve `url` from the HTML cache when possible. Returns (document, None) on a
+        hit, or (None, stale raw entry to revalidate while fetching). Offline caches
+        serve stale entries as-is and raise CacheMiss for anything uncached.
+        """
+        if self.cache is None:
+            return None, None
+
+        lookups = [("rendered", self.profile.name)]
+        if self._try_http_first(url):
+            lookups.insert(0, ("raw", RAW_CACHE_PROFILE))
+
+        stale_raw = None
+        for kind, profile in lookups:
+            entry = self.cache.get(url, profile, kind)
+            if entry is None:
+                continue
+            if kind == "raw" and self._needs_browser(url, entry.html):
+                continue  # e.g. an SPA shell the classifier stored; look for a render
+            if entry.fresh or self.cache.offline:
+                self.last_fetch_path = "cache"
+                return self._clean_html(entry.html, url), None
+            if kind == "raw":
+                stale_raw = entry  # Revalidated by the conditional GET in _fetch_http
+            elif self._revalidate(url, entry, profile, kind):
+                self.last_fetch_path = "cache"
+                return self._clean_html(entry.html, url), None
+
+        if self.cache.offline:
+            raise CacheMiss(f"{url} is not cached (offline mode)")
+        return None, stale_raw
+
+    def _needs_browser(self, url: str, raw_html: str) -> bool:
+        """The live HTTP path's escalation check, for raw HTML that came from the cache."""
+        if self.mode == "http" or not looks_js_dependent(Document(raw_html, url=url)):
+            return False
+        host = urlparse(url).netloc
+        logger.info(f"Cached response of {host} looks JS-rendered, escalating to browser")
+        self.path_memory.record(host, "browser")
+        return True
+
+    def _revalidate(self, url: str, entry: CacheEntry, profile: str, kind: str) -> bool:
+        """Conditional GET; True (and the entry refreshed) if the server says 304."""
+        if not entry.revalidatable:
+            return False
+        try:
+            response = get_session().get(
+                url,
+                headers={"User-Agent": self.user_agent, **entry.conditional_headers()},
+                timeout=self.timeout / 1000,
             )
-            page = context.new_page()
-            page.set_default_timeout(self.timeout)
+        except requests.RequestException:
+            return False
 
+        if response.status_code == 304:
+            self.cache.touch(url, profile, kind)
+            return True
+        return False
+
+    def _try_http_first(self, url: str) -> bool:
+        if self.mode == "auto":
+            return self.path_memory.get(urlparse(url).netloc) != "browser"
+        return self.mode == "http"
+
+    def _fetch_http(self, url: str, cached: Optional[CacheEntry] = None) -> Optional[Document]:
+        """
+        Plain GET. Returns None when the page should be rendered instead (never
+        in "http" mode, where failures raise), recording the outcome per host.
+        A stale `cached` raw entry is revalidated by the same request.
+        """
+        host = urlparse(url).netloc
+        escalate = self.mode != "http"
+
+        headers = {"User-Agent": self.user_agent}
+        if cached is not None:
+            headers.update(cached.conditional_headers())
+
+        try:
+            response = get_session().get(url, headers=headers, timeout=self.timeout / 1000)
+            tracing.add(bytes_in=len(response.content))
+        except requests.RequestException as e:
+            if not escalate:
+                raise
+            logger.info(f"HTTP fetch failed ({e}), escalating to browser")
+            return None
+
+        if cached is not None and response.status_code == 304:
+            self.cache.touch(url, RAW_CACHE_PROFILE, "raw")
+            self.last_fetch_path = "cache"
+            self.last_route_stats = None
+            return self._clean_html(cached.html, url)
+
+        if escalate:
+            content_type = response.headers.get("content-type", "")
+            # Bot walls usually render fine in Chromium: send the whole host there
+            if response.status_code in BOT_WALL_STATUSES:
+                self.path_memory.record(host, "browser")
+                return None
+            # Anything else (a 404 past the last page, a 500, a JSON body) says
+            # nothing about the host; render this URL, but keep trying HTTP first
+            if response.status_code >= 400 or "html" not in content_type:
+                return None
+        else:
+            response.raise_for_status()
+
+        text = decode_html(response)
+        document = Document(text, url=url)
+        if escalate and looks_js_dependent(document):
+            logger.info(f"{host} looks JS-rendered, escalating to browser")
+            self.path_memory.record(host, "browser")
+            return None
+
+        self.path_memory.record(host, "http")
+        self.last_fetch_path = "http"
+        self.last_route_stats = None
+        if self.cache is not None:
+            self.cache.put(
+                url,
+                RAW_CACHE_PROFILE,
+                "raw",
+                text,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+            )
+        return document.clean(max_size=self.max_page_size)
+
+    @contextmanager
+    def open_page(self, url: str) -> Iterator:
+        """
+        A pooled Playwright page navigated to `url` with the fetch profile applied,
+        for callers that drive the page themselves (see scroll_harvester).
+        """
+        with self._get_pool().page() as page, apply_profile(page, url, self.profile) as stats:
+            page.set_default_timeout(self.timeout)
             try:
-                page.goto(url, wait_until=self.wait_until)
+                with tracing.span("fetch.navigate"):
+                    page.goto(url, wait_until=self.wait_until)
+            except TimeoutError:
+                logger.warning("Page load timed out, continuing with partial content.")
 
-                # Scroll to bottom to trigger lazy loading (crucial for "scrape everything")
-                page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                page.wait_for_timeout(2000)  # Wait for lazy load
+            self.last_fetch_path = "browser"
+            self.last_route_stats = stats
+            yield page
+        logger.info(stats.summary())
+
+    def _render(self, url: str, max_scrolls: Optional[int] = None) -> Document:
+        with self._get_pool().page() as page, apply_profile(page, url, self.profile) as stats:
+            page.set_default_timeout(self.timeout)
+
+            response = None
+            settled = False
+            try:
+                with tracing.span("fetch.navigate"):
+                    response = page.goto(url, wait_until=self.wait_until)
+
+                # Scroll until lazy loading stops (crucial for "scrape everything"),
+                # returning as soon as the page is stable instead of a fixed sleep
+                with tracing.span("fetch.settle"):
+                    settled = not settle(
+                        page,
+                        max_wait=self.settle_timeout,
+                        max_scrolls=self.max_scrolls if max_scrolls is None else max_scrolls,
+                    ).timed_out
 
             except TimeoutError:
                 logger.warning("Page load timed out, processing partial content.")
+            except PlaywrightError as e:
+                # e.g. a client-side redirect destroyed the context mid-settle
+                logger.warning(f"Settling interrupted ({e}), processing current content.")
 
             html = page.content()
-            browser.close()
+            tracing.add(bytes_in=len(html))
+
+        self.last_fetch_path = "browser"
+        self.last_route_stats = stats
+        logger.info(stats.summary())
+        self._cache_rendered(url, html, response, settled)
+        return self._clean_html(html, url)
+
+    def _cache_rendered(self, url: str, html: str, response, settled: bool):
+        """Store a rendered page, unless it's an error page or didn't finish loading."""
+        if self.cache is None or response is None or not response.ok or not settled:
+            return
+        headers = response.headers
+        self.cache.put(
+            url,
+            self.profile.name,
+            "rendered",
+            html,
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+        )
+
+    async def afetch_html(self, url: str, use_cache: bool = True) -> str:
+        """Async `fetch_html`."""
+        return (await self.afetch_document(url, use_cache)).html
+
+    async def afetch_document(self, url: str, use_cache: bool = True) -> Document:
+        """Async `fetch_document`, rendered on the fetcher's `AsyncBrowserPool`."""
+        document, self.last_route_stats = await self._afetch_with(
+            self._get_async_pool(), url, use_cache
+        )
+        return document
+
+    async def fetch_many(
+        self, urls: Iterable[str], concurrency: int = 8, per_host: int = 2
+    ) -> AsyncIterator[FetchResult]:
+        """
+        Fetches many URLs in parallel, yielding a FetchResult as each page finishes
+        (completion order, not input order). At most `concurrency` navigations are in
+        flight overall and at most `per_host` against any single host.
+
+            async for result in fetcher.fetch_many(urls, concurrency=16):
+                ...
+        """
+        pool = self._async_pool
+        owns_pool = pool is None
+        if owns_pool:
+            # Size the pool so every in-flight navigation has a page of its own
+            pool = AsyncBrowserPool(
+                browsers=max(1, -(-concurrency // 4)),
+                pages_per_browser=min(concurrency, 4),
+                headless=self.headless,
+                user_agent=self.user_agent,
+            )
 
-        # DOM-safe size limiting
-        soup = BeautifulSoup(html, "lxml")
+        in_flight = asyncio.Semaphore(concurrency)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
 
-        # Remove explicitly useless tags first
-        for tag in soup(["script", "style", "noscript", "svg", "iframe", "canvas"]):
-            tag.decompose()
+        async def fetch_one(url: str) -> FetchResult:
+            try:
+                # Take the host slot first so a busy host doesn't hog global slots
+                async with host_limits[urlparse(url).netloc]:
+                    async with in_flight:
+                        document, stats = await self._afetch_with(pool, url)
+                return FetchResult(url=url, document=document, route_stats=stats)
+            except Exception as e:
+                return FetchResult(url=url, error=e)
+
+        tasks = [asyncio.create_task(fetch_one(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if owns_pool:
+                await pool.close()
+
+    @tracing.traced("fetch")
+    async def _afetch_with(
+        self, pool: AsyncBrowserPool, url: str, use_cache: bool = True
+    ) -> tuple[Document, Optional[RouteStats]]:
+        self._validate_url(url)
+
+        # Cache lookups and requests are blocking; run them in worker threads
+        stale_raw = None
+        if use_cache:
+            document, stale_raw = await asyncio.to_thread(self._cache_lookup, url)
+            if document is not None:
+                return document, None
+
+        if self._try_http_first(url):
+            # The pooled requests session is safe to share across threads
+            document = await asyncio.to_thread(self._fetch_http, url, stale_raw)
+            if document is not None:
+                document.html  # Serialize in the worker thread
+                return document, None
+
+        async with pool.page() as page, aapply_profile(page, url, self.profile) as stats:
+            page.set_default_timeout(self.timeout)
+
+            response = None
+            settled = False
+            try:
+                with tracing.span("fetch.navigate"):
+                    response = await page.goto(url, wait_until=self.wait_until)
 
-        current_size = len(str(soup).encode("utf-8"))
-        if current_size > self.max_page_size:
-            # If still too big, remove comments
-            for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
-                c.extract()
+                # Scroll until lazy loading stops (crucial for "scrape everything")
+                with tracing.span("fetch.settle"):
+                    settled = not (await asettle(
+                        page, max_wait=self.settle_timeout, max_scrolls=self.max_scrolls
+                    )).timed_out
 
-        return str(soup)
+            except AsyncTimeoutError:
+                logger.warning("Page load timed out, processing partial content.")
+            except AsyncPlaywrightError as e:
+                logger.warning(f"Settling interrupted ({e}), processing current content.")
+
+            html = await page.content()
+            tracing.add(bytes_in=len(html))
+
+        def clean() -> Document:
+            self._cache_rendered(url, html, response, settled)
+            doc = self._clean_html(html, url)
+            doc.html  # Serialize here too, not on the loop
+            return doc
+
+        # Parsing is CPU-bound; keep it off the event loop so other pages progress
+        return await asyncio.to_thread(clean), stats
 
-    def extract_candidate_blocks(self, html: str, limit: int = 15) -> List[str]:
+    def _clean_html(self, html: str, url: Optional[str] = None) -> Document:
+        # DOM-safe size limiting: strip useless tags, then comments if still too big
+        with tracing.span("clean_html"):
+            return Document(html, url=url).clean(max_size=self.max_page_size)
+
+    def extract_candidate_blocks(
+        self, html: "str | Document", limit: int = 15
+    ) -> List[str]:
         """
         Extracts relevant HTML blocks for the AI to analyze.
+        A Document that isn't cleaned yet is left as it was.
         """
-        soup = BeautifulSoup(html, "lxml")
+        return [str(tag) for tag in self.extract_candidate_tags(html, limit)]
 
-        # Clean again just in case
-        for tag in soup(["script", "style", "noscript"]):
-            tag.decompose()
+    @tracing.traced("block_scoring")
+    def extract_candidate_tags(
+        self, html: "str | Document", limit: int = 15
+    ) -> List[Tag]:
+        """
+        extract_candidate_blocks() as elements of the parsed tree, best first, so
+        later stages (fingerprinting, prompt packing) don't parse them again.
+        """
+        if isinstance(html, Document) and not html.cleaned:
+            # Strip tags from a private parse, not from the caller's Document
+            html = html.copy()
+        doc = Document.coerce(html)
+
+        # Clean again just in case (no-op for documents from fetch_document)
+        doc.clean(tags=["script", "style", "noscript"])
+        soup = doc.soup
 
         # Identify potential content containers
         # We look for containers that wrap the items we want
@@ -248,28 +586,30 @@ class HTMLFetcher:
             ["article", "section", "div", "table", "tbody", "ul", "main"],
         )
 
+        # Text/link/image counts for every node in one pass, instead of per candidate
+        stats = doc.stats
+
         scored = []
         for tag in candidates:
             # Skip if purely navigation
-            if is_navigation_block(tag):
+            if is_navigation_block(tag, stats):
                 continue
 
             # Skip if explicitly hidden
             if "display:none" in str(tag.get("style", "")).replace(" ", "").lower():
                 continue
 
-            # Get text for length check
-            text = tag.get_text(strip=True)
+            node = stats[id(tag)]
 
             # Allow shorter blocks if they contain images (e.g. product cards)
-            if len(text) < 30 and not tag.find("img"):
+            if node.stripped_len < 30 and not node.img_count:
                 continue
 
-            score = score_content_block(tag)
+            score = score_content_block(tag, stats)
 
             # If a block is VERY large, it might be the 'body' or 'html' tag.
             # We prefer specific sections over the whole page, unless specific sections are weak.
-            if len(str(tag)) > 100_000:
+            if node.serialized_size > 100_000:
                 score *= 0.5  # Penalize wrapper-of-everything
 
             scored.append((score, tag))
@@ -288,7 +628,7 @@ class HTMLFetcher:
                 continue
 
             seen_content.add(content_hash)
-            final_blocks.append(str(tag))
+            final_blocks.append(tag)
 
             if len(final_blocks) >= limit:
                 break
@@ -309,16 +649,18 @@ class HTMLFetcher:
 
 
 def infer_schema(blocks, endpoint_result):
-    try:
-        return build_schema_prompt(blocks, endpoint_result)
-    except RuntimeError:
-        return build_schema_prompt(blocks[:3], endpoint_result)
+    # The prompt builder packs the blocks into its token budget, best first
+    return build_schema_prompt(blocks, endpoint_result)
 
 
 try_num = 24
 
 from schema_inferencer_prompt import build_schema_prompt
-from openrouter_client import openrouter_chat
+from openrouter_client import FENCED_JSON, openrouter_chat
+from llm_cache import get_llm_cache
+from schema_cache import SchemaIndex, structural_fingerprint
+from crawl_runtime import CrawlRuntime, UnsupportedEndpoint
+from sinks import NDJSONSink, write_rows
 import json
 
 import re
@@ -334,7 +676,7 @@ def extract_json(text: str) -> dict:
     """
 
     # 1. Prefer fenced ```json blocks
-    fenced = re.findall(r"```json\s*(\{[\s\S]*?\})\s*```", text)
+    fenced = FENCED_JSON.findall(text)
     for block in fenced:
         try:
             return json.loads(block)
@@ -433,7 +775,11 @@ def enforce_single_eof(code: str) -> str:
 #     return code.strip()
 
 
-def complete_the_code(code: str, schema: dict) -> tuple[bool, str]:
+def complete_the_code(code: str, schema: dict, attempt: int = 0) -> tuple[bool, str]:
+    """
+    One continuation round. `attempt` > 0 bypasses the LLM cache: the previous
+    round's answer was rejected, and the same prompt would replay it.
+    """
     code = clean_ai_code(code)
 
     # 1. Immediate Cutoff: If EOF is present, discard any trailing garbage (like JSON)
@@ -448,7 +794,7 @@ def complete_the_code(code: str, schema: dict) -> tuple[bool, str]:
     print("⚠️ Code looks truncated. Asking AI to complete it...")
 
     # 3. Generate Continuation
-    continuation = complete_scraper_code(code, endpoint_result, schema)
+    continuation = complete_scraper_code(code, endpoint_result, schema, refresh=attempt > 0)
     continuation = clean_ai_code(continuation)
 
     # --- SAFETY CHECK: Did the AI give us JSON instead of Code? ---
@@ -500,9 +846,10 @@ from scraper_code_generator_prompt import (
     complete_scraper_code,
     fix_scraper_code,
 )
-from typing import Literal, List, Optional
+from typing import Literal, List, Optional, Dict
 from playwright.sync_api import sync_playwright, TimeoutError
 from bs4 import BeautifulSoup, Comment, Tag
+from dom_stats import compute_dom_stats, NodeStats
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
 
@@ -556,19 +903,23 @@ def is_category_tree(tag: Tag) -> bool:
     return False
 
 
-def is_navigation_block(tag: Tag) -> bool:
+def _node_stats(tag: Tag, stats: Optional[Dict[int, NodeStats]]) -> NodeStats:
+    if stats is None:
+        stats = compute_dom_stats(tag)
+    return stats[id(tag)]
+
+
+def is_navigation_block(tag: Tag, stats: Optional[Dict[int, NodeStats]] = None) -> bool:
     """
     Heuristic detection of navigation / boilerplate blocks.
     IMPROVED: Does not filter out Grids/Lists that happen to be links.
+    Pass `stats` from compute_dom_stats() to avoid re-walking the subtree.
     """
-    text = tag.get_text(" ", strip=True).lower()
-    links = tag.find_all("a")
-    imgs = tag.find_all("img")
-
-    text_len = len(text)
+    node = _node_stats(tag, stats)
+    text_len = node.text_len
 
     # If it has significant images, it's likely content (e.g. product grid), not nav
-    if len(imgs) > 2:
+    if node.img_count > 2:
         return False
 
     # Pure menu lists (nav, header, footer usually contain strict navigation)
@@ -576,83 +927,46 @@ def is_navigation_block(tag: Tag) -> bool:
         return True
 
     # Too many links, too little text, AND no images
-    if links and text_len < 200 and len(links) >= 3 and not imgs:
+    if text_len < 200 and node.link_count >= 3 and not node.img_count:
         return True
 
-    # Keyword check
-    nav_keywords = [
-        "login",
-        "register",
-        "my account",
-        "sign in",
-        "sign up",
-        "logout",
-        "terms of use",
-        "privacy policy",
-        "copyright",
-        "sitemap",
-        "facebook",
-        "twitter",
-        "instagram",
-        "linkedin",
-        "follow us",
-        "account",
-        "profile",
-        "wishlist",
-        "favorite",
-        "cart",
-        "basket",
-        "checkout",
-        "sipariş",
-        "alışveriş",
-        "favori",
-    ]
-
-    # Check if a significant portion of text matches nav keywords
-    matches = sum(1 for k in nav_keywords if k in text)
-    if matches >= 2:
+    # Check if a significant portion of text matches nav keywords (see NAV_KEYWORDS)
+    if node.nav_keyword_matches >= 2:
         return True
 
     return False
 
 
-def score_content_block(tag: Tag) -> float:
+def score_content_block(tag: Tag, stats: Optional[Dict[int, NodeStats]] = None) -> float:
     """
     Scores a block based on likelihood of being valuable content.
     IMPROVED: Rewards repeating structures (lists/tables).
+    Pass `stats` from compute_dom_stats() to avoid re-walking the subtree.
     """
-    text = tag.get_text(" ", strip=True)
-    text_len = len(text)
+    node = _node_stats(tag, stats)
+    text_len = node.text_len
     if text_len == 0:
         return 0.0
 
-    links = tag.find_all("a")
-    imgs = tag.find_all("img")
-    rows = tag.find_all(["tr", "li", "article", "div"])
-
     score = 0.0
 
     # 1. Text Volume (capped)
     score += min(text_len / 200, 5.0)
 
     # 2. Visual Content (Images are high value for scraping)
-    score += len(imgs) * 2.0
+    score += node.img_count * 2.0
 
     # 3. Structure / Repetition (The "Scrape Everything" heuristic)
     # If a block has many children of the same tag, it's likely a list of data.
-    child_tags = [child.name for child in tag.find_all(recursive=False) if child.name]
-    if child_tags:
-        most_common = max(set(child_tags), key=child_tags.count)
-        count = child_tags.count(most_common)
-        if count > 3:
-            score += count * 1.5  # Reward lists!
+    count = node.max_child_repeat
+    if count > 3:
+        score += count * 1.5  # Reward lists!
 
     # 4. Link Density Adjustment
     # Only penalize links if there are NO images and NO structure
-    link_text_len = sum(len(a.get_text(strip=True)) for a in links)
-    link_ratio = link_text_len / text_len
+    link_ratio = node.link_text_len / text_len
 
-    if link_ratio > 0.7 and len(imgs) == 0:
+    if link_ratio > 0.7 and node.img_count == 0:
         score -= 5.0  # Heavy penalty for pure link lists (footers/navs)
 
     return score
@@ -747,67 +1061,157 @@ url = ""
 
 if __name__ == "__main__":
     from schema_inferencer_prompt import build_schema_prompt
-    from openrouter_client import openrouter_chat
-
-    print(f"🌐 Fetching: {url}")
-    fetcher = HTMLFetcher(headless=True)  # Set headless=True for production
-    html = fetcher.fetch_html(url)
+    from openrouter_client import ChatMetrics, openrouter_chat
+
+    # SCRAPER_TRACE=trace.json records per-stage spans and prints a summary at the end
+    trace_path = os.getenv("SCRAPER_TRACE")
+    if trace_path:
+        tracing.enable()
+
+    # Raw responses survive reruns while tuning prompts/schemas: the classifier
+    # stores them, the crawl reads them
+    html_cache = HTMLCache()
+    fetcher = HTMLFetcher(headless=True, cache=html_cache)  # Set headless=True for production
+
+    # One rendered navigation both classifies the endpoint and captures the page
+    print(f"🌐 Probing: {url}")
+    endpoint_classifier = EndpointClassifier(
+        url, timeout=fetcher.timeout, cache=html_cache
+    )
 
-    print("🔍 Extracting candidate blocks...")
-    blocks = fetcher.extract_candidate_blocks(html)
-    print(f"found {len(blocks)} candidate blocks")
+    async def probe():
+        try:
+            return await endpoint_classifier.probe(max_page_size=fetcher.max_page_size)
+        finally:
+            # The loop's httpx client dies with asyncio.run's loop; close it first
+            await aclose_async_client()
 
-    endpoint_classifier = EndpointClassifier(url)
-    endpoint_result = asyncio.run(endpoint_classifier.classify())
+    with tracing.span("classify", url=url):
+        endpoint_result, document = asyncio.run(probe())
     print(f"📊 Endpoint Type: {endpoint_result.get('type')}")
 
-    # Infer Schema
-    print("🤖 Inferring Schema...")
-    prompt = infer_schema(blocks, endpoint_result)
-    
+    print("🔍 Extracting candidate blocks...")
+    block_tags = fetcher.extract_candidate_tags(document)
+    print(f"found {len(block_tags)} candidate blocks")
 
-    # Retry loop for schema generation
+    # Known template? Reuse its schema if it still validates against this page
+    schema_index = SchemaIndex()
+    fingerprint = structural_fingerprint(block_tags)
     schema = None
-    for attempt in range(3):
-        try:
-            raw_output = openrouter_chat(
-                prompt=prompt,
-                model="mistralai/devstral-2512:free",  # Use a strong model
+    validation = None
+
+    with tracing.span("schema_cache"):
+        cached = schema_index.lookup(fingerprint, endpoint_result["type"], url)
+        if cached:
+            validation = validate_schema(cached.schema, document, endpoint_result["type"])
+            if validation["valid"]:
+                print(
+                    f"♻️ Reusing cached schema from {cached.source_url} "
+                    f"(similarity {cached.similarity:.2f}), skipping LLM"
+                )
+                schema = cached.schema
+
+    if schema is None:
+        # Infer Schema
+        print("🤖 Inferring Schema...")
+        with tracing.span("infer_schema"):
+            # Elements, not markup: the packer tells nested blocks apart by identity
+            prompt = infer_schema(block_tags, endpoint_result)
+
+            # Retry loop for schema generation
+            for attempt in range(3):
+                try:
+                    llm_metrics = ChatMetrics()
+                    raw_output = openrouter_chat(
+                        prompt=prompt,
+                        model="mistralai/devstral-2512:free",  # Use a strong model
+                        # A cached answer that failed to parse would fail again; re-ask
+                        refresh=attempt > 0,
+                        # Cancel once the schema object is complete, extract_json drops the rest
+                        stop_at="json",
+                        metrics=llm_metrics,
+                    )
+                    if llm_metrics.streamed:
+                        print(
+                            f"⚡ First token {llm_metrics.ttft or 0:.1f}s, usable schema "
+                            f"{llm_metrics.time_to_result:.1f}s"
+                            + (" (stopped early)" if llm_metrics.stopped_early else "")
+                        )
+                    schema = extract_json(raw_output)
+                    break
+                except Exception as e:
+                    print(f"Schema generation failed (attempt {attempt+1}): {e}")
+
+        if not schema:
+            raise RuntimeError("Could not generate schema")
+
+        # Validate Schema
+        with tracing.span("validate_schema"):
+            validation = validate_schema(schema, document, endpoint_result["type"])
+        if validation["valid"]:
+            schema_index.add(
+                fingerprint, endpoint_result["type"], schema, url, validation["confidence"]
             )
-            schema = extract_json(raw_output)
-            break
-        except Exception as e:
-            print(f"Schema generation failed (attempt {attempt+1}): {e}")
-
-    if not schema:
-        raise RuntimeError("Could not generate schema")
 
     print("SCHEMA:", json.dumps(schema, indent=2))
 
-    # Validate Schema
-    validation = validate_schema(schema, html, endpoint_result["type"])
     if not validation["valid"]:
         print(f"⚠️ Validation Warning: {validation}")
         # We proceed anyway because user prefers 'scraping something' over 'nothing'
     else:
         print("✅ Schema validated")
 
-    # Generate Code
-    print("👨‍💻 Generating Scraper Code...")
-    ai_generated_code = clean_ai_code(
-        generate_scraper_code(schema, endpoint_result, url)
-    )
-
-    # Fix Loop
-    MAX_CONTINUATIONS = 10
-    for _ in range(MAX_CONTINUATIONS):
-        is_completed, ai_generated_code = complete_the_code(ai_generated_code, schema)
-        if is_completed:
-            break
-
-    # Save and Run
     try_num = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"generated_scraper_{try_num}.py"
-    save_code_to_file(ai_generated_code, filename)
 
-    run_generated_file(filename)
+    # Crawl natively with the schema; code generation is only the fallback
+    rows_written = 0
+    try:
+        runtime = CrawlRuntime(
+            schema,
+            endpoint_result["type"],
+            fetcher,
+            requires_js=endpoint_result["features"]["requires_js"],
+        )
+        output = f"scraped_{try_num}.jsonl"
+        print(f"🕷️ Crawling ({endpoint_result['type']}) into {output}...")
+        with tracing.span("crawl", endpoint=endpoint_result["type"]) as crawl_span:
+            with NDJSONSink(output) as sink:
+                rows_written = write_rows(runtime.run(url, document), sink)
+            crawl_span.set(rows=rows_written)
+        print(f"📦 {runtime.stats.summary()}")
+    except UnsupportedEndpoint as e:
+        print(f"⚠️ {e}")
+    finally:
+        fetcher.close()
+
+    if rows_written == 0:
+        # Generate Code
+        print("👨‍💻 Runtime got no rows, generating Scraper Code...")
+        with tracing.span("codegen"):
+            ai_generated_code = clean_ai_code(
+                generate_scraper_code(schema, endpoint_result, url)
+            )
+
+            # Fix Loop
+            MAX_CONTINUATIONS = 10
+            for attempt in range(MAX_CONTINUATIONS):
+                is_completed, ai_generated_code = complete_the_code(
+                    ai_generated_code, schema, attempt
+                )
+                if is_completed:
+                    break
+
+        # Save and Run
+        filename = f"generated_scraper_{try_num}.py"
+        save_code_to_file(ai_generated_code, filename)
+
+        run_generated_file(filename)
+
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        print(f"🗄️ LLM cache: {llm_cache.stats()}")
+
+    if trace_path:
+        tracing.export_chrome(trace_path)
+        print(f"⏱️ Trace summary:\n{tracing.summary_table()}")
+        print(f"💾 Chrome trace saved to {trace_path} (open in ui.perfetto.dev)")
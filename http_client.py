@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import weakref
+from typing import Dict, List, Literal, Optional, Tuple
+
+import httpx
+import requests
+from bs4 import UnicodeDammit
+from requests.adapters import HTTPAdapter
+
+import session_replay
+
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO; samplers make hundreds
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/121.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+_session: Optional[requests.Session] = None
+_session_version = -1  # session_replay mode the session was built for
+_session_lock = threading.Lock()
+
+
+def get_session(pool_maxsize: int = 32) -> requests.Session:
+    """
+    Process-wide requests.Session with keep-alive connection pooling, so repeated
+    fetches against the same host skip the TCP/TLS handshake.
+
+    Rebuilt when session_replay starts or stops recording/replaying.
+    """
+    global _session, _session_version
+    with _session_lock:
+        if _session is None or _session_version != session_replay.version:
+            session = requests.Session()
+            archive = session_replay.active_archive()
+            if archive is not None:
+                adapter = session_replay.HARReplayAdapter(archive)
+            else:
+                adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+
+            recorder = session_replay.active_recorder()
+            if recorder is not None:
+                session.hooks["response"].append(recorder.requests_hook)
+
+            if _session is not None:
+                _session.close()
+            _session, _session_version = session, session_replay.version
+    return _session
+
+
+# httpx connections belong to the loop that opened them, so one client per loop
+# (with the session_replay mode it was built for)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, int]]" = (
+    weakref.WeakKeyDictionary()
+)
+# Clients replaced on a mode switch; closing needs an await, so aclose_async_client() does it
+_retired_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client(max_connections: int = 32) -> httpx.AsyncClient:
+    """
+    Pooled httpx.AsyncClient for the running event loop: the non-blocking
+    counterpart of get_session(). Close it with aclose_async_client() before the
+    loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    client, version = _async_clients.get(loop, (None, -1))
+    if client is None or client.is_closed or version != session_replay.version:
+        archive = session_replay.active_archive()
+        recorder = session_replay.active_recorder()
+        if client is not None and not client.is_closed:
+            _retired_async_clients.setdefault(loop, []).append(client)
+        client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+            transport=archive.httpx_transport() if archive is not None else None,
+            event_hooks={"response": [recorder.httpx_hook]} if recorder is not None else None,
+        )
+        _async_clients[loop] = (client, session_replay.version)
+    return client
+
+
+async def aclose_async_client():
+    """Close the running loop's client, and any it replaced on a mode switch."""
+    loop = asyncio.get_running_loop()
+    client, _ = _async_clients.pop(loop, (None, -1))
+    clients = _retired_async_clients.pop(loop, [])
+    if client is not None:
+        clients.append(client)
+    for client in clients:
+        await client.aclose()
+
+
+def decode_html(response: "requests.Response | httpx.Response") -> str:
+    """
+    Body of an HTML response as text. Without a charset in Content-Type, requests
+    falls back to ISO-8859-1 (UTF-8 pages turn into mojibake), so the encoding is
+    sniffed from the bytes instead: BOM, <meta charset>, then a best guess.
+    """
+    if "charset=" in response.headers.get("content-type", "").lower():
+        return response.text
+    return UnicodeDammit(response.content, is_html=True).unicode_markup or ""
+
+
+FetchPath = Literal["http", "browser"]
+
+
+class FetchPathMemory:
+    """
+    Remembers per host whether plain HTTP was enough or the page needed a
+    browser, so later fetches go straight to the right path. Persisted as JSON
+    when `path` is given.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._paths: Dict[str, FetchPath] = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._paths = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable fetch path memory {path}: {e}")
+
+    def get(self, host: str) -> Optional[FetchPath]:
+        return self._paths.get(host)
+
+    def record(self, host: str, path: FetchPath):
+        with self._lock:
+            if self._paths.get(host) == path:
+                return
+            self._paths[host] = path
+            if self.path:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self._paths, f, indent=2, sort_keys=True)
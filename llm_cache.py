@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM completions keyed by a hash of (model, prompt,
+    params). Only meaningful for deterministic calls (temperature 0), which is
+    all openrouter_chat makes. Entries expire after `ttl` seconds; the least
+    recently used ones are evicted once stored responses exceed `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str = ".llm_cache.sqlite",
+        ttl: float = 7 * 24 * 3600,
+        max_bytes: int = 200 * 1024 * 1024,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def key(model: str, prompt: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str, params: Dict[str, Any]) -> Optional[str]:
+        key = self.key(model, prompt, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, model: str, prompt: str, params: Dict[str, Any], response: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(model, prompt, params),
+                    model,
+                    response,
+                    len(response.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._db.commit()
+        self.writes += 1
+
+    def delete(self, model: str, prompt: str, params: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM responses WHERE key = ?", (self.key(model, prompt, params),)
+            )
+            self._db.commit()
+
+    def _evict(self, now: float):
+        self._db.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Shared cache used by openrouter_chat. Set OPENROUTER_CACHE=0 to disable it,
+    OPENROUTER_CACHE_PATH to move the database.
+    """
+    global _default_cache
+    if os.getenv("OPENROUTER_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        _default_cache = LLMCache(os.getenv("OPENROUTER_CACHE_PATH", ".llm_cache.sqlite"))
+    return _default_cache
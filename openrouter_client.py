@@ -1,8 +1,15 @@
 import requests
+import json
 import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Literal, Optional
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache
+import tracing
 
-load_dotenv()  
+load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
@@ -11,10 +18,198 @@ if not OPENROUTER_API_KEY:
 
 API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Generated scrapers end with this line; everything after it is discarded anyway
+EOF_SENTINEL = "# === END OF FILE ==="
 
-def openrouter_chat(prompt: str, model: str):
+# "json": stop once a complete JSON object has streamed in; "eof": at EOF_SENTINEL
+StopAt = Literal["json", "eof"]
+
+# A ```json fenced object; extract_json prefers the first of these that parses
+FENCED_JSON = re.compile(r"```json\s*(\{[\s\S]*?\})\s*```")
+
+
+@dataclass
+class ChatMetrics:
+    streamed: bool = False
+    cached: bool = False
+    ttft: Optional[float] = None  # Seconds until the first content token (streaming only)
+    time_to_result: Optional[float] = None  # Seconds until the answer was usable
+    stopped_early: bool = False  # Cancelled once the stop condition was met
+    complete: bool = True  # False if the stream broke off before [DONE] (never cached)
+    chunks: int = 0
+
+
+class JSONObjectWatcher:
+    """
+    Finds the end of the object extract_json would pick in streamed text: the
+    first parseable ```json fenced block, or an object the answer opens with
+    (the "JSON ONLY" format the schema prompt asks for). A bare object after
+    prose doesn't count, since a later fenced block would win over it.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._fence_pos = 0
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._leading = True  # Nothing but whitespace before the object so far
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Returns the text up to the end of the object once it's complete."""
+        self.text += chunk
+        return self._fenced() or self._leading_object()
+
+    def _fenced(self) -> Optional[str]:
+        # A match ends at its closing fence, so more text can't change it
+        for match in FENCED_JSON.finditer(self.text, self._fence_pos):
+            self._fence_pos = match.end()
+            try:
+                json.loads(match.group(1))
+                return self.text[: match.end()]
+            except json.JSONDecodeError:
+                continue
+        return None
+
+    def _leading_object(self) -> Optional[str]:
+        # Scans each character once; strings and escapes are respected
+        text = self.text
+        i = self._pos
+        while self._leading and i < len(text):
+            c = text[i]
+            if self._start < 0:
+                if c == "{":
+                    self._start, self._depth = i, 1
+                elif not c.isspace():
+                    self._leading = False
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                self._depth += 1
+            elif c == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    try:
+                        json.loads(text[self._start : i + 1])
+                        return text[: i + 1]
+                    except json.JSONDecodeError:
+                        self._leading = False  # Prose in braces; only a fenced block can follow
+            i += 1
+        self._pos = i
+        return None
+
+
+class SentinelWatcher:
+    """Finds `sentinel` in streamed text, even when it's split across chunks."""
+
+    def __init__(self, sentinel: str = EOF_SENTINEL):
+        self.sentinel = sentinel
+        self.text = ""
+
+    def feed(self, chunk: str) -> Optional[str]:
+        start = max(0, len(self.text) - len(self.sentinel) + 1)
+        self.text += chunk
+        index = self.text.find(self.sentinel, start)
+        if index < 0:
+            return None
+        return self.text[: index + len(self.sentinel)] + "\n"
+
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """`data:` payloads of a server-sent event stream (comments / keep-alives skipped)."""
+    data = []
+    for line in lines:
+        if not line:  # A blank line ends the event
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue
+        name, _, value = line.partition(":")
+        if name == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
+
+
+def iter_stream_lines(response: requests.Response) -> Iterator[str]:
+    """
+    Lines of a streamed body as soon as they arrive. iter_lines() either waits
+    for 512-byte buffers or, with chunk_size=None, for EOF on unchunked bodies.
+    """
+    buffer = b""
+    while True:
+        chunk = response.raw.read1(8192, decode_content=True)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            # Decode whole lines only, so multi-byte characters never get split
+            yield line.rstrip(b"\r").decode("utf-8")
+    if buffer:
+        yield buffer.rstrip(b"\r").decode("utf-8")
+
+
+def openrouter_chat(
+    prompt: str,
+    model: str,
+    use_cache: bool = True,
+    refresh: bool = False,
+    stream: bool = False,
+    stop_at: Optional[StopAt] = None,
+    metrics: Optional[ChatMetrics] = None,
+):
+    """
+    use_cache=False bypasses the response cache entirely; refresh=True skips the
+    lookup but stores the new answer (e.g. retrying after an unusable response).
+
+    `stream` reads the completion over SSE; `stop_at` (which implies it) cancels
+    the request as soon as the answer is usable and returns it cut there. Pass a
+    ChatMetrics to get time-to-first-token / time-to-usable-result back.
+    """
+    metrics = metrics if metrics is not None else ChatMetrics()
+    with tracing.span("llm", model=model) as span:
+        stream = stream or stop_at is not None
+        content = _chat(prompt, model, use_cache, refresh, stream, stop_at, metrics, span)
+        span.set(
+            ttft=metrics.ttft,
+            time_to_result=metrics.time_to_result,
+            stopped_early=metrics.stopped_early,
+            complete=metrics.complete,
+        )
+        return content
+
+
+def _chat(prompt: str, model: str, use_cache: bool, refresh: bool, stream: bool,
+          stop_at: Optional[StopAt], metrics: ChatMetrics, span):
+    params = {
+        "temperature": 0.0,
+        "max_tokens": 800,   # IMPORTANT
+    }
+
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None and not refresh:
+        cached = cache.get(model, prompt, params)
+        if cached is not None:
+            span.set(cache="hit")
+            metrics.cached = True
+            return cached
+
+    start = time.perf_counter()
     response = requests.post(
-        url="https://openrouter.ai/api/v1/chat/completions",
+        url=API_URL,
         headers={
             "Authorization": f"Bearer {OPENROUTER_API_KEY}",
             "Content-Type": "application/json",
@@ -26,21 +221,47 @@ def openrouter_chat(prompt: str, model: str):
             "messages": [
                 {"role": "user", "content": prompt}
             ],
-            "temperature": 0.0,
-            "max_tokens": 800,   # IMPORTANT
+            **params,
+            **({"stream": True, "usage": {"include": True}} if stream else {}),
         },
         timeout=60,
+        stream=stream,
     )
 
+    if stream:
+        content = _read_stream(response, stop_at, metrics, span, start)
+    else:
+        content = _read_completion(response, span)
+        metrics.time_to_result = time.perf_counter() - start
+
+    if not content.strip():
+        raise RuntimeError("Model returned empty content")
+
+    # A stream that broke off would be served cut short on every later run
+    if cache is not None and metrics.complete:
+        cache.put(model, prompt, params, content)
+
+    return content
+
+
+def _read_completion(response: requests.Response, span) -> str:
     response.raise_for_status()
     data = response.json()
-    
+
+    usage = data.get("usage") or {}
+    span.add(
+        bytes_out=len(response.request.body or b""),
+        bytes_in=len(response.content),
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+    )
+
     # print("FULL OPENROUTER RESPONSE:")
     # print(data)
-    
+
     # content = data["choices"][0]["message"]["content"]
-    
-    
+
+
     if "choices" not in data:
         raise RuntimeError(f"OpenRouter error response: {data}")
 
@@ -51,9 +272,58 @@ def openrouter_chat(prompt: str, model: str):
     if not message or "content" not in message:
         raise RuntimeError(f"Malformed OpenRouter response: {data}")
 
-    content = message["content"]
-    if not content.strip():
-        raise RuntimeError("Model returned empty content")
-    
-    
-    return content
+    return message["content"]
+
+
+def _read_stream(response: requests.Response, stop_at: Optional[StopAt],
+                 metrics: ChatMetrics, span, start: float) -> str:
+    """
+    Accumulates streamed deltas until [DONE] or, with `stop_at`, until the
+    answer is usable; then closes the connection, which cancels the generation.
+    `metrics.complete` tells whether either happened before the stream ended.
+    """
+    metrics.streamed = True
+    metrics.complete = False
+    watcher = JSONObjectWatcher() if stop_at == "json" else SentinelWatcher() if stop_at == "eof" else None
+    parts = []
+    received = 0
+    usage = {}
+
+    try:
+        response.raise_for_status()
+        for payload in iter_sse_data(iter_stream_lines(response)):
+            if payload == "[DONE]":
+                metrics.complete = True
+                break
+            received += len(payload)
+            data = json.loads(payload)
+            if "error" in data:
+                raise RuntimeError(f"OpenRouter error response: {data}")
+            usage = data.get("usage") or usage
+
+            choices = data.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            if metrics.ttft is None:
+                metrics.ttft = time.perf_counter() - start
+            metrics.chunks += 1
+            parts.append(delta)
+
+            if watcher is not None:
+                usable = watcher.feed(delta)
+                if usable is not None:
+                    metrics.stopped_early = metrics.complete = True
+                    parts = [usable]
+                    break
+    finally:
+        metrics.time_to_result = time.perf_counter() - start
+        response.close()
+
+    span.add(
+        bytes_out=len(response.request.body or b""),
+        bytes_in=received,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+    )
+    return "".join(parts)
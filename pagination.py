@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import logging
+import re
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+
+from document import Document
+
+logger = logging.getLogger(__name__)
+
+# Checked in order; the first match that resolves to a new URL wins
+NEXT_LINK_SELECTORS = [
+    "link[rel~=next]",
+    "a[rel~=next]",
+    "li.next > a",
+    ".pagination .next a",
+    "a.next",
+    "a[aria-label='Next']",
+    "a[aria-label='Next page']",
+]
+NEXT_LINK_TEXTS = {"next", "next page", "next »", "next ›", "»", "›", "older posts"}
+
+# Query parameters that carry a page number (or an item offset)
+PAGE_PARAMS = ("page", "page_num", "pagenum", "pg", "p", "paged", "start", "offset")
+_PATH_PAGE = re.compile(r"/page/(\d+)/?")
+_NUMBERS = re.compile(r"(\d+)")
+
+PLACEHOLDER = "{page}"
+
+Fetch = Callable[[str], Awaitable[Document]]
+
+
+def _resolve(href: Optional[str], base_url: str) -> Optional[str]:
+    if not href or href.startswith(("javascript:", "#")):
+        return None
+    return urldefrag(urljoin(base_url, href))[0]
+
+
+def find_next_url(document: Document, base_url: str) -> Optional[str]:
+    """The page's "next page" link, resolved against `base_url`, if it has one."""
+    current = urldefrag(base_url)[0]
+
+    for selector in NEXT_LINK_SELECTORS:
+        for tag in document.select(selector):
+            target = _resolve(tag.get("href"), base_url)
+            if target and target != current:
+                return target
+
+    for tag in document.select("a[href]"):
+        if tag.get_text(" ", strip=True).lower() in NEXT_LINK_TEXTS:
+            target = _resolve(tag.get("href"), base_url)
+            if target and target != current:
+                return target
+    return None
+
+
+@dataclass(frozen=True)
+class PageTemplate:
+    """Page URLs as `pattern` with PLACEHOLDER for the number; `current` is this page's."""
+
+    pattern: str
+    current: int
+    step: int = 1
+
+    def url(self, number: int) -> str:
+        return self.pattern.replace(PLACEHOLDER, str(number))
+
+
+def _without_page_marker(url: str) -> Optional[Tuple[str, str, int]]:
+    """(url minus its page param/path segment, pattern, number), if it has one."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    for i, (key, value) in enumerate(query):
+        if key.lower() in PAGE_PARAMS and value.isdigit():
+            rest = urlunsplit(parts._replace(query=urlencode(query[:i] + query[i + 1:])))
+            templated = query[:i] + [(key, PLACEHOLDER)] + query[i + 1:]
+            pattern = urlunsplit(parts._replace(query=urlencode(templated, safe="{}")))
+            return rest, pattern, int(value)
+
+    match = _PATH_PAGE.search(parts.path)
+    if match:
+        path = parts.path[: match.start()] + "/" + parts.path[match.end():]
+        rest = urlunsplit(parts._replace(path=path.replace("//", "/")))
+        pattern_path = parts.path[: match.start(1)] + PLACEHOLDER + parts.path[match.end(1):]
+        return rest, urlunsplit(parts._replace(path=pattern_path)), int(match.group(1))
+    return None
+
+
+def _same_page(a: str, b: str) -> bool:
+    return a.rstrip("/?") == b.rstrip("/?")
+
+
+def diff_template(url: str, other: str) -> Optional[Tuple[str, Optional[int], int]]:
+    """
+    If `other` is `url` with one number changed (or a page number added), returns
+    (pattern, number in url or None, number in other).
+    """
+    a, b = _NUMBERS.split(url), _NUMBERS.split(other)
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        # Odd indices are the captured numbers
+        if len(diffs) == 1 and diffs[0] % 2 == 1:
+            i = diffs[0]
+            return "".join(b[:i]) + PLACEHOLDER + "".join(b[i + 1:]), int(a[i]), int(b[i])
+
+    # First pages often have no page marker at all: /questions vs /questions?page=2
+    stripped = _without_page_marker(other)
+    if stripped and _same_page(stripped[0], url):
+        return stripped[1], None, stripped[2]
+    return None
+
+
+def detect_template(document: Document, url: str) -> Optional[PageTemplate]:
+    """
+    Page-number URL template for `url`, from its next link or, failing that, its
+    numbered page links ("2", "3", ...). None if pages can't be predicted.
+    """
+    next_url = find_next_url(document, url)
+    if next_url:
+        found = diff_template(url, next_url)
+        if found:
+            pattern, current, following = found
+            if current is None:
+                # Unnumbered first page: page=2 -> 1, offset=20 -> 0
+                current, step = (1, 1) if following == 2 else (0, following)
+            else:
+                step = following - current
+            if step > 0:
+                return PageTemplate(pattern, current, step)
+
+    # Numbered links: the most common template whose link text matches its page index
+    votes: Counter = Counter()
+    for tag in document.select("a[href]"):
+        text = tag.get_text(strip=True)
+        target = _resolve(tag.get("href"), url)
+        if not text.isdigit() or not target:
+            continue
+        found = diff_template(url, target)
+        if found and found[2] == int(text):
+            votes[(found[0], found[1])] += 1
+
+    if not votes:
+        return None
+    (pattern, current), _ = votes.most_common(1)[0]
+    return PageTemplate(pattern, 1 if current is None else current, 1)
+
+
+def _page_digest(document: Document) -> str:
+    return hashlib.blake2b(document.text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+async def crawl_pages(
+    fetch: Fetch,
+    url: str,
+    extract: Callable[[Document, str], List[dict]],
+    document: Optional[Document] = None,
+    window: int = 4,
+    per_host: int = 2,
+    max_pages: int = 50,
+) -> AsyncIterator[Tuple[str, List[dict]]]:
+    """
+    Yields (page url, rows) in page order. `extract` returns a page's *new* rows;
+    the crawl stops at the first page with none, or one identical to the page
+    before it.
+
+    With a detected PageTemplate, up to `window` upcoming pages are fetched ahead
+    (at most `per_host` at once) while earlier ones are being extracted. Without
+    one, next links are followed one page at a time. `fetch` returns a page's
+    Document (see CrawlRuntime._afetch).
+    """
+    if document is None:
+        document = await fetch(url)
+
+    rows = extract(document, url)
+    yield url, rows
+    if not rows:
+        return
+
+    template = detect_template(document, url)
+    if template is None:
+        async for item in _follow_next_links(fetch, url, document, extract, max_pages):
+            yield item
+        return
+
+    logger.info(f"Pagination template {template.pattern} (step {template.step})")
+    host_slots = asyncio.Semaphore(per_host)
+
+    async def fetch_page(page_url: str) -> Document:
+        async with host_slots:
+            return await fetch(page_url)
+
+    pending: deque = deque()
+    next_number = template.current + template.step
+    scheduled = 1
+
+    def schedule():
+        nonlocal next_number, scheduled
+        while len(pending) < window and scheduled < max_pages:
+            page_url = template.url(next_number)
+            pending.append((page_url, asyncio.create_task(fetch_page(page_url))))
+            next_number += template.step
+            scheduled += 1
+
+    previous = _page_digest(document)
+    schedule()
+    try:
+        while pending:
+            page_url, task = pending.popleft()
+            try:
+                page = await task
+            except Exception as e:
+                logger.warning(f"Fetching {page_url} failed ({e}), stopping")
+                return
+
+            digest = _page_digest(page)
+            if digest == previous:
+                logger.info(f"{page_url} repeats the previous page, stopping")
+                return
+            previous = digest
+
+            rows = extract(page, page_url)
+            if not rows:
+                logger.info(f"No new rows on {page_url}, stopping")
+                return
+            yield page_url, rows
+            schedule()
+    finally:
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+
+async def _follow_next_links(
+    fetch: Fetch,
+    url: str,
+    document: Document,
+    extract: Callable[[Document, str], List[dict]],
+    max_pages: int,
+) -> AsyncIterator[Tuple[str, List[dict]]]:
+    visited = {url}
+    page_url = find_next_url(document, url)
+    while page_url and page_url not in visited and len(visited) < max_pages:
+        visited.add(page_url)
+        try:
+            document = await fetch(page_url)
+        except Exception as e:
+            logger.warning(f"Fetching {page_url} failed ({e}), stopping")
+            return
+
+        rows = extract(document, page_url)
+        if not rows:
+            logger.info(f"No new rows on {page_url}, stopping")
+            return
+        yield page_url, rows
+        page_url = find_next_url(document, page_url)
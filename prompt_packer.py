@@ -0,0 +1,192 @@
+"""
+Fits ranked candidate blocks into a token budget for the schema prompt.
+
+Blocks are summarized first: runs of equal siblings (listing items) collapse
+to a few exemplars (see sibling_collapse), attributes selectors don't use
+(inline styles, srcset, event handlers, data-* blobs) are dropped, whitespace
+is collapsed and long text nodes / attribute values are cut. Blocks nested in
+(or containing) an already selected element of the same tree are skipped, and
+a block that doesn't fit keeps its leading children up to the remaining budget.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+from bs4 import BeautifulSoup, Comment, Tag
+
+from document import USELESS_TAGS
+from sibling_collapse import CollapseMarker, collapse_repeated_siblings
+
+logger = logging.getLogger(__name__)
+
+# No tokenizer dependency: minified HTML runs at roughly this many chars per token
+CHARS_PER_TOKEN = 3.5
+DEFAULT_TOKEN_BUDGET = 6000
+
+# Smallest share of a block worth sending once the budget runs low
+MIN_BLOCK_TOKENS = 150
+# "### BLOCK n" header and separators per block
+BLOCK_OVERHEAD_TOKENS = 6
+# Items kept per run of repeated siblings
+EXEMPLARS = 3
+
+# Attributes that selectors and field extraction actually use
+KEEP_ATTRIBUTES = {
+    "id", "class", "href", "src", "alt", "title", "name", "type", "rel", "role",
+    "itemprop", "itemtype", "itemscope", "datetime", "content", "property",
+    "value", "for", "aria-label", "colspan", "rowspan",
+}
+# data-* attributes are kept when short (data-testid="card"), dropped when they carry blobs
+MAX_DATA_ATTR_LEN = 40
+MAX_ATTR_LEN = 120
+MAX_TEXT_LEN = 120
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def _minify_attrs(tag: Tag):
+    attrs = {}
+    for name, value in tag.attrs.items():
+        if isinstance(value, list):  # class, rel
+            attrs[name] = value
+            continue
+        if name.startswith("data-"):
+            if len(value) <= MAX_DATA_ATTR_LEN:
+                attrs[name] = value
+        elif name in KEEP_ATTRIBUTES:
+            attrs[name] = _clip(value, MAX_ATTR_LEN)
+    tag.attrs = attrs
+
+
+def minify(root: Tag) -> Tag:
+    """Minify `root` in place (see module docstring)."""
+    for tag in root.find_all(USELESS_TAGS):
+        tag.decompose()
+    for comment in root.find_all(string=lambda s: isinstance(s, Comment)):
+        if not isinstance(comment, CollapseMarker):
+            comment.extract()
+
+    for tag in [root, *root.find_all(True)]:
+        _minify_attrs(tag)
+
+    for text in root.find_all(string=True):
+        collapsed = _WHITESPACE.sub(" ", str(text))
+        if collapsed == " ":
+            text.extract()
+        elif collapsed != text or len(collapsed) > MAX_TEXT_LEN:
+            text.replace_with(_clip(collapsed, MAX_TEXT_LEN))
+    return root
+
+
+def shrink(tag: Tag, max_chars: int):
+    """
+    Drop `tag`'s trailing children until it serializes to about `max_chars`,
+    recursing into the child that overflows so the result is still valid markup.
+    """
+    used = len(str(tag)) - len(tag.decode_contents())  # Own start/end tags
+    children = list(tag.contents)
+    for i, child in enumerate(children):
+        size = len(str(child))
+        if used + size <= max_chars:
+            used += size
+            continue
+        if isinstance(child, Tag) and max_chars - used > 200:
+            shrink(child, max_chars - used)
+            i += 1
+        rest = children[i:]
+        for node in rest:
+            node.extract()
+        if rest:
+            tag.append(Comment(f" {len(rest)} more nodes omitted "))
+        return
+
+
+def _parse_fragment(html: str) -> Tag:
+    # html.parser keeps fragments as-is (lxml would drop a bare <tbody>/<tr>)
+    soup = BeautifulSoup(html, "html.parser")
+    tags = [c for c in soup.contents if isinstance(c, Tag)]
+    return tags[0] if len(tags) == 1 else soup
+
+
+def _contains(tag: Tag, other: Tag) -> bool:
+    return any(parent is tag for parent in other.parents)
+
+
+def _overlaps(block: Tag, selected: List[Tag]) -> bool:
+    """Same element as, inside, or around one already selected."""
+    return any(
+        block is other or _contains(other, block) or _contains(block, other) for other in selected
+    )
+
+
+@dataclass
+class PackedBlocks:
+    blocks: List[str] = field(default_factory=list)
+    tokens: int = 0
+    source_tokens: int = 0  # All candidate blocks as given
+    nested: int = 0  # Skipped: inside/around a selected block
+    collapsed: int = 0  # Repeated siblings replaced by a marker
+    shrunk: int = 0  # Kept only their leading children
+    dropped: int = 0  # Skipped: out of budget
+
+    def summary(self) -> str:
+        return (
+            f"packed {len(self.blocks)} blocks into ~{self.tokens} tokens "
+            f"(from ~{self.source_tokens}; {self.collapsed} repeated items collapsed, "
+            f"{self.nested} nested, {self.shrunk} shrunk, {self.dropped} over budget)"
+        )
+
+
+def pack_blocks(
+    blocks: List[Union[Tag, str]],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    exemplars: Optional[int] = EXEMPLARS,
+) -> PackedBlocks:
+    """
+    Minify `blocks` (best first, as extract_candidate_tags ranks them) into at
+    most ~`token_budget` tokens. Each block is packed from a copy, so the page's
+    tree is left alone. Nesting is only known for elements of a parsed tree:
+    markup strings are all packed. `exemplars=None` keeps repeated siblings in full.
+    """
+    packed = PackedBlocks(source_tokens=sum(estimate_tokens(str(b)) for b in blocks))
+    selected: List[Tag] = []
+    remaining = token_budget
+
+    for block in blocks:
+        if isinstance(block, Tag) and _overlaps(block, selected):
+            packed.nested += 1
+            continue
+
+        available = remaining - BLOCK_OVERHEAD_TOKENS
+        if available < MIN_BLOCK_TOKENS and packed.blocks:
+            packed.dropped += 1
+            continue
+
+        root = _parse_fragment(str(block))
+        if exemplars is not None:
+            packed.collapsed += collapse_repeated_siblings(root, exemplars)
+        minify(root)
+        html = str(root)
+        if estimate_tokens(html) > available:
+            shrink(root, int(available * CHARS_PER_TOKEN))
+            html = str(root)
+            packed.shrunk += 1
+
+        tokens = estimate_tokens(html) + BLOCK_OVERHEAD_TOKENS
+        if isinstance(block, Tag):
+            selected.append(block)
+        packed.blocks.append(html)
+        packed.tokens += tokens
+        remaining -= tokens
+
+    logger.info(packed.summary())
+    return packed
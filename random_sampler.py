@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from document import Document
+from extraction import row_key
+from http_client import decode_html, get_async_client
+
+logger = logging.getLogger(__name__)
+
+Fetch = Callable[[str], Awaitable[Document]]
+
+
+@dataclass
+class SampleStats:
+    requests: int = 0
+    errors: int = 0
+    rows_seen: int = 0
+    unique: int = 0
+    singletons: int = 0  # Rows seen exactly once (f1)
+    doubletons: int = 0  # Rows seen exactly twice (f2)
+    stop_reason: str = ""
+
+    @property
+    def duplicates(self) -> int:
+        return self.rows_seen - self.unique
+
+    @property
+    def estimated_total(self) -> float:
+        """Chao1 estimate of how many distinct rows the endpoint can return."""
+        f1, f2 = self.singletons, self.doubletons
+        if f2 > 0:
+            return self.unique + f1 * f1 / (2 * f2)
+        return self.unique + f1 * (f1 - 1) / 2
+
+    @property
+    def coverage(self) -> float:
+        """Good-Turing sample coverage: chance the next row is one we've already seen."""
+        if not self.rows_seen:
+            return 0.0
+        return 1 - self.singletons / self.rows_seen
+
+
+async def fetch_http(url: str) -> Document:
+    """One uncached GET over the loop's pooled httpx client."""
+    response = await get_async_client().get(url, headers={"Cache-Control": "no-cache"})
+    response.raise_for_status()
+    return Document(decode_html(response), url=url)
+
+
+class RandomSampler:
+    """
+    Samples a random endpoint (a different selection of items per request)
+    until it stops paying off. `concurrency` requests go out per round over
+    pooled connections; rows are deduped by content hash and their repeat
+    counts feed a capture-recapture estimate of the population (SampleStats).
+
+    Stops when, over the last `window` responses, fewer than `min_yield` of the
+    rows seen were new, when sample coverage reaches `target_coverage`, or after
+    `max_requests`.
+    """
+
+    def __init__(
+        self,
+        extract: Callable[[Document, str], List[dict]],
+        fetch: Optional[Fetch] = None,
+        concurrency: int = 4,
+        max_requests: int = 200,
+        window: int = 8,
+        min_yield: float = 0.05,
+        target_coverage: float = 0.98,
+    ):
+        self.extract = extract
+        self.fetch = fetch or fetch_http
+        self.concurrency = concurrency
+        self.max_requests = max_requests
+        self.window = window
+        self.min_yield = min_yield
+        self.target_coverage = target_coverage
+        self.stats = SampleStats()
+        self._counts: Counter = Counter()
+        # (rows seen, new rows) per recent response
+        self._recent: deque = deque(maxlen=window)
+
+    def _observe(self, document: Document, url: str) -> List[dict]:
+        fresh = []
+        rows = self.extract(document, url)
+        for row in rows:
+            key = row_key(row)
+            count = self._counts[key] + 1
+            self._counts[key] = count
+
+            if count == 1:
+                fresh.append(row)
+                self.stats.singletons += 1
+            elif count == 2:
+                self.stats.singletons -= 1
+                self.stats.doubletons += 1
+            elif count == 3:
+                self.stats.doubletons -= 1
+
+        self.stats.rows_seen += len(rows)
+        self.stats.unique += len(fresh)
+        self._recent.append((len(rows), len(fresh)))
+        return fresh
+
+    def _should_stop(self) -> bool:
+        if self.stats.requests >= self.max_requests:
+            self.stats.stop_reason = "request budget"
+            return True
+        if len(self._recent) < self.window:
+            return False
+
+        seen = sum(s for s, _ in self._recent)
+        new = sum(n for _, n in self._recent)
+        if seen == 0 or new / seen < self.min_yield:
+            self.stats.stop_reason = f"marginal yield {new}/{seen}"
+            return True
+        if self.stats.coverage >= self.target_coverage:
+            self.stats.stop_reason = f"coverage {self.stats.coverage:.0%}"
+            return True
+        return False
+
+    async def _fetch_one(self, url: str) -> Optional[Document]:
+        try:
+            return await self.fetch(url)
+        except Exception as e:  # httpx.HTTPError, or whatever a custom fetch raises
+            logger.warning(f"Sampling {url} failed: {e}")
+            self.stats.errors += 1
+            return None
+
+    async def sample(self, url: str, first: Optional[Document] = None) -> AsyncIterator[List[dict]]:
+        """Yields the new rows of every response as it arrives. `first` counts as one."""
+        self.stats = SampleStats()
+        self._counts.clear()
+        self._recent.clear()
+
+        if first is not None:
+            self.stats.requests += 1
+            yield self._observe(first, url)
+
+        while not self._should_stop():
+            batch = min(self.concurrency, self.max_requests - self.stats.requests)
+            self.stats.requests += batch
+            tasks = [asyncio.create_task(self._fetch_one(url)) for _ in range(batch)]
+            try:
+                for done in asyncio.as_completed(tasks):
+                    document = await done
+                    if document is None:
+                        continue  # Says nothing about the yield; don't count it
+                    # Parsing/extraction is CPU-bound; don't hold up the other responses
+                    yield await asyncio.to_thread(self._observe, document, url)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        logger.info(
+            f"Sampled {self.stats.unique} unique rows in {self.stats.requests} requests "
+            f"(~{self.stats.estimated_total:.0f} estimated, coverage {self.stats.coverage:.0%}, "
+            f"stopped: {self.stats.stop_reason})"
+        )
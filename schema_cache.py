@@ -0,0 +1,180 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Set, Union
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup, Tag
+
+NUM_PERMUTATIONS = 64
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seeds so signatures stay comparable across runs and machines
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME or 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERMUTATIONS)
+]
+
+# Generated class names (css-1x2y3z, sc-AbCdE, jsx-123) differ per build; drop them
+_VOLATILE_CLASS = re.compile(r"\d|^(css|sc|jsx|svelte|emotion)-", re.IGNORECASE)
+
+
+def _tag_token(tag: Tag) -> str:
+    classes = sorted(c for c in tag.get("class", []) if not _VOLATILE_CLASS.search(c))
+    return ".".join([tag.name, *classes])
+
+
+def _block_roots(block: Union[Tag, str]) -> List[Tag]:
+    if isinstance(block, Tag):
+        return [block]
+    # Markup strings (older call sites) need a parse of their own
+    soup = BeautifulSoup(block, "lxml")
+    return (soup.body or soup).find_all(recursive=False)
+
+
+def structural_shingles(blocks: List[Union[Tag, str]], k: int = SHINGLE_SIZE) -> Set[str]:
+    """
+    Tag-path shingles of candidate blocks: for every element, the last `k`
+    "tag.class" tokens on its path from the block root. Text, ids and attribute
+    values are ignored, so two pages built from the same template match.
+
+    Pass the elements from HTMLFetcher.extract_candidate_tags() to walk the
+    page's parsed tree directly instead of re-parsing each block's markup.
+    """
+    shingles: Set[str] = set()
+    for block in blocks:
+        stack = [(root, ()) for root in _block_roots(block)]
+        while stack:
+            tag, path = stack.pop()
+            path = (path + (_tag_token(tag),))[-k:]
+            shingles.add(">".join(path))
+            stack.extend((child, path) for child in tag.find_all(recursive=False))
+    return shingles
+
+
+def minhash(shingles: Set[str]) -> List[int]:
+    hashed = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles
+    ]
+    if not hashed:
+        return [_MERSENNE_PRIME] * NUM_PERMUTATIONS
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashed) for a, b in _PERMUTATIONS]
+
+
+def structural_fingerprint(blocks: List[Union[Tag, str]]) -> List[int]:
+    """MinHash signature of the candidate blocks' structure (see structural_shingles)."""
+    return minhash(structural_shingles(blocks))
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERMUTATIONS
+
+
+@dataclass
+class CachedSchema:
+    schema: dict
+    similarity: float
+    source_url: str
+    confidence: float
+
+
+class SchemaIndex:
+    """
+    Local index of validated schemas by structural fingerprint, so pages built
+    from an already-seen template reuse its schema instead of asking the LLM.
+    Lookups scan entries for the same endpoint type; that stays cheap for the
+    few thousand templates a local cache ever holds.
+    """
+
+    def __init__(self, path: str = ".schema_cache.sqlite", threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schemas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                domain TEXT NOT NULL,
+                endpoint_type TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                schema TEXT NOT NULL,
+                source_url TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                created_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS schemas_type ON schemas (endpoint_type)")
+        self._db.commit()
+
+    def lookup(
+        self, fingerprint: List[int], endpoint_type: str, url: Optional[str] = None
+    ) -> Optional[CachedSchema]:
+        """Closest schema at or above `threshold`; same-domain entries win ties."""
+        domain = urlparse(url).netloc if url else ""
+        best = None
+        best_key = None
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, domain, signature, schema, source_url, confidence "
+                "FROM schemas WHERE endpoint_type = ?",
+                (endpoint_type,),
+            ).fetchall()
+
+        for row_id, row_domain, signature, schema, source_url, confidence in rows:
+            score = similarity(fingerprint, json.loads(signature))
+            if score < self.threshold:
+                continue
+            key = (score, row_domain == domain, confidence)
+            if best_key is None or key > best_key:
+                best_key = key
+                best = (row_id, CachedSchema(json.loads(schema), score, source_url, confidence))
+
+        if best is None:
+            return None
+
+        with self._lock:
+            self._db.execute("UPDATE schemas SET hits = hits + 1 WHERE id = ?", (best[0],))
+            self._db.commit()
+        return best[1]
+
+    def add(
+        self,
+        fingerprint: List[int],
+        endpoint_type: str,
+        schema: dict,
+        url: str,
+        confidence: float,
+    ):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO schemas (domain, endpoint_type, signature, schema, source_url, confidence, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    urlparse(url).netloc,
+                    endpoint_type,
+                    json.dumps(fingerprint),
+                    json.dumps(schema),
+                    url,
+                    confidence,
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,7 +1,11 @@
 from typing import List
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 import json
 
+from bs4 import Tag
+
+from prompt_packer import DEFAULT_TOKEN_BUDGET, estimate_tokens, pack_blocks
+
 SCHEMA_INFERENCE_PROMPT = """
 ROLE:
 You are a web data analyst specializing in reverse-engineering website structures.
@@ -35,20 +39,30 @@ OUTPUT FORMAT (JSON ONLY):
 """
 
 def build_schema_prompt(
-    blocks: List[str],
-    endpoint_result: Dict[str, Any]
+    blocks: List[Union[Tag, str]],
+    endpoint_result: Dict[str, Any],
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
 ) -> str:
     """
     Builds the final prompt sent to the LLM.
+    Blocks (best first; elements of the page's tree, or markup) are minified and
+    packed so the whole prompt stays around `token_budget` tokens; None sends
+    them as-is.
     """
 
+    endpoint_section = json.dumps(endpoint_result, indent=2)
+
+    if token_budget is not None:
+        overhead = estimate_tokens(SCHEMA_INFERENCE_PROMPT) + estimate_tokens(endpoint_section)
+        blocks = pack_blocks(blocks, max(token_budget - overhead, 0)).blocks
+    else:
+        blocks = [str(block) for block in blocks]
+
     html_section = "\n\n".join(
         f"### BLOCK {i+1}\n{block}"
         for i, block in enumerate(blocks)
     )
 
-    endpoint_section = json.dumps(endpoint_result, indent=2)
-
     return f"""{SCHEMA_INFERENCE_PROMPT}
 
       ENDPOINT CONTEXT (for guidance only):
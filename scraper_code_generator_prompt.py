@@ -26,7 +26,9 @@ def generate_scraper_code(schema: dict, endpoint_result: Dict[str, Any], base_ur
     - Scrapes data according to the schema
     - Handles missing fields safely
     - Support pagination
-    - Must save scraped json data to a JSON file (do not print it)
+    - Must save scraped data incrementally to a JSON Lines (.jsonl) file: write one
+      JSON object per line as each item is scraped and flush after every page,
+      never collect everything into one list first (do not print it)
     - Is fully runnable
 
     CONSTRAINTS:
@@ -52,11 +54,13 @@ def generate_scraper_code(schema: dict, endpoint_result: Dict[str, Any], base_ur
     ENDPOINT CONSTRAINTS (MANDATORY):
     {json.dumps(endpoint_result, indent=2)}
     """
-    response = openrouter_chat(prompt=prompt, model="mistralai/devstral-2512:free")
+    # Stop at the sentinel instead of paying for tokens enforce_single_eof cuts anyway
+    response = openrouter_chat(prompt=prompt, model="mistralai/devstral-2512:free", stop_at="eof")
     return response
 
 
-def complete_scraper_code(code: str, endpoint_result: Dict[str, Any], schema: dict) -> str:
+def complete_scraper_code(code: str, endpoint_result: Dict[str, Any], schema: dict,
+                          refresh: bool = False) -> str:
     prompt = f"""
         ROLE:
         You are completing a partially generated Python file.
@@ -82,10 +86,13 @@ def complete_scraper_code(code: str, endpoint_result: Dict[str, Any], schema: di
         CODE SO FAR:
         {code}
     """
-    return openrouter_chat(prompt=prompt, model="mistralai/devstral-2512:free")
+    # refresh=True re-asks instead of replaying a cached answer the caller rejected
+    return openrouter_chat(
+        prompt=prompt, model="mistralai/devstral-2512:free", stop_at="eof", refresh=refresh
+    )
 
 
-def fix_scraper_code(code: str, msg: str):
+def fix_scraper_code(code: str, msg: str, refresh: bool = False):
     prompt = f"""
         ROLE:
         You are fixing a Python syntax error.
@@ -105,4 +112,7 @@ def fix_scraper_code(code: str, msg: str):
         {code}
     """
     
-    return openrouter_chat(prompt=prompt, model="mistralai/devstral-2512:free")
+    # refresh=True re-asks instead of replaying a cached answer the caller rejected
+    return openrouter_chat(
+        prompt=prompt, model="mistralai/devstral-2512:free", stop_at="eof", refresh=refresh
+    )
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Set, Tuple
+
+from settle import settle
+
+logger = logging.getLogger(__name__)
+
+# Attribute set on containers already handed back, so each step only returns new ones
+HARVEST_MARKER = "data-harvested"
+
+# Returns [tag, outerHTML] for every matching container not harvested yet, marking it
+COLLECT_NEW_SCRIPT = """
+([selector, marker]) => {
+    const fresh = [];
+    for (const el of document.querySelectorAll(selector)) {
+        if (el.hasAttribute(marker)) continue;
+        el.setAttribute(marker, "");
+        fresh.push([el.tagName.toLowerCase(), el.outerHTML]);
+    }
+    return fresh;
+}
+"""
+
+# Harvested containers keep the marker, so it doubles as their selector in fragments_html
+ITEM_SELECTOR = f"[{HARVEST_MARKER}]"
+
+# Containers that only parse inside a table
+_TABLE_TAGS = {"tr": "<table><tbody>{}</tbody></table>", "tbody": "<table>{}</table>"}
+_CELL_TAGS = {"td", "th"}
+
+
+def fragments_html(fragments: List[Tuple[str, str]]) -> str:
+    """
+    Wrap harvested container markup into a document where every container is
+    matched by ITEM_SELECTOR (their real ancestors aren't part of it).
+    """
+    parts = []
+    for tag, html in fragments:
+        if tag in _TABLE_TAGS:
+            parts.append(_TABLE_TAGS[tag].format(html))
+        elif tag in _CELL_TAGS:
+            parts.append(f"<table><tbody><tr>{html}</tr></tbody></table>")
+        else:
+            parts.append(html)
+    return f"<html><body>{''.join(parts)}</body></html>"
+
+
+@dataclass
+class HarvestStats:
+    steps: int = 0
+    items: int = 0
+    duplicates: int = 0
+    elapsed: float = 0.0
+    stop_reason: str = ""
+
+
+class ScrollHarvester:
+    """
+    Harvests an infinite-scroll feed without re-serializing the page: after each
+    scroll step an in-page script returns only the containers that weren't seen
+    yet (and marks them), so each step costs the new items, not the whole DOM.
+
+    Items are deduped by a hash of their markup. Stops once `patience` steps in a
+    row bring nothing new and the page stops growing, or at `max_items` /
+    `max_seconds`.
+    """
+
+    def __init__(
+        self,
+        container_selector: str,
+        max_items: int = 5000,
+        max_seconds: float = 120.0,
+        patience: int = 3,
+        step_wait: float = 5.0,
+    ):
+        self.container_selector = container_selector
+        self.max_items = max_items
+        self.max_seconds = max_seconds
+        self.patience = patience
+        self.step_wait = step_wait
+        self.stats = HarvestStats()
+        self._seen: Set[str] = set()
+
+    def _collect(self, page) -> List[Tuple[str, str]]:
+        fresh = []
+        for tag, html in page.evaluate(COLLECT_NEW_SCRIPT, [self.container_selector, HARVEST_MARKER]):
+            digest = hashlib.blake2b(html.encode("utf-8"), digest_size=16).hexdigest()
+            if digest in self._seen:
+                self.stats.duplicates += 1
+                continue
+            self._seen.add(digest)
+            fresh.append((tag, html))
+        return fresh
+
+    def iter_batches(self, page) -> Iterator[List[Tuple[str, str]]]:
+        """
+        Yields the new (tag, outerHTML) containers of each step on an already
+        navigated `page` (sync Playwright). The first batch is what's on screen.
+        """
+        self.stats = HarvestStats()
+        self._seen.clear()
+        start = time.monotonic()
+        idle = 0
+
+        try:
+            batch = self._collect(page)
+            while True:
+                if batch:
+                    remaining = self.max_items - self.stats.items
+                    batch = batch[:remaining]
+                    self.stats.items += len(batch)
+                    yield batch
+
+                if self.stats.items >= self.max_items:
+                    self.stats.stop_reason = "item budget"
+                    return
+                remaining_time = self.max_seconds - (time.monotonic() - start)
+                if remaining_time <= 0:
+                    self.stats.stop_reason = "time budget"
+                    return
+
+                result = settle(page, max_wait=min(self.step_wait, remaining_time), max_scrolls=1)
+                self.stats.steps += 1
+                batch = self._collect(page)
+
+                # Growth has flattened: no new items and the page didn't get taller
+                idle = 0 if batch or result.grew else idle + 1
+                if idle >= self.patience:
+                    self.stats.stop_reason = "no growth"
+                    return
+        finally:
+            self.stats.elapsed = time.monotonic() - start
+            logger.info(
+                f"Harvested {self.stats.items} items in {self.stats.steps} scroll steps "
+                f"({self.stats.elapsed:.1f}s, stopped: {self.stats.stop_reason or 'closed'})"
+            )
+
+    def harvest(self, page) -> List[str]:
+        """All harvested containers' outerHTML (see iter_batches)."""
+        return [html for batch in self.iter_batches(page) for _, html in batch]
+
+
+def item_schema(schema: dict) -> dict:
+    """
+    `schema` with its container selector pointed at harvested fragments. Field
+    selectors still apply, as long as they don't reach above the container.
+    """
+    return {**schema, "container_selector": ITEM_SELECTOR}
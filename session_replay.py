@@ -0,0 +1,334 @@
+"""
+Record real fetches into a HAR file and serve them back later, so fetch and
+classification runs are reproducible offline.
+
+Both paths honour the active mode: the pooled requests session and httpx
+clients (http_client) and every Playwright context the browser pools create.
+
+    with recording("quotes.har"):
+        HTMLFetcher().fetch_html("https://quotes.toscrape.com/")
+
+    with replaying("quotes.har"):
+        HTMLFetcher().fetch_html("https://quotes.toscrape.com/")  # no network
+"""
+import base64
+import itertools
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urldefrag
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Bodies of these types are stored as text, everything else base64
+_TEXT_TYPES = ("text/", "json", "javascript", "xml", "svg")
+
+# Hop-by-hop / encoding headers that no longer describe a replayed body
+_DROP_ON_REPLAY = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+def _har_headers(headers) -> List[Dict[str, str]]:
+    return [{"name": k, "value": v} for k, v in headers.items()]
+
+
+def _is_text(mime_type: str) -> bool:
+    return any(t in mime_type for t in _TEXT_TYPES)
+
+
+class HARRecorder:
+    """Collects request/response pairs from any fetch path into HAR 1.2 entries."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[dict] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        request_headers,
+        status: int,
+        response_headers,
+        body: bytes,
+        status_text: str = "",
+    ):
+        mime_type = response_headers.get("content-type", "")
+        content = {"size": len(body), "mimeType": mime_type}
+        if _is_text(mime_type):
+            content["text"] = body.decode("utf-8", errors="replace")
+        else:
+            content["text"] = base64.b64encode(body).decode("ascii")
+            content["encoding"] = "base64"
+
+        entry = {
+            "startedDateTime": datetime.now(timezone.utc).isoformat(),
+            "time": 0,
+            "request": {
+                "method": method,
+                "url": url,
+                "httpVersion": "HTTP/1.1",
+                "headers": _har_headers(request_headers),
+                "queryString": [],
+                "cookies": [],
+                "headersSize": -1,
+                "bodySize": 0,
+            },
+            "response": {
+                "status": status,
+                "statusText": status_text,
+                "httpVersion": "HTTP/1.1",
+                "headers": [
+                    h for h in _har_headers(response_headers)
+                    if h["name"].lower() not in _DROP_ON_REPLAY
+                ],
+                "cookies": [],
+                "content": content,
+                "redirectURL": response_headers.get("location", ""),
+                "headersSize": -1,
+                "bodySize": len(body),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": 0, "receive": 0},
+        }
+        with self._lock:
+            self.entries.append(entry)
+
+    # requests: Session.hooks["response"]
+    def requests_hook(self, response: requests.Response, *args, **kwargs):
+        self.record(
+            response.request.method,
+            response.url,
+            response.request.headers,
+            response.status_code,
+            response.headers,
+            response.content,
+            response.reason or "",
+        )
+
+    # httpx: AsyncClient(event_hooks={"response": [...]})
+    async def httpx_hook(self, response: httpx.Response):
+        await response.aread()
+        self.record(
+            response.request.method,
+            str(response.request.url),
+            response.request.headers,
+            response.status_code,
+            response.headers,
+            response.content,
+            response.reason_phrase,
+        )
+
+    # Playwright: context.on("requestfinished", ...)
+    def on_browser_request(self, request):
+        response = request.response()
+        if response is None:
+            return
+        try:
+            body = response.body()
+        except Exception:
+            body = b""  # Redirects and aborted loads have no body
+        self.record(request.method, request.url, request.headers, response.status,
+                    response.headers, body, response.status_text)
+
+    async def aon_browser_request(self, request):
+        response = await request.response()
+        if response is None:
+            return
+        try:
+            body = await response.body()
+        except Exception:
+            body = b""
+        self.record(request.method, request.url, request.headers, response.status,
+                    response.headers, body, response.status_text)
+
+    def save(self):
+        with self._lock:
+            har = {
+                "log": {
+                    "version": "1.2",
+                    "creator": {"name": "session_replay", "version": "1.0"},
+                    "pages": [],
+                    "entries": list(self.entries),
+                }
+            }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(har, f)
+        logger.info(f"Recorded {len(har['log']['entries'])} responses to {self.path}")
+
+
+class HARArchive:
+    """
+    Recorded responses by (method, url). A URL recorded several times (random
+    endpoints) is served round-robin in recording order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["log"]["entries"]
+
+        grouped: Dict[Tuple[str, str], List[dict]] = {}
+        for entry in entries:
+            grouped.setdefault(self._key(entry["request"]["method"], entry["request"]["url"]), []).append(entry)
+        self._cycles = {key: itertools.cycle(group) for key, group in grouped.items()}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(method: str, url: str) -> Tuple[str, str]:
+        return method.upper(), urldefrag(url)[0]
+
+    def lookup(self, method: str, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """(status, headers, body) of the next recorded response, or None."""
+        with self._lock:
+            cycle = self._cycles.get(self._key(method, url))
+            if cycle is None:
+                return None
+            entry = next(cycle)
+
+        response = entry["response"]
+        content = response["content"]
+        text = content.get("text", "")
+        body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+        headers = {h["name"]: h["value"] for h in response["headers"]}
+        return response["status"], headers, body
+
+    def httpx_transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            found = self.lookup(request.method, str(request.url))
+            if found is None:
+                raise httpx.ConnectError(f"{request.url} is not in {self.path}", request=request)
+            status, headers, body = found
+            return httpx.Response(status, headers=headers, content=body)
+
+        return httpx.MockTransport(handler)
+
+
+class HARReplayAdapter(BaseAdapter):
+    """requests transport adapter answering from a HARArchive."""
+
+    def __init__(self, archive: HARArchive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs) -> requests.Response:
+        found = self.archive.lookup(request.method, request.url)
+        if found is None:
+            raise requests.ConnectionError(f"{request.url} is not in {self.archive.path}")
+
+        status, headers, body = found
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def close(self):
+        pass
+
+
+# The active mode, consulted by http_client and browser_pool when they create
+# sessions/clients/contexts. `version` lets cached sessions notice a change.
+_recorder: Optional[HARRecorder] = None
+_archive: Optional[HARArchive] = None
+version = 0
+
+
+def active_recorder() -> Optional[HARRecorder]:
+    return _recorder
+
+
+def active_archive() -> Optional[HARArchive]:
+    return _archive
+
+
+def start_recording(path: str) -> HARRecorder:
+    global _recorder, _archive, version
+    _recorder, _archive = HARRecorder(path), None
+    version += 1
+    return _recorder
+
+
+def start_replay(path: str) -> HARArchive:
+    global _recorder, _archive, version
+    _recorder, _archive = None, HARArchive(path)
+    version += 1
+    return _archive
+
+
+def stop():
+    """Leave record/replay mode, saving the recording if there is one."""
+    global _recorder, _archive, version
+    if _recorder is not None:
+        _recorder.save()
+    _recorder, _archive = None, None
+    version += 1
+
+
+@contextmanager
+def recording(path: str):
+    recorder = start_recording(path)
+    try:
+        yield recorder
+    finally:
+        stop()
+
+
+@contextmanager
+def replaying(path: str):
+    archive = start_replay(path)
+    try:
+        yield archive
+    finally:
+        stop()
+
+
+def prepare_context(context):
+    """
+    Hook recording/replay into a new Playwright context (sync API). Replayed
+    routes are answered from the HARArchive itself, not route_from_har(), which
+    always serves a URL's first recording instead of cycling through them.
+    """
+    if _archive is not None:
+        archive = _archive
+
+        def handle(route):
+            found = archive.lookup(route.request.method, route.request.url)
+            if found is None:
+                route.abort()
+                return
+            status, headers, body = found
+            route.fulfill(status=status, headers=headers, body=body)
+
+        context.route("**/*", handle)
+    elif _recorder is not None:
+        context.on("requestfinished", _recorder.on_browser_request)
+
+
+async def aprepare_context(context):
+    """Async twin of `prepare_context`."""
+    if _archive is not None:
+        archive = _archive
+
+        async def handle(route):
+            found = archive.lookup(route.request.method, route.request.url)
+            if found is None:
+                await route.abort()
+                return
+            status, headers, body = found
+            await route.fulfill(status=status, headers=headers, body=body)
+
+        await context.route("**/*", handle)
+    elif _recorder is not None:
+        context.on("requestfinished", _recorder.aon_browser_request)
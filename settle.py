@@ -0,0 +1,191 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+# Records the time of the last DOM mutation in the page (idempotent)
+INSTALL_OBSERVER_SCRIPT = """
+() => {
+    if (!window.__settle) {
+        window.__settle = { last: performance.now() };
+        new MutationObserver(() => { window.__settle.last = performance.now(); })
+            .observe(document.documentElement || document,
+                     { childList: true, subtree: true, characterData: true });
+    }
+}
+"""
+
+SNAPSHOT_SCRIPT = """
+() => ({
+    quiet: window.__settle ? performance.now() - window.__settle.last : 1e9,
+    height: document.body ? document.body.scrollHeight : 0,
+})
+"""
+
+SCROLL_SCRIPT = """
+() => {
+    window.scrollTo(0, document.body ? document.body.scrollHeight : 0);
+    if (window.__settle) window.__settle.last = performance.now();
+}
+"""
+
+
+@dataclass
+class SettleResult:
+    elapsed: float
+    scrolls: int
+    initial_height: int
+    final_height: int
+    timed_out: bool = False
+
+    @property
+    def grew(self) -> bool:
+        return self.final_height > self.initial_height
+
+
+class _PendingRequests:
+    """In-flight request tracker. Requests older than `stale_after` (long-polls,
+    streams) stop counting, so they can't hold the page "busy" forever."""
+
+    def __init__(self, stale_after: float):
+        self.stale_after = stale_after
+        self._started: Dict[int, float] = {}
+
+    def on_request(self, request):
+        self._started[id(request)] = time.monotonic()
+
+    def on_done(self, request):
+        self._started.pop(id(request), None)
+
+    def busy(self) -> bool:
+        now = time.monotonic()
+        return any(now - t < self.stale_after for t in self._started.values())
+
+    def attach(self, page):
+        page.on("request", self.on_request)
+        page.on("requestfinished", self.on_done)
+        page.on("requestfailed", self.on_done)
+
+    def detach(self, page):
+        page.remove_listener("request", self.on_request)
+        page.remove_listener("requestfinished", self.on_done)
+        page.remove_listener("requestfailed", self.on_done)
+
+
+def _is_stable(snapshot: dict, last_height: int, quiet_ms: int, pending: _PendingRequests) -> bool:
+    return (
+        snapshot["quiet"] >= quiet_ms
+        and snapshot["height"] == last_height
+        and not pending.busy()
+    )
+
+
+def settle(
+    page,
+    max_wait: float = 10.0,
+    quiet_ms: int = 500,
+    poll_ms: int = 100,
+    scroll: bool = True,
+    max_scrolls: int = 5,
+    stale_request_s: float = 3.0,
+    settle_first: bool = True,
+) -> SettleResult:
+    """
+    Wait until the page stops changing instead of sleeping a fixed time.
+
+    "Stable" means no DOM mutation for `quiet_ms`, no scrollHeight change between
+    polls and no fresh in-flight requests. With `scroll`, keep scrolling to the
+    bottom and re-settling while the page grows, up to `max_scrolls` passes.
+    `settle_first=False` scrolls straight away, for pages settled already, so
+    all of `max_wait` goes to the scrolls. Never takes longer than ~`max_wait`
+    seconds (sync Playwright API).
+    """
+    start = time.monotonic()
+    deadline = start + max_wait
+    pending = _PendingRequests(stale_request_s)
+    pending.attach(page)
+
+    def wait_stable() -> dict:
+        snapshot = page.evaluate(SNAPSHOT_SCRIPT)
+        while time.monotonic() < deadline:
+            page.wait_for_timeout(poll_ms)
+            last_height = snapshot["height"]
+            snapshot = page.evaluate(SNAPSHOT_SCRIPT)
+            if _is_stable(snapshot, last_height, quiet_ms, pending):
+                break
+        return snapshot
+
+    try:
+        page.evaluate(INSTALL_OBSERVER_SCRIPT)
+        snapshot = wait_stable() if settle_first else page.evaluate(SNAPSHOT_SCRIPT)
+        initial_height = snapshot["height"]
+
+        scrolls = 0
+        while scroll and scrolls < max_scrolls and time.monotonic() < deadline:
+            before = snapshot["height"]
+            page.evaluate(SCROLL_SCRIPT)
+            scrolls += 1
+            snapshot = wait_stable()
+            if snapshot["height"] <= before:
+                break  # Nothing more loaded
+    finally:
+        pending.detach(page)
+
+    return SettleResult(
+        elapsed=time.monotonic() - start,
+        scrolls=scrolls,
+        initial_height=initial_height,
+        final_height=snapshot["height"],
+        timed_out=time.monotonic() >= deadline,
+    )
+
+
+async def asettle(
+    page,
+    max_wait: float = 10.0,
+    quiet_ms: int = 500,
+    poll_ms: int = 100,
+    scroll: bool = True,
+    max_scrolls: int = 5,
+    stale_request_s: float = 3.0,
+    settle_first: bool = True,
+) -> SettleResult:
+    """Async twin of `settle`."""
+    start = time.monotonic()
+    deadline = start + max_wait
+    pending = _PendingRequests(stale_request_s)
+    pending.attach(page)
+
+    async def wait_stable() -> dict:
+        snapshot = await page.evaluate(SNAPSHOT_SCRIPT)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(poll_ms / 1000)
+            last_height = snapshot["height"]
+            snapshot = await page.evaluate(SNAPSHOT_SCRIPT)
+            if _is_stable(snapshot, last_height, quiet_ms, pending):
+                break
+        return snapshot
+
+    try:
+        await page.evaluate(INSTALL_OBSERVER_SCRIPT)
+        snapshot = await wait_stable() if settle_first else await page.evaluate(SNAPSHOT_SCRIPT)
+        initial_height = snapshot["height"]
+
+        scrolls = 0
+        while scroll and scrolls < max_scrolls and time.monotonic() < deadline:
+            before = snapshot["height"]
+            await page.evaluate(SCROLL_SCRIPT)
+            scrolls += 1
+            snapshot = await wait_stable()
+            if snapshot["height"] <= before:
+                break  # Nothing more loaded
+    finally:
+        pending.detach(page)
+
+    return SettleResult(
+        elapsed=time.monotonic() - start,
+        scrolls=scrolls,
+        initial_height=initial_height,
+        final_height=snapshot["height"],
+        timed_out=time.monotonic() >= deadline,
+    )
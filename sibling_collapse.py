@@ -0,0 +1,102 @@
+"""
+Collapses runs of structurally equal siblings (a grid of 60 product cards) to
+a few exemplars plus a marker, e.g. `<!-- 57 more similar li.product -->`.
+Two or three cards are enough to infer container and field selectors, so the
+schema prompt doesn't need the other 57.
+
+Works on a parsed copy of a candidate block (see prompt_packer); the page's
+Document is never touched, so validate_schema still checks the full DOM.
+"""
+from typing import FrozenSet, List
+
+from bs4 import Comment, Tag
+
+
+class CollapseMarker(Comment):
+    """The `N more similar ...` comment; survives prompt_packer's comment stripping."""
+
+
+# Table cells are addressed by position (td:nth-child(3)); collapsing them would shift columns
+POSITIONAL_TAGS = {"td", "th", "col", "br"}
+
+
+def signature(tag: Tag) -> str:
+    """tag.class1.class2, in markup order (it doubles as the marker's selector)."""
+    classes = tag.get("class") or []
+    return ".".join([tag.name, *classes])
+
+
+def _shape(tag: Tag) -> FrozenSet[str]:
+    """Which kinds of descendants an item has (a sale badge, a rating...)."""
+    return frozenset(signature(t) for t in tag.find_all(True))
+
+
+def pick_exemplars(run: List[Tag], keep: int) -> List[Tag]:
+    """
+    `keep` items of `run`, preferring ones whose inner structure differs (so
+    optional fields show up), then spread evenly; returned in document order.
+    """
+    chosen = [0]
+    seen_shapes = [_shape(run[0])]
+    for i in range(1, len(run)):
+        if len(chosen) >= keep:
+            break
+        shape = _shape(run[i])
+        if shape not in seen_shapes:
+            chosen.append(i)
+            seen_shapes.append(shape)
+
+    # First, middle, last... then anything left if those were taken already
+    spread = [round(k * (len(run) - 1) / max(keep - 1, 1)) for k in range(keep)]
+    for i in [*spread, *range(len(run))]:
+        if len(chosen) >= keep:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    return [run[i] for i in sorted(chosen)]
+
+
+def _runs(parent: Tag) -> List[List[Tag]]:
+    """Consecutive element children with the same signature (text between them is ignored)."""
+    runs: List[List[Tag]] = []
+    current: List[Tag] = []
+    for child in parent.children:
+        if not isinstance(child, Tag):
+            continue
+        if current and signature(child) == signature(current[0]):
+            current.append(child)
+        else:
+            if current:
+                runs.append(current)
+            current = [child]
+    if current:
+        runs.append(current)
+    return runs
+
+
+def collapse_repeated_siblings(root: Tag, keep: int = 3) -> int:
+    """
+    Collapse every run of more than `keep + 1` equal siblings under `root`, in
+    place, to `keep` exemplars and a marker comment. Returns how many elements
+    were removed.
+    """
+    removed = 0
+    stack = [root]
+    while stack:
+        parent = stack.pop()
+        for run in _runs(parent):
+            if len(run) <= keep + 1 or run[0].name in POSITIONAL_TAGS:
+                stack.extend(run)
+                continue
+
+            exemplars = pick_exemplars(run, keep)
+            kept = set(map(id, exemplars))
+            for tag in run:
+                if id(tag) not in kept:
+                    tag.decompose()
+            dropped = len(run) - len(exemplars)
+            exemplars[-1].insert_after(CollapseMarker(f" {dropped} more similar {signature(run[0])} "))
+            removed += dropped
+            # Only the exemplars are left to look inside
+            stack.extend(exemplars)
+    return removed
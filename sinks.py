@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Iterable, List, Optional, Sequence
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _scalar(value: Any):
+    """Flatten a row value for CSV/SQLite columns (lists become JSON)."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+class _Sink(ABC):
+    """Context-manager base: rows in via write(), flushed incrementally, close() on exit."""
+
+    rows_written = 0
+
+    @abstractmethod
+    def write(self, row: dict):
+        ...
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONSink(_Sink):
+    """One JSON object per line. Each row is flushed, so interrupted runs keep every row written."""
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, row: dict):
+        self._file.write(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        self._file.close()
+
+
+class CSVSink(_Sink):
+    """
+    CSV with a header taken from `fieldnames` or the first row. Unknown keys in
+    later rows are dropped; list values are stored as JSON.
+    """
+
+    def __init__(self, path: str, fieldnames: Optional[Sequence[str]] = None, append: bool = False):
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.rows_written = 0
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self._writer = None
+        self._write_header = write_header
+
+    def write(self, row: dict):
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(row.keys())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction="ignore")
+            if self._write_header:
+                self._writer.writeheader()
+
+        self._writer.writerow({k: _scalar(v) for k, v in row.items()})
+        self._file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        self._file.close()
+
+
+class SQLiteSink(_Sink):
+    """
+    Rows into a SQLite table, inserted in batches of `batch_size` (each batch is
+    committed, so an interrupted crawl keeps everything up to the last batch).
+
+    With `dedupe_keys`, rows whose values for those columns were already stored
+    are skipped (a UNIQUE index + INSERT OR IGNORE), including across runs and
+    in tables created by an earlier sink without keys. SQLite treats NULLs as
+    distinct in a UNIQUE index, so a row with any dedupe key missing (None) is
+    always inserted, never deduped. Columns are created from the first row;
+    later rows may add new ones.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "rows",
+        batch_size: int = 500,
+        dedupe_keys: Optional[Sequence[str]] = None,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+
+        self.path = path
+        self.table = table
+        self.batch_size = batch_size
+        self.dedupe_keys = list(dedupe_keys or [])
+        self.rows_written = 0  # Rows handed to write(); duplicates included
+        self.rows_skipped = 0
+
+        self._db = sqlite3.connect(path)
+        self._columns: List[str] = [
+            r[1] for r in self._db.execute(f'PRAGMA table_info("{table}")').fetchall()
+        ]
+        self._batch: List[dict] = []
+        if self._columns:
+            self._ensure_dedupe_index()
+
+    def _ensure_dedupe_index(self):
+        if not self.dedupe_keys:
+            return
+        for key in self.dedupe_keys:
+            if key not in self._columns:
+                self._db.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{key}"')
+                self._columns.append(key)
+        keys_sql = ", ".join(f'"{k}"' for k in self.dedupe_keys)
+        # Named after its keys, so a sink with other keys doesn't find this one "existing"
+        index = "_".join([self.table, "dedupe", *self.dedupe_keys]).replace('"', "")
+        try:
+            self._db.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS "{index}" ON "{self.table}" ({keys_sql})'
+            )
+        except sqlite3.IntegrityError as e:
+            raise ValueError(
+                f"Table {self.table!r} already holds duplicate rows for {self.dedupe_keys}"
+            ) from e
+        self._db.commit()
+
+    def _ensure_columns(self, row: dict):
+        missing = [k for k in row if k not in self._columns]
+        if not missing and self._columns:
+            return
+
+        if not self._columns:
+            columns = list(dict.fromkeys([*self.dedupe_keys, *row.keys()]))
+            cols_sql = ", ".join(f'"{c}"' for c in columns)
+            self._db.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ({cols_sql})')
+            self._columns = columns
+            self._ensure_dedupe_index()
+        else:
+            for column in missing:
+                self._db.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{column}"')
+                self._columns.append(column)
+
+    def write(self, row: dict):
+        self._batch.append(row)
+        self.rows_written += 1
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+
+        for row in self._batch:
+            self._ensure_columns(row)
+
+        cols_sql = ", ".join(f'"{c}"' for c in self._columns)
+        placeholders = ", ".join("?" for _ in self._columns)
+        verb = "INSERT OR IGNORE" if self.dedupe_keys else "INSERT"
+
+        before = self._db.total_changes
+        self._db.executemany(
+            f'{verb} INTO "{self.table}" ({cols_sql}) VALUES ({placeholders})',
+            [[_scalar(row.get(c)) for c in self._columns] for row in self._batch],
+        )
+        self.rows_skipped += len(self._batch) - (self._db.total_changes - before)
+        self._db.commit()
+        self._batch.clear()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+
+def write_rows(rows: Iterable[dict], *sinks: _Sink) -> int:
+    """Stream `rows` into every sink as they're produced. Returns the row count."""
+    count = 0
+    for row in rows:
+        for sink in sinks:
+            sink.write(row)
+        count += 1
+    return count
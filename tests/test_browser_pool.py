@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import AsyncBrowserPool, BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncBrowser(FakeBrowser):
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    """Launches succeed `ok` times, then fail."""
+
+    def __init__(self, ok: int, browser_cls=FakeBrowser):
+        self.ok = ok
+        self.browser_cls = browser_cls
+        self.launched = []
+        self.stopped = False
+        self.chromium = self
+
+    def _launch(self):
+        if len(self.launched) >= self.ok:
+            raise RuntimeError("launch failed")
+        browser = self.browser_cls()
+        self.launched.append(browser)
+        return browser
+
+    def launch(self, headless=True):
+        return self._launch()
+
+    def start(self):
+        return self
+
+    def stop(self):
+        self.stopped = True
+
+
+class FakeAsyncPlaywright(FakePlaywright):
+    def __init__(self, ok: int):
+        super().__init__(ok, FakeAsyncBrowser)
+
+    async def launch(self, headless=True):
+        return self._launch()
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        self.stopped = True
+
+
+def test_sync_pool_failed_launch_leaves_it_unstarted(monkeypatch):
+    fake = FakePlaywright(ok=1)
+    monkeypatch.setattr(browser_pool, "sync_playwright", lambda: fake)
+    pool = BrowserPool(browsers=2)
+
+    with pytest.raises(RuntimeError, match="launch failed"):
+        pool.start()
+    assert pool._playwright is None
+    assert pool._slots.empty()
+    assert fake.stopped and all(b.closed for b in fake.launched)
+    pool.close()
+
+    # The next use retries the launch instead of waiting for a page that never comes
+    fake.ok = 10
+    pool.start()
+    assert pool._slots.qsize() == pool.size
+    pool.close()
+
+
+def test_async_pool_failed_launch_leaves_it_unstarted(monkeypatch):
+    fake = FakeAsyncPlaywright(ok=1)
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: fake)
+    pool = AsyncBrowserPool(browsers=2)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="launch failed"):
+            async with pool.page():
+                pass
+        await pool.close()  # Doesn't mask the launch error with its own
+        assert pool._playwright is None and pool._slots is None
+        assert fake.stopped and all(b.closed for b in fake.launched)
+
+        fake.ok = 10
+        await pool.start()
+        assert pool._slots.qsize() == pool.size
+        await pool.close()
+
+    asyncio.run(run())
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+from coercion import FieldCoercer, SchemaCoercer, cast_value, normalize_url
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("42", 42.0),
+        ("-5", -5.0),
+        ("−3.5", -3.5),
+        ("£1,234.56", 1234.56),
+        ("1.234,56 €", 1234.56),
+        ("1 234,56", 1234.56),
+        ("(1,234)", -1234.0),
+        ("($12.50)", -12.5),
+        ("(3 reviews)", 3.0),
+        ("4 stars", 4.0),
+        (".75", 0.75),
+        ("-.5", -0.5),
+        ("$.99", 0.99),
+        ("(.5)", -0.5),
+        ("1e5", 100000.0),
+        ("1.5e3", 1500.0),
+        (" 3.25 ", 3.25),
+    ],
+)
+def test_cast_number(value, expected):
+    assert cast_value(value, "number") == expected
+
+
+def test_ambiguous_numbers_fail_instead_of_taking_the_first():
+    coercer = FieldCoercer("n", "number")
+    assert coercer.coerce_many(["12 Jan 2024", "3 for £10", "n/a"]) == ["12 Jan 2024", "3 for £10", "n/a"]
+    assert coercer.report.failed == 3
+    assert coercer.report.total == 3
+
+
+def test_numbers_amid_words_are_reported():
+    coercer = FieldCoercer("n", "number")
+    assert coercer.coerce_many(["12.99 USD", "£5", "7", None]) == [12.99, 5.0, 7.0, None]
+    assert coercer.report.extracted == 1
+    assert coercer.report.failed == 0
+    assert coercer.report.total == 3
+
+
+def test_decimal_style_is_detected_per_column():
+    comma = FieldCoercer("price", "number")
+    # "1.234" alone is ambiguous; the column's other values settle it as thousands
+    assert comma.coerce_many(["12,50", "3,99", "1.234"]) == [12.5, 3.99, 1234.0]
+    assert comma.report.detected_format == "comma"
+
+    dot = FieldCoercer("price", "number")
+    assert dot.coerce_many(["12.50", "3.99", "1,234"]) == [12.5, 3.99, 1234.0]
+    assert dot.report.detected_format == "dot"
+
+
+def test_dates_use_the_detected_format():
+    coercer = FieldCoercer("d", "date")
+    out = coercer.coerce_many(["03/04/2024", "25/12/2023", "not a date"])
+    assert out[:2] == [datetime(2024, 4, 3), datetime(2023, 12, 25)]
+    assert out[2] == "not a date"
+    assert coercer.report.detected_format == "%d/%m/%Y"
+    assert coercer.report.failed == 1
+
+
+def test_day_month_ambiguity_needs_evidence():
+    coercer = FieldCoercer("d", "date")
+    assert coercer.coerce_many(["12/01/2024", "01/01/2024"]) == ["12/01/2024", datetime(2024, 1, 1)]
+    assert coercer.report.ambiguous == 1
+    assert coercer.report.failed == 1
+    assert coercer.report.detected_format is None
+
+    # A later batch with an unambiguous value settles the column
+    assert coercer.coerce_many(["25/01/2024", "12/01/2024"]) == [datetime(2024, 1, 25), datetime(2024, 1, 12)]
+    assert coercer.report.detected_format == "%d/%m/%Y"
+
+    us = FieldCoercer("d", "date")
+    assert us.coerce_many(["12/01/2024", "01/31/2024"]) == [datetime(2024, 12, 1), datetime(2024, 1, 31)]
+    assert us.report.ambiguous == 0
+
+
+def test_normalize_url():
+    assert normalize_url("/a?b=1#top", "HTTPS://Example.com:443/x/") == "https://example.com/a?b=1"
+    assert normalize_url("mailto:a@b.c") == "mailto:a@b.c"
+
+
+def test_schema_coercer_handles_list_fields():
+    schema = {"fields": {"prices": {"type": "number[]"}, "title": {"type": "string"}}}
+    rows = [{"prices": ["1,50", "2,25"], "title": "a"}, {"prices": [], "title": "b"}]
+    coerced = SchemaCoercer(schema).coerce_rows(rows)
+    assert coerced[0]["prices"] == [1.5, 2.25]
+    assert coerced[1]["prices"] == []
+    assert coerced[0]["title"] == "a"
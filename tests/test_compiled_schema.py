@@ -0,0 +1,140 @@
+import pytest
+import requests
+
+from compiled_schema import CompiledSchema
+from document import Document
+from extraction import extract_data
+from fixture_server import FixtureServer
+
+BASE_URL = "https://shop.example.com/catalog/"
+
+PRODUCT_SCHEMA = {
+    "entity": "product",
+    "container_selector": "article.product",
+    "fields": {
+        "title": {"selector": "h3 a", "type": "string"},
+        "url": {"selector": "h3 a", "attribute": "href", "type": "url"},
+        "price": {"selector": ".price", "type": "float"},
+        "rating": {"selector": ".rating", "type": "int"},
+        "date": {"selector": "time", "type": "date"},
+    },
+}
+
+LISTING = """
+<html><body><main>
+  <section class="products">
+    <article class="product featured" data-sku="A1">
+      <h3><a href="/item/1" rel="bookmark nofollow">Lamp <b>XL</b></a></h3>
+      <p class="price">£12.50</p>
+      <ul class="tags"><li>home</li><li> light </li><li></li></ul>
+      <img src="img/1.jpg"><img src="https://cdn.example.com/1b.jpg"><img>
+      <script>var tracking = "not text";</script>
+      <style>.price { color: red }</style>
+    </article>
+    <article class="product" data-sku="B2">
+      <h3><a href="?id=2">Chair</a></h3>
+      <p class="price"></p>
+      <ul class="tags"></ul>
+      <article class="product" data-sku="B2-child">
+        <h3><a href="#variant">Chair (oak)</a></h3>
+        <ul class="tags"><li>wood</li></ul>
+      </article>
+    </article>
+    <article class="product"><p class="unrelated">no fields here</p></article>
+  </section>
+  <aside><h3><a href="/outside">Not a product</a></h3></aside>
+</main></body></html>
+"""
+
+NESTED_SCHEMA = {
+    "entity": "product",
+    "container_selector": "article.product",
+    "fields": {
+        "title": {"selector": "h3", "type": "string"},
+        "sku": {"selector": "h3", "attribute": "data-missing", "type": "string"},
+        "link": {"selector": "h3 > a", "attribute": "href", "type": "url"},
+        "rel": {"selector": "a", "attribute": "rel", "type": "string"},
+        "tags": {"selector": "ul.tags li", "type": "string[]"},
+        "images": {"selector": "img", "attribute": "src", "type": "url[]"},
+        "price": {"selector": "p.price", "type": "float"},
+        # References the container's ancestor, which container.select() allows
+        "section_titles": {"selector": "section.products h3 a", "type": "string[]"},
+    },
+}
+
+
+def assert_equivalent(schema, html, base_url=BASE_URL):
+    compiled = CompiledSchema(schema)
+    expected = extract_data(schema, html, base_url)
+    assert compiled.extract(html, base_url) == expected
+    assert compiled.extract(Document(html, url=base_url), base_url) == expected
+    return expected
+
+
+def test_nested_containers_lists_and_attributes():
+    rows = assert_equivalent(NESTED_SCHEMA, LISTING)
+    # Sanity check that the fixture exercises what it's meant to
+    assert len(rows) == 3
+    assert rows[0]["tags"] == ["home", "light"]
+    assert rows[0]["rel"] == BASE_URL + "bookmark"  # first of the split list, joined like any attribute
+    assert len(rows[0]["images"]) == 2
+    assert rows[1]["tags"] == ["wood"]  # picked up from the nested container
+    assert rows[0]["title"] == "LampXL"
+
+
+def test_without_base_url():
+    assert_equivalent(NESTED_SCHEMA, LISTING, base_url=None)
+
+
+def test_no_containers_and_empty_rows():
+    assert_equivalent(NESTED_SCHEMA, "<html><body><p>Nothing to see</p></body></html>")
+    empty = {"container_selector": "article", "fields": {"x": {"selector": ".missing"}}}
+    assert assert_equivalent(empty, LISTING) == []
+
+
+@pytest.fixture(scope="module")
+def pages():
+    with FixtureServer(items=15) as server:
+        return {
+            path: requests.get(server.url(path), timeout=10).text
+            for path in ["/default", "/paginated?page=2", "/random", "/tableful"]
+        }
+
+
+@pytest.mark.parametrize("path", ["/default", "/paginated?page=2", "/random"])
+def test_fixture_pages(pages, path):
+    assert len(assert_equivalent(PRODUCT_SCHEMA, pages[path])) == 15
+
+
+def test_fixture_table(pages):
+    schema = {
+        "entity": "product",
+        "container_selector": "table.products tbody tr",
+        "fields": {
+            "title": {"selector": "td:nth-child(1) a", "type": "string"},
+            "url": {"selector": "td:nth-child(1) a", "attribute": "href", "type": "url"},
+            "cells": {"selector": "td", "type": "string[]"},
+        },
+    }
+    assert len(assert_equivalent(schema, pages["/tableful"])) == 15
+
+
+def test_pseudo_classes_cssselect_translates():
+    schema = {
+        "entity": "product",
+        "container_selector": "article.product:has(p.price)",
+        "fields": {
+            "odd_tags": {"selector": "li:nth-of-type(2n+1)", "type": "string[]"},
+            "first_tag": {"selector": "ul.tags li:first-child", "type": "string"},
+            "not_bold": {"selector": "h3 a:not(.missing)", "type": "string"},
+        },
+    }
+    assert len(assert_equivalent(schema, LISTING)) == 2
+
+
+def test_try_compile_rejects_untranslatable_selectors():
+    schema = dict(PRODUCT_SCHEMA, container_selector="article:-soup-contains(Lamp)")
+    assert CompiledSchema.try_compile(schema) is None
+    with pytest.raises(ValueError):
+        CompiledSchema(schema)
+
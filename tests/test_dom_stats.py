@@ -0,0 +1,107 @@
+import os
+
+import pytest
+import requests
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+from document import Document  # noqa: E402
+from dom_stats import NAV_KEYWORDS, compute_dom_stats  # noqa: E402
+from fixture_server import EXPECTED_LABELS, FixtureServer  # noqa: E402
+from html_fetcher import is_navigation_block, score_content_block  # noqa: E402
+
+
+# The per-block heuristics as they were before compute_dom_stats, for reference
+def old_is_navigation_block(tag) -> bool:
+    text = tag.get_text(" ", strip=True).lower()
+    links = tag.find_all("a")
+    imgs = tag.find_all("img")
+    if len(imgs) > 2:
+        return False
+    if tag.name in {"nav", "footer"}:
+        return True
+    if links and len(text) < 200 and len(links) >= 3 and not imgs:
+        return True
+    return sum(1 for k in NAV_KEYWORDS if k in text) >= 2
+
+
+def old_score_content_block(tag) -> float:
+    text_len = len(tag.get_text(" ", strip=True))
+    if text_len == 0:
+        return 0.0
+    links = tag.find_all("a")
+    imgs = tag.find_all("img")
+    score = min(text_len / 200, 5.0) + len(imgs) * 2.0
+    child_tags = [child.name for child in tag.find_all(recursive=False) if child.name]
+    if child_tags:
+        count = child_tags.count(max(set(child_tags), key=child_tags.count))
+        if count > 3:
+            score += count * 1.5
+    link_text_len = sum(len(a.get_text(strip=True)) for a in links)
+    if link_text_len / text_len > 0.7 and not imgs:
+        score -= 5.0
+    return score
+
+
+BOILERPLATE = """
+<html><body>
+<nav><a href="/">Home</a><a href="/login">Login</a><a href="/cart">Cart</a></nav>
+<header><a href="/account">My account</a> <a href="/wishlist">Wishlist</a></header>
+<div class="grid">
+  <div class="card"><img src="a.png"><a href="/a">A &amp; B</a><p>Caf&eacute; lamp</p></div>
+  <div class="card"><img src="b.png"><a href="/b">B</a><!-- sponsored --><p>Chair</p></div>
+  <div class="card"><img src="c.png"><a href="/c">C</a><p>Desk</p></div>
+  <div class="card"><img src="d.png"><br><a href="/d">D</a><p>Rug</p></div>
+</div>
+<div class="links"><a href="/1">One</a><a href="/2">Two</a><a href="/3">Three</a></div>
+<script>var login = "account";</script><style>.cart{}</style>
+<footer>Copyright 2024 - <a href="/privacy">Privacy policy</a> - Follow us on Twitter</footer>
+</body></html>
+"""
+
+
+@pytest.fixture(scope="module")
+def pages():
+    with FixtureServer(items=12) as server:
+        fetched = {path: requests.get(server.url(path), timeout=10).text for path in EXPECTED_LABELS}
+    fetched["boilerplate"] = BOILERPLATE
+    return fetched
+
+
+def test_scores_match_the_per_block_heuristics(pages):
+    for name, html in pages.items():
+        soup = Document(html).soup
+        stats = compute_dom_stats(soup)
+        for tag in soup.find_all(True):
+            assert is_navigation_block(tag, stats) == old_is_navigation_block(tag), (name, tag.name)
+            assert score_content_block(tag, stats) == pytest.approx(old_score_content_block(tag)), (name, tag.name)
+
+
+def test_counts_match_get_text_and_find_all(pages):
+    for html in pages.values():
+        soup = Document(html).soup
+        stats = compute_dom_stats(soup)
+        for tag in soup.find_all(True):
+            node = stats[id(tag)]
+            assert node.text_len == len(tag.get_text(" ", strip=True))
+            assert node.link_count == len(tag.find_all("a"))
+            assert node.img_count == len(tag.find_all("img"))
+
+
+def test_serialized_size_is_close_to_str(pages):
+    # Only compared against a 100 KB cut-off, so a few escaped entities don't matter
+    for html in pages.values():
+        soup = Document(html).soup
+        stats = compute_dom_stats(soup)
+        for tag in soup.find_all(["body", "main", "section", "table", "article", "div", "nav", "footer"]):
+            actual = len(str(tag))
+            assert abs(stats[id(tag)].serialized_size - actual) <= max(10, actual * 0.02)
+
+
+def test_stats_without_precomputed_map():
+    soup = Document(BOILERPLATE).soup
+    footer = soup.footer
+    assert is_navigation_block(footer) == old_is_navigation_block(footer)
+    assert score_content_block(soup.find(class_="grid")) == pytest.approx(
+        old_score_content_block(soup.find(class_="grid"))
+    )
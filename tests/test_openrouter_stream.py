@@ -0,0 +1,119 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+import openrouter_client  # noqa: E402
+from openrouter_client import ChatMetrics, JSONObjectWatcher, SentinelWatcher  # noqa: E402
+
+
+def feed_all(watcher, chunks):
+    for chunk in chunks:
+        usable = watcher.feed(chunk)
+        if usable is not None:
+            return usable
+    return None
+
+
+def test_json_watcher_stops_after_a_leading_object():
+    text = '{"entity": "quote", "fields": {"text": {"selector": "span.text"}}}\n\nThat is the schema.'
+    usable = feed_all(JSONObjectWatcher(), [text[i : i + 7] for i in range(0, len(text), 7)])
+    assert json.loads(usable)["entity"] == "quote"
+
+
+def test_json_watcher_respects_braces_in_strings():
+    usable = feed_all(JSONObjectWatcher(), ['{"sel": "a}{b", ', '"n": 1}', " trailing"])
+    assert json.loads(usable) == {"sel": "a}{b", "n": 1}
+
+
+def test_json_watcher_skips_objects_in_prose_for_a_later_fenced_block():
+    chunks = [
+        "An empty config looks like {} but the schema is:\n",
+        '```json\n{"entity": "product"',
+        "}\n```\nDone.",
+    ]
+    watcher = JSONObjectWatcher()
+    assert watcher.feed(chunks[0]) is None
+    assert watcher.feed(chunks[1]) is None
+    usable = watcher.feed(chunks[2])
+    assert usable.endswith("```")
+    fenced = openrouter_client.FENCED_JSON.findall(usable)
+    assert json.loads(fenced[0]) == {"entity": "product"}
+
+
+def test_json_watcher_skips_unparseable_fenced_blocks():
+    watcher = JSONObjectWatcher()
+    assert feed_all(watcher, ["```json\n{not json}\n```\n", '```json\n{"a": 1}\n```']) is not None
+    assert json.loads(openrouter_client.FENCED_JSON.findall(watcher.text)[-1]) == {"a": 1}
+
+
+def test_sentinel_split_across_chunks():
+    usable = feed_all(SentinelWatcher(), ["print(1)\n# === END ", "OF FILE ===\nextra"])
+    assert usable == "print(1)\n# === END OF FILE ===\n"
+
+
+class FakeStream:
+    def __init__(self, events):
+        body = "".join(f"data: {e}\n\n" for e in events).encode("utf-8")
+        self._chunks = [body]
+        self.raw = self
+        self.request = type("Request", (), {"body": b"{}"})()
+
+    def read1(self, size, decode_content=True):
+        return self._chunks.pop(0) if self._chunks else b""
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get(self, model, prompt, params):
+        return None
+
+    def put(self, model, prompt, params, response):
+        self.stored[prompt] = response
+
+
+def delta(text):
+    return json.dumps({"choices": [{"delta": {"content": text}}]})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(openrouter_client, "get_llm_cache", lambda: cache)
+    return cache
+
+
+def chat(monkeypatch, events, **kwargs):
+    monkeypatch.setattr(openrouter_client.requests, "post", lambda **_: FakeStream(events))
+    metrics = ChatMetrics()
+    content = openrouter_client.openrouter_chat("prompt", "model", stream=True, metrics=metrics, **kwargs)
+    return content, metrics
+
+
+def test_stream_cut_off_before_done_is_not_cached(monkeypatch, cache):
+    content, metrics = chat(monkeypatch, [delta("partial ans")])
+    assert content == "partial ans"
+    assert not metrics.complete
+    assert cache.stored == {}
+
+
+def test_stream_with_done_is_cached(monkeypatch, cache):
+    content, metrics = chat(monkeypatch, [delta("full "), delta("answer"), "[DONE]"])
+    assert metrics.complete
+    assert cache.stored == {"prompt": "full answer"}
+
+
+def test_stream_stopped_early_is_cached(monkeypatch, cache):
+    content, metrics = chat(monkeypatch, [delta('{"a": 1}'), delta(" and more")], stop_at="json")
+    assert metrics.stopped_early and metrics.complete
+    assert cache.stored == {"prompt": '{"a": 1}'}
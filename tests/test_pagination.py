@@ -0,0 +1,79 @@
+import asyncio
+
+from document import Document
+from pagination import PageTemplate, crawl_pages, detect_template, diff_template, find_next_url
+
+
+def page(body: str, head: str = "") -> Document:
+    return Document(f"<html><head>{head}</head><body>{body}</body></html>")
+
+
+def test_query_page_template_from_next_link():
+    document = page('<a href="/list?page=4" rel="next">Next</a>')
+    assert detect_template(document, "https://x.com/list?page=3") == PageTemplate(
+        "https://x.com/list?page={page}", 3, 1
+    )
+
+
+def test_path_page_template_from_next_link():
+    document = page('<li class="next"><a href="/blog/page/3/">Older</a></li>')
+    assert detect_template(document, "https://x.com/blog/page/2/") == PageTemplate(
+        "https://x.com/blog/page/{page}/", 2, 1
+    )
+
+
+def test_link_rel_next_in_head():
+    document = page("", head='<link rel="next" href="https://x.com/list?page=2">')
+    assert find_next_url(document, "https://x.com/list?page=1") == "https://x.com/list?page=2"
+    assert detect_template(document, "https://x.com/list?page=1").step == 1
+
+
+def test_unnumbered_first_page():
+    document = page('<a rel="next" href="/questions?page=2">next</a>')
+    assert detect_template(document, "https://x.com/questions") == PageTemplate(
+        "https://x.com/questions?page={page}", 1, 1
+    )
+
+    document = page('<a rel="next" href="/posts/page/2/">next</a>')
+    assert detect_template(document, "https://x.com/posts/").pattern == "https://x.com/posts/page/{page}/"
+
+
+def test_offset_step():
+    document = page('<a rel="next" href="/r?start=40">next</a>')
+    assert detect_template(document, "https://x.com/r?start=20") == PageTemplate(
+        "https://x.com/r?start={page}", 20, 20
+    )
+
+
+def test_numbered_links_without_next():
+    links = "".join(f'<a href="/list?page={n}">{n}</a>' for n in (2, 3, 4))
+    template = detect_template(page(links), "https://x.com/list")
+    assert template == PageTemplate("https://x.com/list?page={page}", 1, 1)
+
+
+def test_no_template():
+    assert detect_template(page('<a href="/about">About</a>'), "https://x.com/") is None
+    assert diff_template("https://x.com/a/1/b/1", "https://x.com/a/2/b/2") is None
+
+
+def test_crawl_pages_stops_at_first_page_without_new_rows():
+    pages = {
+        f"https://x.com/list?page={n}": page(
+            f'<p>{"row" if n < 4 else ""}{n}</p><a rel="next" href="/list?page={n + 1}">next</a>'
+        )
+        for n in range(1, 10)
+    }
+    fetched = []
+
+    async def fetch(url: str) -> Document:
+        fetched.append(url)
+        return pages[url]
+
+    def extract(document: Document, url: str):
+        return [{"url": url}] if "row" in document.text else []
+
+    async def crawl():
+        return [url async for url, _ in crawl_pages(fetch, "https://x.com/list?page=1", extract, window=2)]
+
+    assert asyncio.run(crawl()) == [f"https://x.com/list?page={n}" for n in (1, 2, 3)]
+    assert len(fetched) <= 1 + 3 + 2  # First page, the rows' pages and the prefetch window
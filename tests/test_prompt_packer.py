@@ -0,0 +1,101 @@
+from bs4 import BeautifulSoup
+
+from prompt_packer import estimate_tokens, minify, pack_blocks, shrink
+from sibling_collapse import CollapseMarker, collapse_repeated_siblings, pick_exemplars
+
+
+def soup(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, "html.parser")
+
+
+def test_nested_elements_are_skipped():
+    tree = soup('<div id="outer"><ul id="inner"><li>a</li></ul></div><p>other</p>')
+    outer, inner, other = tree.find(id="outer"), tree.find(id="inner"), tree.p
+    packed = pack_blocks([outer, inner, other])
+    assert packed.nested == 1
+    assert len(packed.blocks) == 2
+
+
+def test_identical_markup_of_different_elements_is_kept():
+    tree = soup("<section><p>Same</p></section><section><p>Same</p></section>")
+    first, second = tree.find_all("section")
+    packed = pack_blocks([first, second])
+    assert packed.nested == 0
+    assert packed.blocks == ["<section><p>Same</p></section>"] * 2
+
+
+def test_substring_markup_of_unrelated_element_is_kept():
+    tree = soup("<div><p>Price</p><span>x</span></div><p>Price</p>")
+    packed = pack_blocks([tree.div, tree.find_all("p")[1]])
+    assert packed.nested == 0
+    assert len(packed.blocks) == 2
+
+
+def test_markup_strings_are_all_packed():
+    packed = pack_blocks(["<p>a</p>", "<div><p>a</p></div>"])
+    assert packed.nested == 0
+    assert len(packed.blocks) == 2
+
+
+def test_packing_leaves_the_page_tree_alone():
+    tree = soup('<ul style="x">' + "<li class='item'>row</li>" * 10 + "</ul>")
+    before = str(tree)
+    pack_blocks([tree.ul])
+    assert str(tree) == before
+
+
+def test_over_budget_block_is_shrunk_and_later_ones_dropped():
+    items = "".join(f"<li>item number {i} with some text</li>" for i in range(200))
+    tree = soup(f"<ul>{items}</ul><p>late</p>")
+    packed = pack_blocks([tree.ul, tree.p], token_budget=300, exemplars=None)
+    assert packed.shrunk == 1
+    assert packed.dropped == 1
+    assert packed.tokens <= 300 + 10
+    assert "more nodes omitted" in packed.blocks[0]
+
+
+def test_minify_drops_unused_attributes_and_whitespace():
+    root = soup(
+        '<div class="card" style="color:red" onclick="x()" data-testid="card" '
+        f'data-blob="{"x" * 100}">  hello \n  world  </div>'
+    ).div
+    assert str(minify(root)) == '<div class="card" data-testid="card"> hello world </div>'
+
+
+def test_shrink_keeps_valid_markup():
+    root = soup("<ul>" + "<li>row</li>" * 50 + "</ul>").ul
+    shrink(root, 100)
+    assert len(str(root)) < 160
+    assert str(root).endswith("more nodes omitted --></ul>")
+
+
+def test_collapse_keeps_exemplars_and_a_marker():
+    root = soup("<ul>" + "".join(f'<li class="product">{i}</li>' for i in range(10)) + "</ul>").ul
+    assert collapse_repeated_siblings(root, keep=3) == 7
+    assert [li.text for li in root.find_all("li")] == ["0", "4", "9"]
+    marker = [c for c in root.children if isinstance(c, CollapseMarker)]
+    assert [str(m) for m in marker] == [" 7 more similar li.product "]
+
+
+def test_short_runs_and_table_cells_are_not_collapsed():
+    root = soup("<ul>" + "<li>x</li>" * 4 + "</ul>").ul
+    assert collapse_repeated_siblings(root, keep=3) == 0
+
+    row = soup("<tr>" + "<td>c</td>" * 10 + "</tr>").tr
+    assert collapse_repeated_siblings(row, keep=3) == 0
+    assert len(row.find_all("td")) == 10
+
+
+def test_exemplars_prefer_items_with_other_fields():
+    root = soup(
+        "<ul>" + "<li><b>n</b></li>" * 5 + "<li><b>n</b><i>sale</i></li>" + "<li><b>n</b></li>" * 4 + "</ul>"
+    ).ul
+    run = root.find_all("li", recursive=False)
+    chosen = pick_exemplars(run, 2)
+    assert chosen[0] is run[0]
+    assert chosen[1].i is not None
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 35) == 11
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from document import Document
+from random_sampler import RandomSampler, SampleStats
+
+
+def test_chao1_with_doubletons():
+    stats = SampleStats(rows_seen=20, unique=10, singletons=4, doubletons=2)
+    assert stats.estimated_total == pytest.approx(10 + 16 / 4)
+
+
+def test_chao1_bias_corrected_without_doubletons():
+    stats = SampleStats(rows_seen=5, unique=5, singletons=5, doubletons=0)
+    assert stats.estimated_total == pytest.approx(5 + 5 * 4 / 2)
+
+
+def test_good_turing_coverage():
+    assert SampleStats().coverage == 0.0
+    assert SampleStats(rows_seen=20, unique=10, singletons=4).coverage == pytest.approx(0.8)
+
+
+def extract(document: Document, url: str):
+    return [{"item": text} for text in document.text.split()]
+
+
+def run(sampler: RandomSampler, url: str = "https://x.com/random"):
+    async def collect():
+        return [row async for rows in sampler.sample(url) for row in rows]
+
+    return asyncio.run(collect())
+
+
+def test_counts_singletons_and_doubletons():
+    responses = iter(["a b", "a c", "a b", "d"])
+
+    async def fetch(url: str) -> Document:
+        return Document(next(responses))
+
+    sampler = RandomSampler(extract, fetch=fetch, concurrency=1, max_requests=4, window=10)
+    assert [row["item"] for row in run(sampler)] == ["a", "b", "c", "d"]
+    # a x3, b x2, c and d once
+    assert (sampler.stats.unique, sampler.stats.singletons, sampler.stats.doubletons) == (4, 2, 1)
+    assert sampler.stats.rows_seen == 7
+    assert sampler.stats.stop_reason == "request budget"
+
+
+def test_stops_on_coverage_or_marginal_yield():
+    async def fetch(url: str) -> Document:
+        return Document("same rows")
+
+    sampler = RandomSampler(extract, fetch=fetch, concurrency=1, max_requests=100, window=4)
+    run(sampler)
+    # The first response is all new (2 of 8 rows over the window), then only repeats
+    assert sampler.stats.requests == 4
+    assert sampler.stats.stop_reason == "coverage 100%"
+
+    sampler = RandomSampler(extract, fetch=fetch, concurrency=1, max_requests=100, window=4, min_yield=0.5)
+    run(sampler)
+    assert sampler.stats.stop_reason == "marginal yield 2/8"
+
+
+def test_failed_fetches_are_not_zero_yield_windows():
+    calls = 0
+
+    async def fetch(url: str) -> Document:
+        nonlocal calls
+        calls += 1
+        if calls <= 6:
+            raise ConnectionError("flaky")
+        return Document(f"row{calls}")
+
+    sampler = RandomSampler(extract, fetch=fetch, concurrency=1, max_requests=12, window=4)
+    run(sampler)
+    assert sampler.stats.errors == 6
+    assert sampler.stats.unique == 6
+    assert sampler.stats.stop_reason == "request budget"
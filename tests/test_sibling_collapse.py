@@ -0,0 +1,91 @@
+from bs4 import BeautifulSoup
+
+from sibling_collapse import CollapseMarker, collapse_repeated_siblings, pick_exemplars, signature
+
+
+def parse(html: str):
+    return BeautifulSoup(html, "html.parser")
+
+
+def markers(root):
+    return [str(c).strip() for c in root.find_all(string=lambda s: isinstance(s, CollapseMarker))]
+
+
+def test_signature_keeps_class_order():
+    assert signature(parse('<li class="b a">x</li>').li) == "li.b.a"
+    assert signature(parse("<li>x</li>").li) == "li"
+
+
+def test_collapse_keeps_exemplars_and_a_marker():
+    root = parse("<ul>" + "".join(f'<li class="product">{i}</li>' for i in range(10)) + "</ul>").ul
+    assert collapse_repeated_siblings(root, keep=3) == 7
+    assert [li.text for li in root.find_all("li")] == ["0", "4", "9"]
+    assert markers(root) == ["7 more similar li.product"]
+    # The marker follows the last exemplar
+    assert isinstance(root.find_all("li")[-1].next_sibling, CollapseMarker)
+
+
+def test_runs_at_or_below_keep_plus_one_are_left_alone():
+    root = parse("<ul>" + "<li>x</li>" * 4 + "</ul>").ul
+    assert collapse_repeated_siblings(root, keep=3) == 0
+    assert len(root.find_all("li")) == 4
+    assert markers(root) == []
+
+
+def test_positional_tags_are_never_collapsed():
+    row = parse("<table><tr>" + "<td>c</td>" * 10 + "</tr></table>").tr
+    head = parse("<table><tr>" + "<th>h</th>" * 10 + "</tr></table>").tr
+    cols = parse("<table><colgroup>" + "<col>" * 10 + "</colgroup></table>").colgroup
+    breaks = parse("<p>" + "line<br>" * 10 + "</p>").p
+    for root, name in [(row, "td"), (head, "th"), (cols, "col"), (breaks, "br")]:
+        assert collapse_repeated_siblings(root, keep=2) == 0
+        assert len(root.find_all(name)) == 10
+
+
+def test_rows_collapse_but_their_cells_dont():
+    rows = "".join(f"<tr><td>{i}</td>" + "<td>x</td>" * 6 + "</tr>" for i in range(8))
+    table = parse(f"<table><tbody>{rows}</tbody></table>").table
+    assert collapse_repeated_siblings(table, keep=2) == 6
+    kept = table.find_all("tr")
+    assert len(kept) == 2
+    assert all(len(tr.find_all("td")) == 7 for tr in kept)
+
+
+def test_mixed_class_runs_are_split_by_signature():
+    items = '<li class="ad">ad</li>' + '<li class="item">i</li>' * 6 + '<li class="ad">ad</li>' * 6
+    root = parse(f"<ul>{items}</ul>").ul
+    assert collapse_repeated_siblings(root, keep=2) == 8
+    assert [li["class"][0] for li in root.find_all("li")] == ["ad", "item", "item", "ad", "ad"]
+    assert markers(root) == ["4 more similar li.item", "4 more similar li.ad"]
+
+
+def test_text_between_siblings_does_not_break_a_run():
+    root = parse("<div>" + "<span>a</span>, " * 6 + "</div>").div
+    assert collapse_repeated_siblings(root, keep=2) == 4
+
+
+def test_nested_runs_collapse_inside_the_exemplars():
+    inner = "<ul>" + "<li>x</li>" * 8 + "</ul>"
+    root = parse("<div>" + f'<section class="group">{inner}</section>' * 6 + "</div>").div
+    # 6 sections -> 2; then 8 items -> 2 inside each kept section
+    assert collapse_repeated_siblings(root, keep=2) == 4 + 2 * 6
+    sections = root.find_all("section")
+    assert len(sections) == 2
+    assert all(len(s.find_all("li")) == 2 for s in sections)
+    assert markers(root).count("6 more similar li") == 2
+
+
+def test_exemplars_prefer_items_with_other_fields():
+    root = parse(
+        "<ul>" + "<li><b>n</b></li>" * 5 + "<li><b>n</b><i>sale</i></li>" + "<li><b>n</b></li>" * 4 + "</ul>"
+    ).ul
+    run = root.find_all("li", recursive=False)
+    chosen = pick_exemplars(run, 2)
+    assert chosen[0] is run[0]
+    assert chosen[1] is run[5]
+
+
+def test_exemplars_are_spread_and_in_document_order():
+    run = parse("<ul>" + "".join(f"<li>{i}</li>" for i in range(9)) + "</ul>").find_all("li")
+    assert [li.text for li in pick_exemplars(run, 3)] == ["0", "4", "8"]
+    assert [li.text for li in pick_exemplars(run, 1)] == ["0"]
@@ -0,0 +1,114 @@
+import csv
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+from sinks import CSVSink, NDJSONSink, SQLiteSink, write_rows
+
+
+def read_table(path, table="rows"):
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    rows = [dict(r) for r in db.execute(f'SELECT * FROM "{table}"')]
+    db.close()
+    return rows
+
+
+def test_ndjson_sink(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with NDJSONSink(str(path)) as sink:
+        assert write_rows([{"a": 1, "d": date(2024, 1, 2)}, {"a": 2}], sink) == 2
+    with NDJSONSink(str(path), append=True) as sink:
+        sink.write({"a": 3})
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert lines == [{"a": 1, "d": "2024-01-02"}, {"a": 2}, {"a": 3}]
+
+
+def test_csv_sink_header_and_append(tmp_path):
+    path = tmp_path / "out.csv"
+    with CSVSink(str(path)) as sink:
+        sink.write({"name": "a", "tags": ["x", "y"]})
+        sink.write({"name": "b", "extra": "dropped"})
+
+    # Appending to a non-empty file doesn't repeat the header
+    with CSVSink(str(path), fieldnames=["name", "tags"], append=True) as sink:
+        sink.write({"name": "c", "tags": []})
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["name", "tags"], ["a", '["x", "y"]'], ["b", ""], ["c", "[]"]]
+
+
+def test_csv_sink_appending_to_a_new_file_writes_the_header(tmp_path):
+    path = tmp_path / "new.csv"
+    with CSVSink(str(path), append=True) as sink:
+        sink.write({"name": "a"})
+    assert path.read_text(encoding="utf-8").splitlines() == ["name", "a"]
+
+
+def test_sqlite_sink_batches_and_new_columns(tmp_path):
+    path = str(tmp_path / "out.db")
+    with SQLiteSink(path, batch_size=2) as sink:
+        write_rows([{"a": 1}, {"a": 2, "b": [1, 2]}, {"b": "x"}], sink)
+        assert sink.rows_written == 3
+    assert read_table(path) == [
+        {"a": 1, "b": None},
+        {"a": 2, "b": "[1, 2]"},
+        {"a": None, "b": "x"},
+    ]
+
+
+def test_sqlite_sink_dedupes_within_and_across_runs(tmp_path):
+    path = str(tmp_path / "out.db")
+    rows = [{"id": 1, "v": "a"}, {"id": 1, "v": "b"}, {"id": 2, "v": "c"}]
+    with SQLiteSink(path, dedupe_keys=["id"]) as sink:
+        write_rows(rows, sink)
+    assert sink.rows_skipped == 1
+
+    # Reopening the existing table keeps its index
+    with SQLiteSink(path, dedupe_keys=["id"]) as sink:
+        write_rows([{"id": 2, "v": "d"}, {"id": 3, "v": "e"}], sink)
+    assert sink.rows_skipped == 1
+    assert [(r["id"], r["v"]) for r in read_table(path)] == [(1, "a"), (2, "c"), (3, "e")]
+
+
+def test_sqlite_sink_null_keys_are_never_deduped(tmp_path):
+    path = str(tmp_path / "out.db")
+    with SQLiteSink(path, dedupe_keys=["id"]) as sink:
+        write_rows([{"v": "a"}, {"v": "a"}], sink)
+    assert sink.rows_skipped == 0
+    assert len(read_table(path)) == 2
+
+
+def test_sqlite_sink_adds_dedupe_to_a_table_created_without_keys(tmp_path):
+    path = str(tmp_path / "out.db")
+    with SQLiteSink(path) as sink:
+        sink.write({"v": "a"})
+
+    with SQLiteSink(path, dedupe_keys=["url"]) as sink:
+        write_rows([{"url": "u", "v": "b"}, {"url": "u", "v": "c"}], sink)
+    assert sink.rows_skipped == 1
+    assert [(r["url"], r["v"]) for r in read_table(path)] == [(None, "a"), ("u", "b")]
+
+
+def test_sqlite_sink_refuses_keys_the_table_already_duplicates(tmp_path):
+    path = str(tmp_path / "out.db")
+    with SQLiteSink(path) as sink:
+        write_rows([{"id": 1}, {"id": 1}], sink)
+    with pytest.raises(ValueError, match="duplicate rows"):
+        SQLiteSink(path, dedupe_keys=["id"])
+
+
+def test_sqlite_sink_rejects_bad_table_names(tmp_path):
+    with pytest.raises(ValueError):
+        SQLiteSink(str(tmp_path / "out.db"), table='rows"; DROP')
+
+
+def test_write_rows_feeds_every_sink(tmp_path):
+    rows = ({"n": i} for i in range(3))
+    with NDJSONSink(str(tmp_path / "a.jsonl")) as a, SQLiteSink(str(tmp_path / "b.db")) as b:
+        assert write_rows(rows, a, b) == 3
+    assert len((tmp_path / "a.jsonl").read_text().splitlines()) == 3
+    assert read_table(str(tmp_path / "b.db")) == [{"n": 0}, {"n": 1}, {"n": 2}]
@@ -0,0 +1,275 @@
+"""
+Lightweight pipeline tracing: nested spans with wall time, CPU time and
+byte/token counters, exported as Chrome trace JSON (chrome://tracing or
+ui.perfetto.dev) and summarised as a per-stage table.
+
+    tracing.enable()
+    with tracing.span("fetch", url=url) as s:
+        html = ...
+        s.add(bytes_in=len(html))
+    tracing.export_chrome("trace.json")
+    print(tracing.summary_table())
+
+Tracing is off until enable() is called (or SCRAPER_TRACE=<path> is set for the
+html_fetcher pipeline). While off, span() hands back one shared no-op object,
+so instrumented code pays a global lookup and nothing else.
+
+Parents are tracked with a contextvar, so spans nest across awaits and into
+asyncio tasks / to_thread calls. CPU time is the thread's CPU while the span
+was open; for a span that awaits, that includes other tasks on the same loop.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Counters every span can carry; summary_table() shows these columns
+COUNTERS = ("bytes_in", "bytes_out", "prompt_tokens", "completion_tokens")
+
+
+@dataclass
+class Span:
+    name: str
+    parent: Optional["Span"]
+    lane: Tuple[int, int]  # (thread, asyncio task or 0) it ran on
+    start_ns: int
+    wall: float = 0.0
+    cpu: float = 0.0
+    counters: Dict[str, int] = field(default_factory=dict)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def add(self, **counters: int):
+        """Add to this span's counters (bytes_in=..., prompt_tokens=...)."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, **attrs: Any):
+        """Attach attributes (shown in the trace viewer, not the summary)."""
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    """What span() returns while tracing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counters: int):
+        pass
+
+    def set(self, **attrs: Any):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+def _lane() -> Tuple[int, int]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return threading.get_ident(), id(task) if task is not None else 0
+
+
+class _SpanContext:
+    __slots__ = ("_tracer", "_span", "_token", "_cpu_start", "_wall_start")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self._tracer = tracer
+        self._span = Span(name=name, parent=_current.get(), lane=_lane(), start_ns=0, attrs=attrs)
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self._span)
+        self._cpu_start = time.thread_time()
+        self._wall_start = time.perf_counter_ns()
+        self._span.start_ns = self._wall_start
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self._span
+        span.wall = (time.perf_counter_ns() - self._wall_start) / 1e9
+        span.cpu = time.thread_time() - self._cpu_start
+        if exc_type is not None:
+            span.attrs["error"] = exc_type.__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited in another context (e.g. a generator finished elsewhere)
+            _current.set(span.parent)
+        self._tracer._finish(span)
+        return False
+
+
+class Tracer:
+    """Collects finished spans; one per enable()."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def chrome_trace(self) -> dict:
+        """
+        Trace Event Format: one complete ("X") event per span. Every thread and
+        asyncio task gets its own row, so concurrent spans don't mis-nest.
+        """
+        pid = os.getpid()
+        lanes: Dict[Tuple[int, int], int] = {}
+        events = []
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+
+        for span in spans:
+            if span.lane not in lanes:
+                tid = lanes[span.lane] = len(lanes) + 1
+                thread, task = span.lane
+                label = f"thread {thread}" + (f" / task {task:x}" if task else "")
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                               "args": {"name": label}})
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "pid": pid,
+                "tid": lanes[span.lane],
+                "ts": (span.start_ns - self.origin_ns) / 1000,
+                "dur": span.wall * 1e6,
+                "args": {"cpu_ms": round(span.cpu * 1000, 3), **span.counters,
+                         **{k: str(v) for k, v in span.attrs.items()}},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self) -> List[dict]:
+        """
+        Totals per span name, in first-seen order. `self` is wall time not spent
+        in child spans (children that ran concurrently can push it to zero).
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+
+        child_wall: Dict[int, float] = defaultdict(float)
+        for span in spans:
+            if span.parent is not None:
+                child_wall[id(span.parent)] += span.wall
+
+        rows: Dict[str, dict] = {}
+        for span in spans:
+            row = rows.setdefault(span.name, {"name": span.name, "calls": 0, "wall": 0.0,
+                                              "self": 0.0, "cpu": 0.0, **{c: 0 for c in COUNTERS}})
+            row["calls"] += 1
+            row["wall"] += span.wall
+            row["self"] += max(0.0, span.wall - child_wall[id(span)])
+            row["cpu"] += span.cpu
+            for key in COUNTERS:
+                row[key] += span.counters.get(key, 0)
+        return list(rows.values())
+
+    def summary_table(self) -> str:
+        rows = self.summary()
+        if not rows:
+            return "(no spans recorded)"
+        width = max(len(r["name"]) for r in rows) + 2
+        lines = [f"{'span':<{width}}{'calls':>6}{'wall s':>9}{'self s':>9}{'cpu s':>8}"
+                 f"{'KB in':>9}{'KB out':>9}{'tok in':>8}{'tok out':>8}"]
+        for r in rows:
+            lines.append(
+                f"{r['name']:<{width}}{r['calls']:>6}{r['wall']:>9.3f}{r['self']:>9.3f}{r['cpu']:>8.3f}"
+                f"{r['bytes_in'] / 1024:>9.1f}{r['bytes_out'] / 1024:>9.1f}"
+                f"{r['prompt_tokens']:>8}{r['completion_tokens']:>8}"
+            )
+        return "\n".join(lines)
+
+
+def enable() -> Tracer:
+    """Start recording spans (into a fresh Tracer)."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Stop recording; returns the tracer that was active, spans intact."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, **attrs: Any):
+    """Context manager timing a stage; yields the Span (or a no-op when off)."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return _SpanContext(tracer, name, attrs)
+
+
+def add(**counters: int):
+    """Add counters to the innermost open span, if tracing."""
+    if _tracer is not None:
+        current = _current.get()
+        if current is not None:
+            current.add(**counters)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping every call of a function (sync or async) in a span."""
+
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await fn(*args, **kwargs)
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def export_chrome(path: str):
+    if _tracer is not None:
+        _tracer.export_chrome(path)
+
+
+def summary_table() -> str:
+    return _tracer.summary_table() if _tracer is not None else "(tracing disabled)"